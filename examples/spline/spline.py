@@ -71,6 +71,6 @@ problem.initialise()
 problem.solve()
 plt.scatter(np.linspace(0,L,len(terrain_data)),terrain_data)
 x_locs = np.linspace(0,L,100)
-plt.plot(x_locs,[hill.subs(x,xl) for xl in x_locs])
+plt.plot(x_locs,sym.lambdify(x,hill,"numpy")(x_locs))
 plt.plot(problem.solution.state[0][0],problem.solution.state[0][1])
 plt.show()
\ No newline at end of file
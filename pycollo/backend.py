@@ -11,18 +11,61 @@ SYMPY : str
 BACKENDS : :py:class:`Options <pyproprop>`
     The default backend to be used (via its constant keyword string
     identifier).
+EXPAND : str
+    Constant keyword string identifier for constructing the NLP by expanding
+    phase equations symbolically at every collocation node.
+MAP : str
+    Constant keyword string identifier for constructing the NLP by mapping a
+    single per-node phase function over the collocation nodes.
+NODE_FUNCTION_MODES : :py:class:`Options <pyproprop>`
+    How phase equations are evaluated over the collocation nodes when
+    constructing the NLP (via its constant keyword string identifier).
+SERIAL : str
+    Constant keyword string identifier for serial evaluation of mapped node
+    functions.
+THREAD : str
+    Constant keyword string identifier for multithreaded evaluation of mapped
+    node functions.
+OPENMP : str
+    Constant keyword string identifier for OpenMP-parallelised evaluation of
+    mapped node functions.
+MAP_PARALLELISATIONS : :py:class:`Options <pyproprop>`
+    How mapped node functions are evaluated over the collocation nodes (via
+    its constant keyword string identifier).
+DEFAULT_COMPILE_NLP_FUNCTIONS : bool
+    Default as to whether the NLP functions should be generated as C code and
+    compiled to a shared library.
+DEFAULT_NLP_CACHE_DIRECTORY : str
+    Default directory in which compiled NLP function shared libraries are
+    cached.
+C_COMPILER_FLAGS : tuple
+    Flags passed to the C compiler when compiling NLP function shared
+    libraries. The compiler itself is taken from the `CC` environment
+    variable, falling back to `gcc`.
+ITERATION_FUNCTIONS : tuple
+    Names of the functions of the NLP variables and parameters created for
+    each mesh iteration and used for scaling and post-processing: the
+    objective, its gradient, the constraints, their Jacobian and the state
+    derivatives.
+WARM_START_BOUND_PUSH : float
+    IPOPT bound push and bound fraction used for primal variables, slacks
+    and multipliers when warm-starting a mesh iteration.
 
 """
 
 
+import hashlib
 import itertools
+import os
+import subprocess
+import tempfile
 from abc import ABC, abstractmethod
 from collections import namedtuple
+from pathlib import Path
 from timeit import default_timer as timer
 
 import casadi as ca
 import numpy as np
-import scipy.sparse as sparse
 import sympy as sym
 from pyproprop import Options, processed_property
 
@@ -40,16 +83,22 @@ from .scaling import (Scaling,
                       SympyIterationScaling,
                       )
 from .solution import CasadiSolution, NlpResult
-from .utils import (casadi_substitute,
+from .utils import (cachedproperty,
+                    casadi_lookup_function,
+                    casadi_sparse_to_scipy,
+                    casadi_sparsity_indices,
+                    casadi_substitute,
                     console_out,
                     dict_merge,
                     fast_sympify,
                     format_multiple_items_for_output,
+                    inline_lookups,
                     needed_to_tuple,
                     SUPPORTED_ITER_TYPES,
                     symbol_name,
                     symbol_primitives,
                     sympy_to_casadi,
+                    sympy_to_casadi_cse,
                     )
 
 
@@ -60,13 +109,23 @@ CASADI = "casadi"
 HSAD = "hsad"
 PYCOLLO = "pycollo"
 SYMPY = "sympy"
+EXPAND = "expand"
+MAP = "map"
+NODE_FUNCTION_MODES = Options((EXPAND, MAP), default=EXPAND)
+SERIAL = "serial"
+THREAD = "thread"
+OPENMP = "openmp"
+MAP_PARALLELISATIONS = Options((SERIAL, THREAD, OPENMP), default=SERIAL)
+DEFAULT_COMPILE_NLP_FUNCTIONS = False
+DEFAULT_NLP_CACHE_DIRECTORY = str(Path.home() / ".cache" / "pycollo")
+C_COMPILER_FLAGS = ("-fPIC", "-shared", "-O1")
+ITERATION_FUNCTIONS = ("J", "g", "c", "G", "dy")
+WARM_START_BOUND_PUSH = 1e-9
 
 
 class BackendABC(ABC):
     """Abstract base class for backends"""
 
-    _MAX_AUX_DATA_SUBSTITUTION_DEPTH = 100
-
     ocp = processed_property("ocp", read_only=True)
 
     def __init__(self, ocp):
@@ -124,6 +183,21 @@ class BackendABC(ABC):
         """
         pass
 
+    def substitute_pycollo_syms(self, exprs, phase=None, lookups=None):
+        """Substitute multiple expressions for backend Pycollo symbols.
+
+        Backends that do not support lookups (see :class:`utils.Lookup`)
+        ignore `lookups` and always substitute spline functions inline.
+
+        Returns
+        -------
+        Tuple[Union[ca.SX, sym.Expr, pycollo.Expression]]
+            The substituted expressions.
+
+        """
+        return tuple(self.substitute_pycollo_sym(expr, phase)
+                     for expr in exprs)
+
     @staticmethod
     @abstractmethod
     def iteration_scaling(*args, **kwargs):
@@ -591,23 +665,93 @@ class BackendABC(ABC):
                                     phase_V_sym,
                                     phase_r_sym,
                                     phase_point_sym)
-        for backend_sym in self.aux_data.copy().keys():
+        dependencies = self.aux_data_dependencies()
+        for backend_sym in self.aux_data_resolution_order(dependencies):
             backend_eqn = self.aux_data[backend_sym]
-            before_prims = set(symbol_primitives(backend_eqn))
-            for _ in range(self._MAX_AUX_DATA_SUBSTITUTION_DEPTH):
-                backend_eqn = casadi_substitute(backend_eqn, self.aux_data)
-                after_prims = set(symbol_primitives(backend_eqn))
-                if before_prims == after_prims:
-                    diff = after_prims.difference(self.all_var)
-                    if diff:
-                        msg = (f"Cannot rectify aux data for symbol "
-                               f"{backend_sym} with equation "
-                               f"{self.aux_data[backend_sym]} as it contains "
-                               f"the non-root symbols: {diff}.")
+            if dependencies[backend_sym]:
+                resolved_mapping = {dependency: self.aux_data[dependency]
+                                    for dependency in dependencies[backend_sym]}
+                backend_eqn = casadi_substitute(backend_eqn, resolved_mapping)
+            diff = set(symbol_primitives(backend_eqn)).difference(self.all_var)
+            if diff:
+                msg = (f"Cannot rectify aux data for symbol "
+                       f"{backend_sym} with equation "
+                       f"{self.aux_data[backend_sym]} as it contains "
+                       f"the non-root symbols: {diff}.")
+                raise ValueError(msg)
+            self.aux_data[backend_sym] = backend_eqn
+
+    def aux_data_dependencies(self):
+        """Map each aux data symbol to the aux data symbols it depends on.
+
+        Returns
+        -------
+        Dict[ca.SX, Set[ca.SX]]
+            Direct dependencies of each aux data equation on other aux data
+            symbols.
+
+        """
+        dependencies = {}
+        for backend_sym, backend_eqn in self.aux_data.items():
+            prims = set(symbol_primitives(backend_eqn))
+            dependencies[backend_sym] = prims.intersection(self.aux_data)
+        return dependencies
+
+    @staticmethod
+    def aux_data_resolution_order(dependencies):
+        """Order aux data symbols so dependencies are resolved first.
+
+        A depth-first topological sort of the aux data dependency graph is
+        used so that each aux data equation only needs to be substituted
+        once, with the already-resolved equations of its dependencies.
+
+        Args
+        ----
+        dependencies : Dict[ca.SX, Set[ca.SX]]
+            Direct dependencies of each aux data symbol, as per
+            :meth:`aux_data_dependencies`.
+
+        Returns
+        -------
+        List[ca.SX]
+            Aux data symbols in topological order.
+
+        Raises
+        ------
+        ValueError
+            If the aux data contains a cyclic dependency.
+
+        """
+        order = []
+        resolved = set()
+        for root_sym in dependencies:
+            if root_sym in resolved:
+                continue
+            path = [root_sym]
+            on_path = {root_sym}
+            stack = [iter(dependencies[root_sym])]
+            while stack:
+                for dependency in stack[-1]:
+                    if dependency in resolved:
+                        continue
+                    if dependency in on_path:
+                        cycle = path[path.index(dependency):] + [dependency]
+                        formatted_cycle = " -> ".join(str(backend_sym)
+                                                      for backend_sym in cycle)
+                        msg = (f"Cannot rectify aux data as it contains the "
+                               f"cyclic dependency: {formatted_cycle}.")
                         raise ValueError(msg)
+                    path.append(dependency)
+                    on_path.add(dependency)
+                    stack.append(iter(dependencies[dependency]))
                     break
-                self.aux_data[backend_sym] = backend_eqn
-                before_prims = after_prims
+                else:
+                    stack.pop()
+                    backend_sym = path.pop()
+                    on_path.remove(backend_sym)
+                    resolved.add(backend_sym)
+                    order.append(backend_sym)
+        return order
 
     def preprocess_problem_backend(self):
         """Abstraction layer for backend-specific postprocessing."""
@@ -1144,31 +1288,65 @@ class PycolloPhaseData:
         self.check_all_needed_user_phase_aux_data_supplied()
         self.create_constraint_indexes_slices()
 
+    @cachedproperty
+    def lookup_equations(self):
+        """All phase equations with spline functions lowered to lookups.
+
+        The state equations, path constraints and integrand functions are
+        substituted together so that subexpressions common to several
+        equations are only constructed once. Spline functions are left as
+        lookup placeholder symbols, held in :attr:`lookups`, so that they can
+        be evaluated by CasADi lookup functions in per-node functions.
+
+        Returns
+        -------
+        Tuple[ca.SX, ...]
+            The substituted state equations, path constraints and integrand
+            functions.
+
+        """
+        self.lookups = {}
+        eqns = (tuple(self.ocp_phase.state_equations)
+                + tuple(self.ocp_phase.path_constraints)
+                + tuple(self.ocp_phase.integrand_functions))
+        return self.ocp_backend.substitute_pycollo_syms(eqns, self,
+                                                        self.lookups)
+
+    @cachedproperty
+    def substituted_equations(self):
+        """All phase equations substituted with backend symbols.
+
+        These are :attr:`lookup_equations` with all lookups inlined as SX
+        expressions, as used when the node function mode is "expand".
+
+        Returns
+        -------
+        Tuple[Tuple[ca.SX, ...], Tuple[ca.SX, ...], Tuple[ca.SX, ...]]
+            The substituted state equations, path constraints and integrand
+            functions.
+
+        """
+        num_y_eqn = self.ocp_phase.number_state_equations
+        num_p_con = self.ocp_phase.number_path_constraints
+        eqns = inline_lookups(self.lookup_equations, self.lookups)
+        y_eqn = eqns[:num_y_eqn]
+        p_con = eqns[num_y_eqn:num_y_eqn + num_p_con]
+        q_fnc = eqns[num_y_eqn + num_p_con:]
+        return y_eqn, p_con, q_fnc
+
     def preprocess_state_equations(self):
         """Substitute state equations with backend symbols."""
-        y_eqns = []
-        for y_eqn in self.ocp_phase.state_equations:
-            y_eqn = self.ocp_backend.substitute_pycollo_sym(y_eqn, self)
-            y_eqns.append(y_eqn)
-        self.y_eqn = tuple(y_eqns)
+        self.y_eqn, _, _ = self.substituted_equations
         self.num_y_eqn = self.ocp_phase.number_state_equations
 
     def preprocess_path_constraints(self):
         """Substitute path constraint equations with backend symbols."""
-        p_cons = []
-        for p_con in self.ocp_phase.path_constraints:
-            p_con = self.ocp_backend.substitute_pycollo_sym(p_con, self)
-            p_cons.append(p_con)
-        self.p_con = tuple(p_cons)
+        _, self.p_con, _ = self.substituted_equations
         self.num_p_con = self.ocp_phase.number_path_constraints
 
     def preprocess_integrand_functions(self):
         """Substitute integrand functions with backend symbols."""
-        q_fncs = []
-        for q_fnc in self.ocp_phase.integrand_functions:
-            q_fnc = self.ocp_backend.substitute_pycollo_sym(q_fnc, self)
-            q_fncs.append(q_fnc)
-        self.q_fnc = tuple(q_fncs)
+        _, _, self.q_fnc = self.substituted_equations
         self.num_q_fnc = self.ocp_phase.number_integrand_functions
 
     def collect_constraints(self):
@@ -1371,6 +1549,39 @@ class Casadi(BackendABC):
         expr = casadi_substitute(expr, self.aux_data)
         return expr
 
+    def substitute_pycollo_syms(self, exprs, phase=None, lookups=None):
+        """Jointly convert to ca.SX and replace user syms with backend syms.
+
+        Common subexpressions are eliminated across all of the expressions so
+        that the returned expressions share intermediate SX nodes. If
+        `lookups` is supplied then spline functions are lowered to lookup
+        placeholder symbols which are added to it, with the arguments of the
+        lookups also substituted.
+
+        """
+        exprs = [fast_sympify(expr) for expr in exprs]
+        if not all(isinstance(expr, sym.Expr) for expr in exprs):
+            return super().substitute_pycollo_syms(exprs, phase)
+        if isinstance(phase, int):
+            phase = self.p[phase]
+        if isinstance(phase, PycolloPhaseData):
+            user_to_backend_mapping = phase.all_user_to_backend_mapping
+            phase_index = phase.i
+        else:
+            user_to_backend_mapping = self.user_to_backend_mapping
+            phase_index = None
+        exprs, _ = sympy_to_casadi_cse(exprs,
+                                       user_to_backend_mapping,
+                                       phase=phase_index,
+                                       lookups=lookups)
+        exprs = ca.vertcat(*exprs)
+        exprs = casadi_substitute(exprs, self.aux_data)
+        if lookups:
+            for placeholder, lookup in lookups.items():
+                argument = casadi_substitute(lookup.argument, self.aux_data)
+                lookups[placeholder] = lookup._replace(argument=argument)
+        return tuple(ca.vertsplit(exprs))
+
     def substitute_matrix_pycollo_sym(self, expr, phase=None):
         """Convert and replace a non-scalar with Pycollo backend syms."""
         expr_array = np.array(expr)
@@ -1399,18 +1610,156 @@ class Casadi(BackendABC):
         return scaling
 
     def postprocess_problem_backend(self):
-        """CasADi backend doesn't need to do any postprocessing."""
-        pass
+        """Create the mesh-independent functions used by mapped iterations."""
+        self.nlp_key_iter = None
+        self.nlp_library_path_iter = None
+        self.nlp_solver = None
+        self.solver_key_iter = None
+        self.create_mesh_independent_functions()
+
+    def create_mesh_independent_functions(self):
+        """Create per-phase and endpoint functions reused by all iterations.
+
+        The phase state equations, path constraints and integrands, as well
+        as the objective function and endpoint constraints, do not depend on
+        the mesh. These are therefore compiled to CasADi functions once per
+        OCP and, if the node function mode is "map", the mesh-dependent NLP
+        is assembled from them at each mesh iteration. In "expand" mode the
+        NLP is instead built by substituting the phase equations at every
+        node, which is repeated whenever the mesh changes, and these
+        functions are only used to key the cache of compiled NLP functions.
+        The variable stretch and shift values, and the values of
+        constant variables, are left as function inputs so that the same
+        functions remain valid if these change. CasADi caches derivative
+        functions on each function instance, so derivatives of these
+        functions are also only generated once. Spline functions in the
+        phase equations are evaluated by CasADi lookup functions (see
+        :func:`utils.ppoly_lookup_function`), rather than as inline `if_else`
+        trees, so their cost per node does not grow with their number of
+        segments. These lookup functions are MX functions and so are only
+        used in "map" mode, in which the NLP is an MX expression graph.
+
+        The node function for each phase evaluates the phase's state
+        equations, path constraints and integrands, as well as the unscaled
+        state variables, at a single collocation node from the (scaled)
+        state and control variables at that node and the (scaled) integral,
+        time and static parameter variables. The point function for each
+        phase returns the phase's stretch factor and unscaled integral
+        variables from the same integral, time and static parameter
+        variables.
+
+        """
+        V_r = ca.vertcat(*self.V_x_var, *self.r_x_var)
+        aux = ca.vertcat(*self.bounds.aux_data.keys())
+        self.phase_node_functions = []
+        self.phase_point_functions = []
+        for p in self.p:
+            y_var = ca.vertcat(*p.y_var)
+            u_var = ca.vertcat(*p.u_var)
+            z_var = ca.vertcat(*p.q_var, *p.t_var, *self.s_var)
+            c_phase = ca.vertcat(*p.lookup_equations)
+            zipped = zip(p.y_var, p.V_y_var, p.r_y_var)
+            y_unscaled = ca.vertcat(*(V_y_var * y_var + r_y_var
+                                      for y_var, V_y_var, r_y_var in zipped))
+            node_fnc = casadi_lookup_function(f"c_P{p.i}",
+                                              [y_var, u_var, z_var, V_r, aux],
+                                              [c_phase, y_unscaled],
+                                              p.lookups)
+            self.phase_node_functions.append(node_fnc)
+            if p.ocp_phase.bounds._t_needed[0]:
+                t0 = p.V_t_var[0] * p.t_var[0] + p.r_t_var[0]
+            else:
+                t0 = p.t_var_full[0]
+            if p.ocp_phase.bounds._t_needed[1]:
+                tF = p.V_t_var[-1] * p.t_var[-1] + p.r_t_var[-1]
+            else:
+                tF = p.t_var_full[1]
+            stretch = 0.5 * (tF - t0)
+            zipped = zip(p.q_var, p.V_q_var, p.r_q_var)
+            q_unscaled = ca.vertcat(*(V_q_var * q_var + r_q_var
+                                      for q_var, V_q_var, r_q_var in zipped))
+            point_fnc = ca.Function(f"z_P{p.i}",
+                                    [z_var, V_r, aux],
+                                    [stretch, q_unscaled])
+            self.phase_point_functions.append(point_fnc)
+        x_point_var = ca.vertcat(*self.x_point_var)
+        self.J_point_function = ca.Function("J_point",
+                                            [x_point_var, V_r, aux],
+                                            [self.J])
+        self.b_point_function = ca.Function("b_point",
+                                            [x_point_var, V_r, aux],
+                                            [ca.vertcat(*self.b_con)])
 
     def generate_nlp_function_callables(self, iteration):
         """Create iteration-specific OCP callables required by CasADi backend.
+
+        All numerical data in the NLP (objective and constraint scaling,
+        variable stretch and shift values, and the values of constant
+        variables) are NLP parameters rather than being substituted in to the
+        NLP expressions. The symbolic NLP therefore only needs to be
+        reconstructed, and the NLP solver recreated, if the mesh or the way
+        the NLP is constructed changes.
+
+        If NLP functions are compiled and a shared library for this NLP is
+        already cached, the iteration's functions are loaded from it and the
+        symbolic NLP is not constructed at all.
+
         """
         self.current_iteration = iteration
-        self.create_iteration_specific_symbols()
-        self.generate_objective_function_callable()
-        self.generate_objective_function_gradient_callable()
-        self.generate_constraint_function_callable()
-        self.generate_jacobian_constraint_function_callable()
+        nlp_key = self.nlp_construction_key(iteration.mesh)
+        if nlp_key != self.nlp_key_iter:
+            self.nlp_key_iter = nlp_key
+            self.nlp_solver = None
+            self.nlp_library_path_iter = self.nlp_library_path(iteration.mesh)
+            library_path = self.nlp_library_path_iter
+            if library_path is not None and library_path.is_file():
+                self.load_iteration_functions(library_path)
+            else:
+                self.generate_symbolic_nlp()
+        self.create_iteration_specific_variable_scaling_mappings()
+        self.generate_iteration_callables()
+
+    def generate_symbolic_nlp(self):
+        """Construct the symbolic NLP and the iteration's functions."""
+        if self.ocp.settings.node_function_mode == MAP:
+            self.create_iteration_specific_mapped_symbols()
+            self.generate_mapped_objective_function()
+            self.generate_objective_function_gradient()
+            self.generate_mapped_constraint_function()
+        else:
+            self.create_iteration_specific_symbols()
+            self.generate_objective_function()
+            self.generate_objective_function_gradient()
+            self.generate_constraint_function()
+        self.generate_jacobian_constraint_function()
+        args = [self.x_var_iter, self.p_var_iter]
+        exprs = {"J": self.J_iter,
+                 "g": self.g_iter,
+                 "c": self.c_iter,
+                 "G": self.G_iter,
+                 "dy": self.dy_iter}
+        self.iteration_functions = {name: ca.Function(f"{name}_p",
+                                                      args,
+                                                      [exprs[name]])
+                                    for name in ITERATION_FUNCTIONS}
+
+    def load_iteration_functions(self, library_path):
+        """Load the iteration's functions from a compiled shared library."""
+        self.create_parameter_slices()
+        self.iteration_functions = {name: ca.external(f"{name}_p",
+                                                      str(library_path))
+                                    for name in ITERATION_FUNCTIONS}
+
+    def nlp_construction_key(self, mesh):
+        """Key identifying the symbolic NLP constructed for a mesh."""
+        settings = self.ocp.settings
+        mesh_key = tuple(tuple(tau) for tau in mesh.tau)
+        return (settings.compile_nlp_functions,
+                settings.node_function_mode,
+                settings.map_parallelisation,
+                settings.quadrature_method,
+                settings.collocation_matrix_form,
+                mesh_key)
 
     def create_iteration_specific_symbols(self):
         """Abstraction layer for creating iteration-specific symbols.
@@ -1429,8 +1778,8 @@ class Casadi(BackendABC):
 
         """
         self.create_iteration_specific_variable_symbols()
-        self.create_iteration_specific_variable_scaling_mappings()
         self.create_iteration_specific_constraint_scaling_symbols()
+        self.create_iteration_specific_parameter_symbols()
 
     def create_iteration_specific_variable_symbols(self):
         """Create iteration specific variabiel symbols."""
@@ -1494,26 +1843,86 @@ class Casadi(BackendABC):
         W.extend(W_e)
         self.W_iter = ca.vertcat(*W)
 
-    def generate_objective_function_callable(self):
-        """Compile a callable function to evaluate J."""
+    def create_iteration_specific_parameter_symbols(self):
+        """Collect the NLP parameter symbols.
+
+        The NLP parameters are, in order: (1) the objective function scaling,
+        (2) the constraint scaling, (3) the variable stretch and shift values,
+        and (4) the values of constant variables.
+
+        """
+        self.V_r_iter = ca.vertcat(*self.V_x_var, *self.r_x_var)
+        self.aux_iter = ca.vertcat(*self.bounds.aux_data.keys())
+        self.p_var_iter = ca.vertcat(self.w_J_iter,
+                                     self.W_iter,
+                                     self.V_r_iter,
+                                     self.aux_iter)
+        self.create_parameter_slices()
+
+    def create_parameter_slices(self):
+        """Slices to each category of NLP parameter."""
+        self.w_J_slice = slice(0, 1)
+        self.W_slice = slice(self.w_J_slice.stop,
+                             self.w_J_slice.stop + self.num_c)
+        num_V_r = 2 * len(self.V_x_var)
+        self.V_r_slice = slice(self.W_slice.stop, self.W_slice.stop + num_V_r)
+        num_aux = len(self.bounds.aux_data)
+        self.aux_slice = slice(self.V_r_slice.stop,
+                               self.V_r_slice.stop + num_aux)
+        self.num_p = self.aux_slice.stop
+
+    def create_iteration_specific_mapped_symbols(self):
+        """Create iteration-specific symbols for mapped node functions.
+
+        When phase equations are mapped over the collocation nodes the NLP is
+        constructed as a CasADi MX expression graph rather than an SX one. MX
+        functions require purely symbolic inputs so a single vector of NLP
+        variables and a single vector of NLP parameters are created. OCP
+        variables are then accessed as slices of these vectors.
+
+        """
+        iteration = self.current_iteration
+        self.x_var_iter = ca.MX.sym("x", iteration.num_x)
+        point_index = []
+        zipped = zip(self.p,
+                     iteration.mesh.N,
+                     iteration.y_slices,
+                     iteration.q_slices,
+                     iteration.t_slices)
+        for p, N, y_slice, q_slice, t_slice in zipped:
+            for i in range(p.num_y_var):
+                point_index.append(y_slice.start + i * N)
+                point_index.append(y_slice.start + (i + 1) * N - 1)
+            point_index.extend(range(q_slice.start, q_slice.stop))
+            point_index.extend(range(t_slice.start, t_slice.stop))
+        s_slice = iteration.s_slice
+        point_index.extend(range(s_slice.start, s_slice.stop))
+        self.x_point_var_iter = self.x_var_iter[point_index]
+        self.create_parameter_slices()
+        self.p_var_iter = ca.MX.sym("p", self.num_p)
+        self.w_J_iter = self.p_var_iter[self.w_J_slice]
+        self.W_iter = self.p_var_iter[self.W_slice]
+        self.V_r_iter = self.p_var_iter[self.V_r_slice]
+        self.aux_iter = self.p_var_iter[self.aux_slice]
+
+    def generate_objective_function(self):
+        """Construct J."""
         J = self.w_J_iter * self.J
-        subs = dict_merge(self.ocp_iter_sym_point_mapping,
-                          self.V_sym_val_mapping_iter,
-                          self.r_sym_val_mapping_iter)
-        self.J_iter = casadi_substitute(J, subs)
-        args = ca.vertcat(self.x_var_iter,
-                          self.w_J_iter)
-        self.J_iter_scale_callable = ca.Function("J", [args], [self.J_iter])
-
-    def generate_objective_function_gradient_callable(self):
-        """Compile a callable function to evaluate g."""
+        self.J_iter = casadi_substitute(J, self.ocp_iter_sym_point_mapping)
+
+    def generate_mapped_objective_function(self):
+        """Construct J from point variables."""
+        J = self.J_point_function(self.x_point_var_iter,
+                                  self.V_r_iter,
+                                  self.aux_iter)
+        self.J_iter = self.w_J_iter * J
+
+    def generate_objective_function_gradient(self):
+        """Construct g."""
         self.g_iter = ca.gradient(self.J_iter, self.x_var_iter)
-        args = ca.vertcat(self.x_var_iter,
-                          self.w_J_iter)
-        self.g_iter_scale_callable = ca.Function("g", [args], [self.g_iter])
 
-    def generate_constraint_function_callable(self):
-        """Compile a function to evaluate c.
+    def generate_constraint_function(self):
+        """Construct c.
 
         Generate the iteration-specific constraint vector. The involves
         constructing the iteration-specific: (1) defect constraints, (2) path
@@ -1574,7 +1983,10 @@ class Casadi(BackendABC):
         def make_defect_constraints(all_phase_mapping, mesh):
             """Constraint all defect constraints for the mesh iteration."""
             c_d = []
-            for p, A_mat, I_mat in zip(self.p, mesh.sA_matrix, mesh.sI_matrix):
+            zipped = zip(self.p,
+                         mesh.sC_state_matrix,
+                         mesh.sC_dynamics_matrix)
+            for p, state_mat, dynamics_mat in zipped:
                 c = []
                 phase_mapping = all_phase_mapping[p]
                 W_d_phase = self.W_iter_mapping[p]["d"]
@@ -1595,14 +2007,15 @@ class Casadi(BackendABC):
                                                           y_eqn,
                                                           t0,
                                                           tF,
-                                                          A_mat,
-                                                          I_mat))
+                                                          state_mat,
+                                                          dynamics_mat))
                 c_d.append(c)
             return c_d
 
-        def make_defect_constraint(y, y_eqn, t0, tF, A, I):
+        def make_defect_constraint(y, y_eqn, t0, tF, state_mat, dynamics_mat):
             """Construct a defect constraint from components."""
-            return ca.mtimes(A, y) + 0.5 * (tF - t0) * ca.mtimes(I, y_eqn)
+            return (ca.mtimes(state_mat, y)
+                    + 0.5 * (tF - t0) * ca.mtimes(dynamics_mat, y_eqn))
 
         def make_path_constraints(all_phase_mapping):
             """Constraint all path constraints for the mesh iteration."""
@@ -1660,39 +2073,271 @@ class Casadi(BackendABC):
         dy = make_state_derivatives(all_phase_mapping,
                                     self.current_iteration.mesh)
         c = make_constraints(all_phase_mapping, self.current_iteration.mesh)
-        subs = dict_merge(self.ocp_iter_sym_point_mapping,
-                          self.V_sym_val_mapping_iter,
-                          self.r_sym_val_mapping_iter,
-                          self.bounds.aux_data)
+        subs = self.ocp_iter_sym_point_mapping
         self.dy_iter = casadi_substitute(dy, subs)
-        self.dy_iter_callable = ca.Function("dy",
-                                            [self.x_var_iter],
-                                            [self.dy_iter])
         self.c_iter = casadi_substitute(c, subs)
-        args = ca.vertcat(self.x_var_iter,
-                          self.W_iter)
-        self.c_iter_scale_callable = ca.Function("c", [args], [self.c_iter])
 
-    def generate_jacobian_constraint_function_callable(self):
-        """Compile a callable function to evaluate G."""
+    def generate_mapped_constraint_function(self):
+        """Construct c using mapped node functions.
+
+        Rather than substituting each phase's state equations, path
+        constraints and integrands once per collocation node, a single
+        per-node CasADi function is created for each phase and evaluated over
+        all of the phase's collocation nodes using :meth:`casadi.Function.map`.
+        The expression graph therefore grows with the size of the phase
+        equations rather than with the product of their size and the number
+        of mesh nodes. The constraint vector produced is identical in ordering
+        to that produced by :meth:`generate_constraint_function`.
+
+        """
+        iteration = self.current_iteration
+        mesh = iteration.mesh
+        x = self.x_var_iter
+        V_r = self.V_r_iter
+        aux = self.aux_iter
+        dy = []
+        c = []
+        zipped = zip(self.p,
+                     mesh.N,
+                     mesh.sC_state_matrix,
+                     mesh.sC_dynamics_matrix,
+                     mesh.W_matrix,
+                     iteration.y_slices,
+                     iteration.u_slices,
+                     iteration.q_slices,
+                     iteration.t_slices)
+        for p, N, state_mat, dynamics_mat, W_mat, *slices in zipped:
+            y_slice, u_slice, q_slice, t_slice = slices
+            node_fnc = self.phase_node_functions[p.i]
+            point_fnc = self.phase_point_functions[p.i]
+            y = ca.reshape(x[y_slice], N, p.num_y_var)
+            u = ca.reshape(x[u_slice], N, p.num_u_var)
+            z = ca.vertcat(x[q_slice], x[t_slice], x[iteration.s_slice])
+            node_fnc_map = self.map_node_function(node_fnc, N)
+            c_node, y_unscaled = node_fnc_map(y.T, u.T, z, V_r, aux)
+            c_node = c_node.T
+            y_unscaled = y_unscaled.T
+            y_eqn = c_node[:, p.y_eqn_slice]
+            p_con = c_node[:, p.p_con_slice]
+            q_fnc = c_node[:, p.q_fnc_slice]
+            stretch, q_unscaled = point_fnc(z, V_r, aux)
+            W = self.W_iter[self.phase_c_slices[p.i]]
+            W_d = W[p.y_eqn_slice].T
+            W_p = W[p.p_con_slice].T
+            W_i = W[p.q_fnc_slice]
+            c_d = (ca.mtimes(state_mat, y_unscaled)
+                   + stretch * ca.mtimes(dynamics_mat, y_eqn))
+            c_i = q_unscaled - stretch * ca.mtimes(q_fnc.T, W_mat)
+            dy.append(ca.vec(y_eqn))
+            c.append(ca.vec(c_d * ca.repmat(W_d, c_d.size1(), 1)))
+            c.append(ca.vec(p_con * ca.repmat(W_p, N, 1)))
+            c.append(c_i * W_i)
+        W_e = self.W_iter[self.c_endpoint_slice]
+        b_con = self.b_point_function(self.x_point_var_iter, V_r, aux)
+        c.append(W_e * b_con)
+        self.dy_iter = ca.vertcat(*dy)
+        self.c_iter = ca.vertcat(*c)
+
+    def map_node_function(self, node_fnc, N):
+        """Map a phase node function over a phase's collocation nodes.
+
+        The integral, time and static parameter variables, the variable
+        stretch and shift values, and the values of constant variables are
+        shared by all nodes. For serial and OpenMP evaluation these are passed
+        once as non-repeated inputs. For multithreaded evaluation CasADi's
+        thread map does not support non-repeated inputs, so these are
+        broadcast across the nodes instead, and evaluation is spread over (at
+        most) as many threads as there are CPUs.
+
+        """
+        parallelisation = self.ocp.settings.map_parallelisation
+        if parallelisation == THREAD:
+            return node_fnc.map(N, THREAD, os.cpu_count() or 1)
+        return node_fnc.map(f"{node_fnc.name()}_map",
+                            parallelisation,
+                            N,
+                            [2, 3, 4],
+                            [])
+
+    def generate_jacobian_constraint_function(self):
+        """Construct G."""
         self.G_iter = ca.jacobian(self.c_iter, self.x_var_iter)
-        args = ca.vertcat(self.x_var_iter,
-                          self.W_iter)
-        self.G_iter_scale_callable = ca.Function("G", [args], [self.G_iter])
+
+    def generate_iteration_callables(self):
+        """Compile the callables used to compute scaling and solutions.
+
+        The iteration scaling evaluates the objective, constraints and their
+        derivatives with a single vector of the NLP variables followed by
+        the objective or constraint scaling factors. All other NLP parameters
+        take their values for the current mesh iteration.
+
+        """
+        self.J_iter_scale_callable = self.make_scale_callable("J",
+                                                              self.w_J_slice)
+        self.g_iter_scale_callable = self.make_scale_callable("g",
+                                                              self.w_J_slice)
+        self.c_iter_scale_callable = self.make_scale_callable("c",
+                                                              self.W_slice)
+        self.G_iter_scale_callable = self.make_scale_callable("G",
+                                                              self.W_slice)
+        self.dy_iter_callable = self.make_scale_callable("dy")
+
+    def make_scale_callable(self, name, scale_slice=None):
+        """Compile a callable of the variables concatenated with scaling.
+
+        The parameters in `scale_slice` are taken from the callable's
+        argument following the NLP variables. Other parameters are fixed to
+        their values for the current mesh iteration, with objective and
+        constraint scaling factors of one. CasADi MX functions only accept
+        purely symbolic inputs so the concatenated argument is split within
+        a wrapping function.
+
+        """
+        fnc = self.iteration_functions[name]
+        p = ca.DM(self.nlp_parameter_values())
+        num_x = self.current_iteration.num_x
+        if scale_slice is None:
+            args = ca.MX.sym("args", num_x)
+            return ca.Function(name, [args], [fnc(args, p)])
+        num_scale = scale_slice.stop - scale_slice.start
+        args = ca.MX.sym("args", num_x + num_scale)
+        p = ca.vertcat(p[:scale_slice.start],
+                       args[num_x:],
+                       p[scale_slice.stop:])
+        return ca.Function(name, [args], [fnc(args[:num_x], p)])
+
+    def nlp_parameter_values(self, w=1.0, W=None):
+        """Values of the NLP parameters for the current mesh iteration."""
+        scaling = self.current_iteration.scaling
+        if W is None:
+            W = np.ones(self.num_c)
+        aux = np.array(list(self.bounds.aux_data.values()), dtype=np.float64)
+        return np.concatenate([[w], W, scaling.V_ocp, scaling.r_ocp, aux])
 
     def create_nlp_solver(self):
-        """Create CasADi NLP solver interface to IPOPT."""
-        x_iter = self.x_var_iter
-        J_subs = {self.w_J_iter: self.current_iteration.scaling.w}
-        J_iter = casadi_substitute(self.J_iter, J_subs)
-        c_subs = {}
-        for i, W_val in enumerate(self.current_iteration.scaling.W_ocp):
-            c_subs.update({self.W_iter[i]: W_val})
-        c_iter = casadi_substitute(self.c_iter, c_subs)
-        nlp = {"x": x_iter, "f": J_iter, "g": c_iter}
+        """Create CasADi NLP solver interface to IPOPT.
+
+        If the symbolic NLP has not been reconstructed for this mesh
+        iteration and the solver settings are unchanged, then the existing
+        solver is reused and only the values of the NLP parameters are
+        updated.
+
+        """
+        scaling = self.current_iteration.scaling
+        self.p_iter = self.nlp_parameter_values(scaling.w, scaling.W_ocp)
         ipopt_settings = self.create_nlp_solver_settings()
         settings = {"ipopt": ipopt_settings}
-        self.nlp_solver = ca.nlpsol("solver", "ipopt", nlp, settings)
+        solver_key = (settings, self.ocp.settings.compile_nlp_functions)
+        if self.nlp_solver is not None and solver_key == self.solver_key_iter:
+            return
+        self.solver_key_iter = solver_key
+        if self.ocp.settings.compile_nlp_functions:
+            self.nlp_solver = self.create_compiled_nlp_solver(settings)
+        else:
+            nlp = {"x": self.x_var_iter,
+                   "p": self.p_var_iter,
+                   "f": self.J_iter,
+                   "g": self.c_iter}
+            self.nlp_solver = ca.nlpsol("solver", "ipopt", nlp, settings)
+
+    def create_compiled_nlp_solver(self, settings):
+        """Create NLP solver from NLP functions compiled to a shared library.
+
+        The NLP functions required by IPOPT (objective, constraints, their
+        derivatives and the Hessian of the Lagrangian), as well as the
+        iteration's functions used for scaling and post-processing, are
+        generated as C code, compiled with the local C compiler and loaded
+        back in to the solver. Shared libraries are cached on disk (see
+        :meth:`nlp_library_path`) so that an identical NLP skips symbolic
+        construction, derivative generation and compilation entirely.
+
+        Each mesh iteration's NLP is a separate library, and compiling one
+        can take far longer than solving it (minutes for meshes with
+        thousands of nodes). Compilation therefore only pays off when the
+        same problems are solved repeatedly with a warm cache.
+
+        """
+        library_path = self.nlp_library_path_iter
+        if library_path.is_file():
+            msg = "NLP functions loaded from cache."
+        else:
+            nlp = {"x": self.x_var_iter,
+                   "p": self.p_var_iter,
+                   "f": self.J_iter,
+                   "g": self.c_iter}
+            nlp_solver = ca.nlpsol("solver", "ipopt", nlp, settings)
+            self.compile_nlp_functions(nlp_solver,
+                                       self.iteration_functions.values(),
+                                       library_path)
+            msg = "NLP functions compiled."
+        if self.ocp.settings.console_out_progress:
+            console_out(msg)
+        return ca.nlpsol("solver", "ipopt", str(library_path), settings)
+
+    def nlp_library_path(self, mesh):
+        """Path of the cached shared library of compiled NLP functions.
+
+        Returns None if NLP functions are not compiled.
+
+        """
+        if not self.ocp.settings.compile_nlp_functions:
+            return None
+        key = self.nlp_function_cache_key(mesh)
+        cache_dir = Path(self.ocp.settings.nlp_function_cache_directory)
+        return cache_dir.expanduser() / f"nlp_{key}.so"
+
+    def nlp_function_cache_key(self, mesh):
+        """Hash uniquely identifying compiled NLP functions.
+
+        The key is derived, before the NLP is constructed, from the
+        serialised mesh-independent functions (which capture the OCP
+        equations), the mesh, the settings affecting how the NLP is
+        constructed and which functions are generated, and the CasADi
+        version and compiler used to generate them.
+
+        """
+        functions = [*self.phase_node_functions,
+                     *self.phase_point_functions,
+                     self.J_point_function,
+                     self.b_point_function]
+        hasher = hashlib.sha256()
+        for fnc in functions:
+            hasher.update(fnc.serialize().encode())
+        hasher.update(repr(self.nlp_construction_key(mesh)).encode())
+        hasher.update(repr([list(N_K) for N_K in mesh.N_K]).encode())
+        hasher.update(str(self.ocp.settings.derivative_level).encode())
+        hasher.update(ca.__version__.encode())
+        hasher.update(os.environ.get("CC", "gcc").encode())
+        hasher.update(" ".join(C_COMPILER_FLAGS).encode())
+        return hasher.hexdigest()[:32]
+
+    @staticmethod
+    def compile_nlp_functions(nlp_solver, functions, library_path):
+        """Generate C code for NLP functions and compile it.
+
+        The functions of the NLP solver (including its oracle) and the other
+        `functions` are compiled in to a single shared library. The shared
+        library is compiled to a temporary file and then moved in
+        to place so that concurrent solves of the same NLP sharing a cache
+        never load a partially written library.
+
+        """
+        library_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=library_path.parent) as tmp_dir:
+            code_generator = ca.CodeGenerator(library_path.stem,
+                                              {"with_header": False})
+            code_generator.add(nlp_solver.oracle())
+            for fnc_name in nlp_solver.get_function():
+                code_generator.add(nlp_solver.get_function(fnc_name))
+            for fnc in functions:
+                code_generator.add(fnc)
+            c_path = code_generator.generate(f"{tmp_dir}{os.sep}")
+            tmp_library_path = Path(tmp_dir) / library_path.name
+            compiler = os.environ.get("CC", "gcc")
+            cmd = [compiler, *C_COMPILER_FLAGS, c_path, "-o",
+                   str(tmp_library_path)]
+            subprocess.run(cmd, check=True, capture_output=True)
+            os.replace(tmp_library_path, library_path)
 
     def create_nlp_solver_settings(self):
         """Create settings for CasADi IPOPT NLP solver.
@@ -1701,40 +2346,70 @@ class Casadi(BackendABC):
         to match the overridden settings used by Cyipopt which have been
         amended for good performance in solving NLPs for OCPs.
 
+        If the derivative level is 2 then IPOPT uses the exact (sparse)
+        Hessian of the Lagrangian generated by CasADi, otherwise a
+        limited-memory quasi-Newton approximation is used.
+
         """
-        warm_start = "yes" if self.ocp.settings.warm_start else "no"
         ipopt_settings = {"tol": self.ocp.settings.nlp_tolerance,
                           "max_iter": self.ocp.settings.max_nlp_iterations,
                           "linear_solver": self.ocp.settings.linear_solver,
                           "mu_strategy": "adaptive",
                           "mu_min": 1e-11,
-                          "warm_start_init_point": warm_start,
+                          "warm_start_init_point": "no",
                           }
+        if self.current_iteration.guess_lam_x is not None:
+            ipopt_settings.update(self.create_warm_start_settings())
+        if self.ocp.settings.derivative_level == 1:
+            ipopt_settings["hessian_approximation"] = "limited-memory"
         return ipopt_settings
 
+    def create_warm_start_settings(self):
+        """Create IPOPT settings for a primal-dual warm start.
+
+        The initial point is only minimally pushed away from the bounds so
+        that the interpolated primal and dual guesses are preserved. The
+        adaptive barrier update strategy is kept: restarting the monotone
+        strategy from the final barrier parameter of the previous mesh
+        iteration needs more IPOPT iterations as the interpolated point is
+        not close enough to the central path on the new mesh.
+
+        """
+        warm_start_settings = {
+            "warm_start_init_point": "yes",
+            "warm_start_bound_push": WARM_START_BOUND_PUSH,
+            "warm_start_bound_frac": WARM_START_BOUND_PUSH,
+            "warm_start_slack_bound_push": WARM_START_BOUND_PUSH,
+            "warm_start_slack_bound_frac": WARM_START_BOUND_PUSH,
+            "warm_start_mult_bound_push": WARM_START_BOUND_PUSH,
+        }
+        return warm_start_settings
+
     def evaluate_J(self, x):
         """Evaluate `J` at a point `x` using CasADi compiled function."""
-        return float(self.nlp_solver.get_function("nlp_f")(x, False))
+        return float(self.nlp_solver.get_function("nlp_f")(x, self.p_iter))
 
     def evaluate_g(self, x):
         """Evaluate `g` at a point `x` using CasADi compiled function."""
-        g = np.array(self.nlp_solver.get_function("nlp_grad_f")(x, False)[1]).squeeze()
+        nlp_grad_f = self.nlp_solver.get_function("nlp_grad_f")
+        g = np.array(nlp_grad_f(x, self.p_iter)[1]).squeeze()
         return g
 
     def evaluate_c(self, x):
         """Evaluate `c` at a point `x` using CasADi compiled function."""
-        c = np.array(self.nlp_solver.get_function("nlp_g")(x, False)).squeeze()
+        c = np.array(self.nlp_solver.get_function("nlp_g")(x, self.p_iter)).squeeze()
         return c
 
     def evaluate_G(self, x):
         """Evaluate `G` at a point `x` using CasADi compiled function.
 
-        This returns `G` as a sparse matrix, the form expected by Pycollo, but
-        which is a different form to what CasADi will naturally produce.
+        This returns `G` as a sparse matrix, the form expected by Pycollo. It
+        is constructed directly from CasADi's compressed column storage so
+        `G` is never densified.
 
         """
-        G = self.nlp_solver.get_function("nlp_jac_g")(x, False)[1]
-        sG = sparse.coo_matrix(np.array(G))
+        G = self.nlp_solver.get_function("nlp_jac_g")(x, self.p_iter)[1]
+        sG = casadi_sparse_to_scipy(G).tocoo()
         return sG
 
     def evaluate_G_nonzeros(self, x):
@@ -1743,7 +2418,7 @@ class Casadi(BackendABC):
         This returns just the nonzero values of `G`.
 
         """
-        G = self.nlp_solver.get_function("nlp_jac_g")(x, False)[1].nonzeros()
+        G = self.nlp_solver.get_function("nlp_jac_g")(x, self.p_iter)[1].nonzeros()
         return G
 
     def evaluate_G_structure(self):
@@ -1753,13 +2428,8 @@ class Casadi(BackendABC):
         expected by Pycollo.
 
         """
-        G = self.nlp_solver.get_function("nlp_jac_g").sx_out()[1]
-        arg_1 = range(G.size2())
-        arg_2 = np.diff(np.array(G.colind(), dtype=int))
-        zipped = zip(arg_1, arg_2)
-        iterable = (itertools.repeat(*args) for args in zipped)
-        col_indices = np.array(list(itertools.chain.from_iterable(iterable)))
-        row_indices = np.array(G.row(), dtype=int)
+        G = self.nlp_solver.get_function("nlp_jac_g").sparsity_out(1)
+        row_indices, col_indices = casadi_sparsity_indices(G)
         return (row_indices, col_indices)
 
     def evaluate_G_num_nonzero(self):
@@ -1768,43 +2438,57 @@ class Casadi(BackendABC):
         This returns just the number of nonzero elements in `G`.
 
         """
-        G = self.nlp_solver.get_function("nlp_jac_g").sx_out()[1]
+        G = self.nlp_solver.get_function("nlp_jac_g").sparsity_out(1)
         nnz = G.nnz()
         return nnz
 
     def evaluate_H(self, x, obj, l):
         """Evaluate `H` at a point `x` using CasADi compiled function.
 
-        This returns `H` as a sparse matrix, the form expected by Pycollo, but
-        which is a different form to what CasADi will naturally produce.
+        `H` is the Hessian of the scaled Lagrangian, with objective factor
+        `obj` and constraint multipliers `l`. This returns the lower triangle
+        of `H` as a sparse matrix, the form expected by Pycollo, but which is
+        a different form to what CasADi will naturally produce (the upper
+        triangle).
 
         """
-        raise NotImplementedError
+        H = self.nlp_solver.get_function("nlp_hess_l")(x, self.p_iter, obj, l)
+        sH = casadi_sparse_to_scipy(H, transpose=True).tocoo()
+        return sH
 
-    def evaluate_H_nonzeros(self, x):
+    def evaluate_H_nonzeros(self, x, obj, l):
         """Evaluate `H` at a point `x` using CasADi compiled function.
 
-        This returns just the nonzero values of `H`.
+        This returns just the nonzero values of the lower triangle of `H`,
+        ordered as per :meth:`evaluate_H_structure`.
 
         """
-        raise NotImplementedError
+        H = self.nlp_solver.get_function("nlp_hess_l")(x, self.p_iter, obj, l)
+        return H.nonzeros()
 
     def evaluate_H_structure(self):
         """Evaluate the structure of `H` using CasADi compiled function.
 
-        This returns just the row and column indices of `H` in the form
-        expected by Pycollo.
+        This returns just the row and column indices of the lower triangle of
+        `H` in the form expected by Pycollo. CasADi produces the upper
+        triangle column-wise so it is transposed here without reordering the
+        nonzeros.
 
         """
-        raise NotImplementedError
+        H = self.nlp_solver.get_function("nlp_hess_l").sparsity_out(0)
+        col_indices, row_indices = casadi_sparsity_indices(H)
+        return (row_indices, col_indices)
 
     def evaluate_H_num_nonzero(self):
         """Evaluate number of nonzeros in `H` using CasADi compiled function.
 
-        This returns just the number of nonzero elements in `H`.
+        This returns just the number of nonzero elements in the lower
+        triangle of `H`.
 
         """
-        raise NotImplementedError
+        H = self.nlp_solver.get_function("nlp_hess_l").sparsity_out(0)
+        nnz = H.nnz()
+        return nnz
 
     def solve_nlp(self):
         """Solve the NLP.
@@ -1815,16 +2499,25 @@ class Casadi(BackendABC):
             Named tuple including the solution, solution info, and solve time.
 
         """
+        iteration = self.current_iteration
+        nlp_solver_input = {"x0": iteration.guess_x,
+                            "p": self.p_iter,
+                            "lbx": iteration.x_bnd_l,
+                            "ubx": iteration.x_bnd_u,
+                            "lbg": iteration.c_bnd_l,
+                            "ubg": iteration.c_bnd_u}
+        if iteration.guess_lam_x is not None:
+            scaling = iteration.scaling
+            nlp_solver_input["lam_x0"] = scaling.scale_lam_x(
+                iteration.guess_lam_x)
+            nlp_solver_input["lam_g0"] = scaling.scale_lam_g(
+                iteration.guess_lam_g)
         nlp_start_time = timer()
-        nlp_solver_output = self.nlp_solver(x0=self.current_iteration.guess_x,
-                                            lbx=self.current_iteration.x_bnd_l,
-                                            ubx=self.current_iteration.x_bnd_u,
-                                            lbg=self.current_iteration.c_bnd_l,
-                                            ubg=self.current_iteration.c_bnd_u)
+        nlp_solver_output = self.nlp_solver(**nlp_solver_input)
         nlp_stop_time = timer()
         nlp_solve_time = nlp_stop_time - nlp_start_time
         nlp_result = NlpResult(solution=nlp_solver_output,
-                               info=None,
+                               info=self.nlp_solver.stats(),
                                solve_time=nlp_solve_time)
         return nlp_result
 
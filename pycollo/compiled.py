@@ -11,8 +11,7 @@ from .utils import console_out
 
 DIFFERENTIAL = "differential"
 INTEGRAL = "integral"
-COLLOCATION_MATRIX_FORMS = Options((DIFFERENTIAL, INTEGRAL), default=INTEGRAL,
-                                   unsupported=DIFFERENTIAL)
+COLLOCATION_MATRIX_FORMS = Options((DIFFERENTIAL, INTEGRAL), default=INTEGRAL)
 
 
 class CompiledFunctions:
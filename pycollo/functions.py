@@ -1,8 +1,19 @@
+import collections
+import hashlib
+import weakref
+
+import numpy as np
 import sympy as sym
-from scipy.interpolate import CubicSpline, PPoly
+from scipy.interpolate import BSpline, CubicSpline, NdBSpline, PPoly, make_interp_spline
 import math
 import typing
 
+def is_equispaced(points, abs_tol=1e-9)->bool:
+    """Whether a sequence of (at least 2) points is equally spaced"""
+    spacing = points[1] - points[0]
+    return all(math.isclose(x2 - x1, spacing, abs_tol=abs_tol)
+               for x1, x2 in zip(points[:-1], points[1:]))
+
 class Segwise(sym.Function):
     """Piecewise function for sequential linear segments.
 
@@ -39,13 +50,11 @@ class Segwise(sym.Function):
                 raise ValueError("One or more segments are in an incorrect format")
             raise v
 
-        segment_spacing = equations[1][1]-equations[0][1]
         # check upper bounds
         for i,(eq,ub) in enumerate(equations[:-1]):
             if ub>equations[i+1][1]:
                 raise ValueError(f"Segment {i} has a higher upper bound than segment {i+1}")
-            if not math.isclose(equations[i+1][1]-ub,segment_spacing,abs_tol=1e-9):
-                equispaced=False
+        equispaced = equispaced and is_equispaced([ub for eq,ub in equations])
 
         obj = super().__new__(*args,**kwargs)
         obj._equispaced = equispaced
@@ -82,6 +91,14 @@ class Segwise(sym.Function):
         return Segwise(sub_arg,*self.args[1:])
     def _eval_derivative(self, s):
         return sym.diff(self.args[0],s)*self.__class__(self.args[0],*((sym.diff(eq,self.s),ub) for eq,ub in self.args[1:]))
+    def as_piecewise(self, argument=None):
+        """Equivalent sympy Piecewise (at argument, by default this Segwise's argument)"""
+        x = self.args[0] if argument is None else argument
+        segments = [(eq.subs(self.s,x),x<=ub) for eq,ub in self.args[1:-1]]
+        return sym.Piecewise(*segments,(self.args[-1][0].subs(self.s,x),True))
+    def _numpycode(self, printer):
+        # lambdify(..., "numpy") prints the Piecewise as a vectorised numpy.select
+        return printer._print(self.as_piecewise())
     #readonly property
     @property
     def equispaced(self):
@@ -127,6 +144,9 @@ class CyclicSegwise(Segwise):
                 if ub>=sub_arg:
                     return eq.subs(self.s,sub_arg)
         return CyclicSegwise(sub_arg,*self.args[1:])
+    def as_piecewise(self, argument=None):
+        x = self.args[0] if argument is None else argument
+        return super().as_piecewise(sym.Mod(x,self._wrap))
     #readonly property
     @property
     def equispaced(self):
@@ -135,16 +155,83 @@ class CyclicSegwise(Segwise):
     def _wrap(self):
         return self.args[-1][1]
 class _PPolyStash(object):
-    """hides ppoly instances from sympy"""
+    """hides ppoly (and lookup table) instances from sympy
+
+    Entries are keyed by a hash of their contents, so identical splines share one entry (and one index), and are
+    evicted once no live expression refers to them"""
     def __init__(self):
         self._cache = {}
-        self._next = 0
+        self._derived = {}
+        self._references = collections.Counter()
+    @staticmethod
+    def _content_hash(ppoly)->int:
+        if isinstance(ppoly, TensorSpline):
+            arrays = ppoly.knots + (ppoly.coefficients,)
+            extra = ppoly.degrees
+        else:
+            arrays = (ppoly.x, ppoly.c)
+            extra = (type(ppoly).__name__, ppoly.extrapolate)
+        content = hashlib.blake2b(repr(extra).encode(), digest_size=8)
+        for array in arrays:
+            array = np.ascontiguousarray(array, dtype=float)
+            content.update(repr(array.shape).encode())
+            content.update(array.tobytes())
+        return int.from_bytes(content.digest(), "big")
     def register_poly(self,ppoly:PPoly)->int:
-        self._cache[self._next] = ppoly
-        self._next+=1
-        return self._next-1
+        idx = self._content_hash(ppoly)
+        self._cache.setdefault(idx, ppoly)
+        return idx
+    def track(self, expression, idx:int):
+        """Keep the entry for idx alive for as long as expression is"""
+        if not getattr(expression, "_stash_tracked", False):
+            expression._stash_tracked = True
+            self._references[idx] += 1
+            weakref.finalize(expression, self._release, idx)
+    def _release(self, idx:int):
+        self._references[idx] -= 1
+        if self._references[idx] <= 0:
+            del self._references[idx]
+            self._cache.pop(idx, None)
+            self._derived.pop(idx, None)
+    def derived(self, idx:int, name:str, factory:typing.Callable):
+        """Object derived from an entry (e.g. a compiled lookup function), created once and evicted with the entry"""
+        derived = self._derived.setdefault(int(idx), {})
+        if name not in derived:
+            derived[name] = factory()
+        return derived[name]
+    def __contains__(self, item):
+        return int(item) in self._cache
+    def __len__(self):
+        return len(self._cache)
     def __getitem__(self, item):
-        return self._cache[item]
+        return self._cache[int(item)]
+class _StashImplementation(object):
+    """NumPy implementation of a stashed function, used by lambdify
+
+    lambdify looks up _imp_ on the function class when it builds its namespace, which returns the implementation
+    bound to the entries stashed at that time. The lambdified function therefore holds the objects it refers to, and
+    keeps working after the expressions (and so the stash entries) are garbage collected"""
+    def __init__(self, stash_name:str, implementation_name:str):
+        self._stash_name = stash_name
+        self._implementation_name = implementation_name
+    def __get__(self, instance, owner):
+        stash = getattr(owner, self._stash_name)
+        implementation = getattr(owner, self._implementation_name)
+        return _BoundStashImplementation(stash, implementation)
+class _BoundStashImplementation(object):
+    def __init__(self, stash:_PPolyStash, implementation:typing.Callable):
+        self._stash = stash
+        self._entries = dict(stash._cache)
+        self._implementation = implementation
+    def __call__(self, *args):
+        return self._implementation(self._entries, *args)
+    def __eq__(self, other):
+        # lambdify rejects a function with two unequal implementations in one expression
+        if not isinstance(other, _BoundStashImplementation):
+            return NotImplemented
+        return self._stash is other._stash and self._implementation == other._implementation
+    def __hash__(self):
+        return hash((id(self._stash), self._implementation))
 class PolynomialSpline(sym.Function):
     """Increased performance spline via "data smuggling"?"""
     nargs=2
@@ -156,27 +243,32 @@ class PolynomialSpline(sym.Function):
         ppoly = args[2]
         if not isinstance(expression, sym.Basic):
             raise ValueError("PolynomialSpline's first argument must a sympy expression")
-        if not isinstance(ppoly,PPoly):
-            raise ValueError("PolynomialSpline's second argument must a scipy PPoly")
-        idx = cls.poly_cache.register_poly(ppoly)
-        equispace = ppoly.x[1] - ppoly.x[0]
-        for x1, x2 in zip(ppoly.x[:-1], ppoly.x[1:]):
-            if not math.isclose((x2 - x1), equispace):
-                equispaced = False
-                break
+        if isinstance(ppoly, (int, sym.Integer)):
+            # rebuilt by sympy (e.g. during CSE) from an already-stashed ppoly
+            idx = int(ppoly)
+            ppoly = cls.poly_cache[idx]
+        elif isinstance(ppoly,PPoly):
+            idx = cls.poly_cache.register_poly(ppoly)
         else:
-            equispaced = True
+            raise ValueError("PolynomialSpline's second argument must a scipy PPoly")
+        equispaced = is_equispaced(ppoly.x)
         obj = super().__new__(cls,expression,idx)
         obj._equispaced=equispaced
+        cls.poly_cache.track(obj, idx)
         return obj
     def _eval_subs(self, old, new):
         sub_arg = self.args[0].subs(old,new)
         if sub_arg.is_Number:
             return self._ppoly(sub_arg)
-        return self.__class__(sub_arg,self._ppoly)
+        return self.__class__(sub_arg,self.args[1])
     def _eval_derivative(self, s):
         derivative = self.__class__(self.args[0],self._ppoly.derivative())
         return sym.diff(self.args[0],s)*derivative
+    @staticmethod
+    def _numpy_implementation(entries, x, idx):
+        """NumPy implementation, used by lambdify (vectorised over x)"""
+        return entries[int(idx)](x)
+    _imp_ = _StashImplementation("poly_cache", "_numpy_implementation")
     #readonly property
     @property
     def equispaced(self):
@@ -190,9 +282,106 @@ class CyclicPolynomialSpline(PolynomialSpline):
         if sub_arg.is_Number:
             return self._ppoly(sub_arg % self._wrap)
         return super()._eval_subs(old,new)
+    @staticmethod
+    def _numpy_implementation(entries, x, idx):
+        ppoly = entries[int(idx)]
+        return ppoly(np.mod(x, ppoly.x[-1]-ppoly.x[0]))
     @property
     def _wrap(self):
         return self._ppoly.x[-1]-self._ppoly.x[0]
+class TensorSpline(object):
+    """Tensor product B-spline of gridded data, held outside sympy.
+
+    Arguments outside the grid are clamped to it, so the table is held constant beyond its edges."""
+    def __init__(self, knots, coefficients:np.ndarray, degrees):
+        self.knots = tuple(np.asarray(t, dtype=float) for t in knots)
+        self.coefficients = coefficients
+        self.degrees = tuple(int(k) for k in degrees)
+        self.bounds = tuple((t[k], t[-k-1]) for t, k in zip(self.knots, self.degrees))
+        self._ndbspline = NdBSpline(self.knots, self.coefficients, self.degrees)
+    @classmethod
+    def interpolate(cls, grid, values, degree:int):
+        """Interpolating (not-a-knot) tensor spline of values on a (strictly increasing) grid"""
+        grid = tuple(np.asarray(g, dtype=float) for g in grid)
+        coefficients = np.array(values, dtype=float)
+        if coefficients.shape != tuple(len(g) for g in grid):
+            raise ValueError(f"Lookup table values of shape {coefficients.shape} do not match a grid of shape {tuple(len(g) for g in grid)}")
+        knots = []
+        for axis, g in enumerate(grid):
+            if len(g) <= degree:
+                raise ValueError(f"Lookup table grid {axis} requires at least {degree+1} points")
+            if np.any(np.diff(g) <= 0):
+                raise ValueError(f"Lookup table grid {axis} is not strictly increasing")
+            spline = make_interp_spline(g, np.moveaxis(coefficients, axis, 0), k=degree)
+            coefficients = np.moveaxis(spline.c, 0, axis)
+            knots.append(spline.t)
+        return cls(knots, coefficients, [degree]*len(grid))
+    @property
+    def ndim(self)->int:
+        return len(self.knots)
+    def derivative(self, axis:int)->"TensorSpline":
+        """Derivative of the spline with respect to one argument"""
+        t, k = self.knots[axis], self.degrees[axis]
+        spline = BSpline(t, np.moveaxis(self.coefficients, axis, 0), k).derivative()
+        coefficients = np.moveaxis(spline.c[:len(spline.t)-k], 0, axis)
+        knots = self.knots[:axis] + (spline.t,) + self.knots[axis+1:]
+        degrees = self.degrees[:axis] + (k-1,) + self.degrees[axis+1:]
+        return TensorSpline(knots, coefficients, degrees)
+    def __call__(self, *args):
+        """Evaluate at (broadcast) numerical arguments"""
+        args = np.broadcast_arrays(*(np.asarray(arg, dtype=float) for arg in args))
+        points = np.stack([np.clip(arg, lb, ub) for arg, (lb, ub) in zip(args, self.bounds)], axis=-1)
+        return self._ndbspline(points)
+class LookupTable(sym.Function):
+    """N-dimensional lookup table of gridded data via "data smuggling".
+
+    arguments: LookupTable(table_index, argument_1, ..., argument_n)"""
+    nargs=None
+    table_cache = _PPolyStash()
+    def __new__(cls, *args, **kwargs):
+        obj = super().__new__(cls, *args, **kwargs)
+        if isinstance(obj, LookupTable):
+            cls.table_cache.track(obj, int(obj.args[0]))
+        return obj
+    @classmethod
+    def eval(cls, idx, *args):
+        if not isinstance(idx, sym.Integer):
+            raise ValueError("LookupTable's first argument must be a table index")
+        if len(args) != cls.table_cache[int(idx)].ndim:
+            raise ValueError(f"LookupTable requires {cls.table_cache[int(idx)].ndim} arguments")
+        if all(arg.is_Number for arg in args):
+            return sym.Float(float(cls.table_cache[int(idx)](*(float(arg) for arg in args))))
+    def fdiff(self, argindex=1):
+        if argindex == 1:
+            return sym.S.Zero
+        derivative = self._table.derivative(argindex-2)
+        return self.func(self.table_cache.register_poly(derivative), *self.args[1:])
+    @staticmethod
+    def _numpy_implementation(entries, idx, *args):
+        """NumPy implementation, used by lambdify (vectorised over broadcast arguments)"""
+        return entries[int(idx)](*args)
+    _imp_ = _StashImplementation("table_cache", "_numpy_implementation")
+    @property
+    def _table(self)->TensorSpline:
+        return self.table_cache[int(self.args[0])]
+
+def lookup_table(x, grid, values, method: typing.Literal["linear", "cubic"] = "cubic"):
+    """Create a lookup table interpolating gridded data
+
+    x is an expression (1D) or sequence of expressions (ND), grid is the corresponding 1D array or sequence of 1D
+    arrays of grid points and values is an array of shape (len(grid_1), ..., len(grid_n)). Arguments outside the grid
+    are clamped to it."""
+    if isinstance(x, sym.Basic):
+        x = (x, )
+        grid = (grid, )
+    if len(x) != len(grid):
+        raise ValueError(f"Lookup table has {len(grid)} grid dimensions but {len(x)} arguments")
+    degrees = {"linear": 1, "cubic": 3}
+    if method not in degrees:
+        raise ValueError(f"Lookup table method must be one of {tuple(degrees)}")
+    table = TensorSpline.interpolate(grid, values, degrees[method])
+    return LookupTable(LookupTable.table_cache.register_poly(table), *x)
+
 def cubic_spline(x, x_data, y_data, bounds: typing.Literal["natural", "not-a-knot", "periodic", "clamped"] = "natural"):
     """Create a cubic spline
 
@@ -122,6 +122,8 @@ class Guess:
         self.p = phase_guesses
         self.endpoint = endpoint_guess
         self.settings = self.backend.ocp.settings
+        self.multipliers = None
+        self.mesh_index_boundaries = None
         self.generate()
 
     def generate(self):
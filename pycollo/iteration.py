@@ -3,7 +3,6 @@
 
 import collections
 import csv
-import itertools
 import json
 from timeit import default_timer as timer
 
@@ -17,8 +16,10 @@ import sympy as sym
 from pyproprop import processed_property
 
 from .guess import (PhaseGuess, EndpointGuess, Guess)
+from .layout import VariableLayout
 from .mesh import Mesh
 from .nlp import initialise_nlp_backend
+from .quadrature import lagrange_basis
 from .scaling import IterationScaling
 from .utils import console_out, format_time
 
@@ -77,6 +78,7 @@ class Iteration:
     def initialise(self):
         """Abstraction layer for all steps in initialising iteration."""
         self.console_out_initialising_iteration()
+        self.create_layouts()
         self.interpolate_guess_to_mesh(self.prev_guess)
         self.create_variable_constraint_counts_slices()
         self.initialise_scaling()
@@ -101,15 +103,22 @@ class Iteration:
             iteration, the initial guess generated from user-supplied info.
 
         """
-        def interpolate_to_new_mesh(prev_tau, tau, num_vars, prev, N):
+        def interpolate_to_new_mesh(prev_tau, tau, prev, prev_boundaries,
+                                    spectral=True):
             """Iterpolate previous mesh to new mesh.
 
-            Linear interpolation is used. Bounding errors in the interpolation
-            are allowed to accomdate for small numerical floating point errors.
-            This should never cause a problem as the data used here is
-            generated by the Pycollo backend and should be correctly processed.
-            Fill values are extrapolated again to accommodate small floating
-            point errors.
+            If the previous guess is the solution on a previous mesh and
+            `spectral` is True, each of its mesh sections is interpolated by
+            the Lagrange polynomial through its nodes, which is the polynomial
+            approximation used in the collocation, so the accuracy of the
+            solution is retained. The polynomials are evaluated by barycentric
+            interpolation, batched over all new nodes lying in previous mesh
+            sections with the same number of nodes, and clipped to the range
+            of the section's nodal values so that they cannot overshoot the
+            previous solution (or its bounds) near discontinuities. Otherwise
+            (i.e. for the user-supplied initial guess, or for controls, which
+            may be discontinuous) linear interpolation is used. Fill values
+            are extrapolated to accommodate small floating point errors.
 
             Parameters
             ----------
@@ -118,30 +127,47 @@ class Iteration:
                 iteration mesh.
             tau : np.ndarray
                 The nondimensionalised temporal discretisation of the new mesh.
-            num_vars : int
-                Number of a specific type of variable being interpolated.
             prev : np.ndarray
-                The guess on the previous mesh discretisation.
-            N : int
-                Number of temporal nodes in the new discretisation.
+                The guess on the previous mesh discretisation, with one row
+                per variable.
+            prev_boundaries : Optional[np.ndarray]
+                Indexes of the mesh section boundaries in `prev_tau`, or None
+                if the previous guess is not on a mesh.
+            spectral : bool
+                Whether a previous guess on a mesh is interpolated by its
+                sections' Lagrange polynomials.
 
             Returns
             -------
             np.ndarray
                 The iterpolated guess for a specific variable category.
 
-            Notes
-            -----
-            Replace `interpolate.interp1d(**kwargs) with a functools.partial().
-
             """
-            new_guess = np.empty((num_vars, N))
-            for index, row in enumerate(prev):
+            if prev.shape[0] == 0:
+                return np.empty((0, tau.size))
+            if prev_boundaries is None or not spectral:
                 interp_func = interpolate.interp1d(prev_tau,
-                                                   row,
+                                                   prev,
+                                                   axis=1,
                                                    bounds_error=False,
                                                    fill_value="extrapolate")
-                new_guess[index, :] = interp_func(tau)
+                return interp_func(tau)
+            prev_N_K = np.diff(prev_boundaries) + 1
+            section_tau = prev_tau[prev_boundaries]
+            sections = np.searchsorted(section_tau, tau, side="right") - 1
+            sections = np.clip(sections, 0, len(prev_N_K) - 1)
+            section_N_K = prev_N_K[sections]
+            new_guess = np.empty((prev.shape[0], tau.size))
+            for N_k in np.unique(section_N_K):
+                is_in_block = section_N_K == N_k
+                node_inds = (prev_boundaries[sections[is_in_block], np.newaxis]
+                             + np.arange(N_k))
+                basis = lagrange_basis(prev_tau[node_inds], tau[is_in_block])
+                prev_nodes = prev[:, node_inds]
+                new_guess[:, is_in_block] = np.clip(
+                    np.einsum("ijk,jk->ij", prev_nodes, basis),
+                    prev_nodes.min(axis=2),
+                    prev_nodes.max(axis=2))
             return new_guess
 
         time_guess_start = timer()
@@ -155,45 +181,45 @@ class Iteration:
         zipped = zip(self.guess_tau, self.guess_stretch, self.guess_shift)
         self.guess_time = [tau * stretch + shift
                            for tau, stretch, shift in zipped]
+        prev_mesh_index_boundaries = prev_guess.mesh_index_boundaries
+        if prev_mesh_index_boundaries is None:
+            prev_mesh_index_boundaries = [None] * len(self.backend.p)
         zipped = zip(prev_guess.tau,
                      self.guess_tau,
-                     self.backend.p,
                      prev_guess.y,
-                     self.mesh.N)
+                     prev_mesh_index_boundaries)
         self.guess_y = [interpolate_to_new_mesh(prev_tau,
                                                 tau,
-                                                p.num_y_var,
                                                 prev_y,
-                                                N)
-                        for prev_tau, tau, p, prev_y, N in zipped]
+                                                prev_boundaries)
+                        for prev_tau, tau, prev_y, prev_boundaries in zipped]
         zipped = zip(prev_guess.tau,
                      self.guess_tau,
-                     self.backend.p,
                      prev_guess.u,
-                     self.mesh.N)
+                     prev_mesh_index_boundaries)
         self.guess_u = [interpolate_to_new_mesh(prev_tau,
                                                 tau,
-                                                p.num_u_var,
                                                 prev_u,
-                                                N)
-                        for prev_tau, tau, p, prev_u, N in zipped]
+                                                prev_boundaries,
+                                                spectral=False)
+                        for prev_tau, tau, prev_u, prev_boundaries in zipped]
         self.guess_q = prev_guess.q
         self.guess_t = prev_guess.t
         self.guess_s = prev_guess.s
 
-        self.guess_x = []
-        zipped = zip(self.guess_y,
+        guess_values = {(None, "s"): self.guess_s}
+        zipped = zip(self.backend.p,
+                     self.guess_y,
                      self.guess_u,
                      self.guess_q,
                      self.guess_t)
-        for y, u, q, t in zipped:
-            self.guess_x.extend(y.tolist())
-            self.guess_x.extend(u.tolist())
-            self.guess_x.extend([q.tolist()])
-            self.guess_x.extend([t.tolist()])
-        self.guess_x.extend([self.guess_s.tolist()])
-        guess_x_chained = itertools.chain.from_iterable(self.guess_x)
-        self.guess_x = np.array(list(guess_x_chained))
+        for p, y, u, q, t in zipped:
+            guess_values.update({(p.i, "y"): y,
+                                 (p.i, "u"): u,
+                                 (p.i, "q"): q,
+                                 (p.i, "t"): t})
+        self.guess_x = self.x_layout.pack(guess_values)
+        self.interpolate_multipliers_to_mesh(prev_guess.multipliers)
 
         time_guess_stop = timer()
         self._time_guess_interpolation = time_guess_stop - time_guess_start
@@ -201,6 +227,80 @@ class Iteration:
                f"{format_time(self._time_guess_interpolation)}.")
         console_out(msg)
 
+    def interpolate_multipliers_to_mesh(self, prev_multipliers):
+        """Interpolate the previous NLP multipliers to the new mesh.
+
+        Multipliers associated with temporal nodes scale with the quadrature
+        weight of the node, and multipliers associated with defect
+        constraints scale with the mesh spacing. These are therefore
+        converted to densities before being interpolated and converted back
+        on the new mesh. Multipliers at the phase endpoints (which include
+        those for state endpoint bounds), and those not associated with the
+        temporal discretisation, are carried over directly.
+
+        Parameters
+        ----------
+        prev_multipliers : Optional[NlpMultipliers]
+            The multipliers (in the user basis) from the solution on the
+            previous mesh, or None if these are not available.
+
+        """
+        def interpolate_density(prev_tau, tau, prev, prev_weight, weight,
+                                keep_endpoints=True):
+            """Interpolate multipliers as a density over the new mesh."""
+            if prev.shape[0] == 0:
+                return np.empty((0, tau.size))
+            density = np.divide(prev,
+                                prev_weight,
+                                out=np.zeros_like(prev),
+                                where=(prev_weight != 0))
+            interp_func = interpolate.interp1d(prev_tau,
+                                               density,
+                                               axis=1,
+                                               bounds_error=False,
+                                               fill_value="extrapolate")
+            new_multipliers = interp_func(tau) * weight
+            if keep_endpoints:
+                new_multipliers[:, 0] = prev[:, 0]
+                new_multipliers[:, -1] = prev[:, -1]
+            return new_multipliers
+
+        if prev_multipliers is None:
+            self.guess_lam_x = None
+            self.guess_lam_g = None
+            return
+        lam_x = []
+        lam_g = []
+        zipped = zip(prev_multipliers.tau,
+                     self.mesh.tau,
+                     prev_multipliers.W,
+                     self.mesh.W_matrix,
+                     prev_multipliers.h,
+                     self.mesh.h,
+                     range(len(self.backend.p)))
+        for prev_tau, tau, prev_W, W, prev_h, h, i in zipped:
+            lam_y = interpolate_density(prev_tau, tau, prev_multipliers.y[i],
+                                        prev_W, W)
+            lam_u = interpolate_density(prev_tau, tau, prev_multipliers.u[i],
+                                        prev_W, W)
+            lam_defect = interpolate_density(prev_tau[1:], tau[1:],
+                                             prev_multipliers.defect[i],
+                                             prev_h, h, keep_endpoints=False)
+            lam_path = interpolate_density(prev_tau, tau,
+                                           prev_multipliers.path[i],
+                                           prev_W, W)
+            lam_x.extend([lam_y.flatten(),
+                          lam_u.flatten(),
+                          prev_multipliers.q[i],
+                          prev_multipliers.t[i]])
+            lam_g.extend([lam_defect.flatten(),
+                          lam_path.flatten(),
+                          prev_multipliers.integral[i]])
+        lam_x.append(prev_multipliers.s)
+        lam_g.append(prev_multipliers.endpoint)
+        self.guess_lam_x = np.concatenate(lam_x)
+        self.guess_lam_g = np.concatenate(lam_g)
+
     def create_variable_constraint_counts_slices(self):
         """Abstraction layer for slices of variables and constraints.
 
@@ -212,6 +312,7 @@ class Iteration:
         self.create_constraint_counts_per_phase_and_total()
         self.create_constraint_slices_per_phase()
         self.create_constraint_component_function_slices_per_phase()
+        self.create_variable_constraint_index_maps()
 
     def create_variable_counts_per_phase_and_total(self):
         """Counts of all variable categories per phase and overall totals."""
@@ -242,32 +343,41 @@ class Iteration:
                           self.num_t,
                           self.num_s])
 
+    def create_layouts(self):
+        """Layouts of the NLP variables and constraints vectors.
+
+        Created once per iteration, as soon as its mesh is known, and used
+        for the guess, slices, index maps and multipliers.
+
+        """
+        self.create_variable_layout()
+        self.create_constraint_layout()
+
+    def create_variable_layout(self):
+        """Layout of the variables in the NLP variables vector (`x`).
+
+        Each phase's state and control variables (at all temporal nodes),
+        integral variables and time variables are followed by the static
+        parameter variables.
+
+        """
+        self.x_layout = VariableLayout()
+        for p, N in zip(self.backend.p, self.mesh.N):
+            self.x_layout.add(p.i, "y", (p.num_y_var, N))
+            self.x_layout.add(p.i, "u", (p.num_u_var, N))
+            self.x_layout.add(p.i, "q", (p.num_q_var, ))
+            self.x_layout.add(p.i, "t", (p.num_t_var, ))
+        self.x_layout.add(None, "s", (self.backend.num_s_var, ))
+
     def create_variable_slices_per_phase(self):
         """Slices to each variable category per phase from all variables."""
-        self.y_slices = []
-        self.u_slices = []
-        self.q_slices = []
-        self.t_slices = []
-        self.x_slices = []
-        total = 0
-        zipped = zip(self.num_y_per_phase,
-                     self.num_u_per_phase,
-                     self.num_q_per_phase,
-                     self.num_t_per_phase,
-                     self.num_x_per_phase)
-        for num_y, num_u, num_q, num_t, num_x in zipped:
-            y_slice = slice(total, total + num_y)
-            u_slice = slice(y_slice.stop, y_slice.stop + num_u)
-            q_slice = slice(u_slice.stop, u_slice.stop + num_q)
-            t_slice = slice(q_slice.stop, q_slice.stop + num_t)
-            x_slice = slice(y_slice.start, t_slice.stop)
-            self.y_slices.append(y_slice)
-            self.u_slices.append(u_slice)
-            self.q_slices.append(q_slice)
-            self.t_slices.append(t_slice)
-            self.x_slices.append(x_slice)
-            total += num_x
-        self.s_slice = slice(self.num_x - self.num_s, self.num_x)
+        phase_numbers = [p.i for p in self.backend.p]
+        self.y_slices = [self.x_layout.slice(i, "y") for i in phase_numbers]
+        self.u_slices = [self.x_layout.slice(i, "u") for i in phase_numbers]
+        self.q_slices = [self.x_layout.slice(i, "q") for i in phase_numbers]
+        self.t_slices = [self.x_layout.slice(i, "t") for i in phase_numbers]
+        self.x_slices = [self.x_layout.phase_slice(i) for i in phase_numbers]
+        self.s_slice = self.x_layout.slice(None, "s")
 
     def create_constraint_counts_per_phase_and_total(self):
         """Counts of all constraint categories per phase and overall totals."""
@@ -297,29 +407,34 @@ class Iteration:
                           self.num_c_integral,
                           self.num_c_endpoint])
 
+    def create_constraint_layout(self):
+        """Layout of the constraints in the NLP constraints vector (`c`).
+
+        Each phase's defect constraints (per state equation, at all mesh
+        section nodes bar the first), path constraints (at all temporal
+        nodes) and integral constraints are followed by the endpoint
+        constraints.
+
+        """
+        self.c_layout = VariableLayout()
+        zipped = zip(self.backend.p, self.mesh.N, self.mesh.num_c_defect_per_y)
+        for p, N, num_c_defect_per_y in zipped:
+            self.c_layout.add(p.i, "defect", (p.num_y_eqn, num_c_defect_per_y))
+            self.c_layout.add(p.i, "path", (p.num_p_con, N))
+            self.c_layout.add(p.i, "integral", (p.num_q_fnc, ))
+        self.c_layout.add(None, "endpoint", (self.backend.num_b_con, ))
+
     def create_constraint_slices_per_phase(self):
         """Slices to each variable category per phase for all constraints."""
-        self.c_defect_slices = []
-        self.c_path_slices = []
-        self.c_integral_slices = []
-        self.c_slices = []
-        total = 0
-        zipped = zip(self.num_c_defect_per_phase,
-                     self.num_c_path_per_phase,
-                     self.num_c_integral_per_phase,
-                     self.num_c_per_phase)
-        for num_c_defect, num_c_path, num_c_integral, num_c in zipped:
-            c_defect_start = total
-            c_path_start = c_defect_start + num_c_defect
-            c_integral_start = c_path_start + num_c_path
-            c_con_stop = c_integral_start + num_c_integral
-            self.c_defect_slices.append(slice(c_defect_start, c_path_start))
-            self.c_path_slices.append(slice(c_path_start, c_integral_start))
-            self.c_integral_slices.append(slice(c_integral_start, c_con_stop))
-            self.c_slices.append(slice(c_defect_start, c_con_stop))
-            total += num_c
-        self.c_endpoint_slice = slice(self.num_c - self.num_c_endpoint,
-                                      self.num_c)
+        phase_numbers = [p.i for p in self.backend.p]
+        self.c_defect_slices = [self.c_layout.slice(i, "defect")
+                                for i in phase_numbers]
+        self.c_path_slices = [self.c_layout.slice(i, "path")
+                              for i in phase_numbers]
+        self.c_integral_slices = [self.c_layout.slice(i, "integral")
+                                  for i in phase_numbers]
+        self.c_slices = [self.c_layout.phase_slice(i) for i in phase_numbers]
+        self.c_endpoint_slice = self.c_layout.slice(None, "endpoint")
 
     def create_constraint_component_function_slices_per_phase(self):
         """Slices to different types of constraint component functions.
@@ -349,6 +464,52 @@ class Iteration:
             self.q_fnc_slices.append(slice(q_fnc_start, c_con_stop))
             dy_total += num_y
 
+    def create_variable_constraint_index_maps(self):
+        """Index maps from OCP variables and constraints to the NLP.
+
+        `x_ocp_index` holds, for each NLP variable, the index of the OCP
+        variable it is a value of, and `c_ocp_index` the same for each NLP
+        constraint, so that any per-OCP-variable or per-OCP-constraint
+        quantity (bounds, scales, shifts) is expanded to the mesh by a single
+        `np.take`. `y_t0_index` and `y_tF_index` are the indexes of the NLP
+        variables for the states at the start and end of each phase.
+
+        """
+        ocp_x_index = np.arange(self.backend.num_var)
+        ocp_c_index = np.arange(self.backend.num_c)
+        x_ocp_index = []
+        c_ocp_index = []
+        y_t0_index = []
+        y_tF_index = []
+        zipped = zip(self.backend.p,
+                     self.mesh.N,
+                     self.mesh.num_c_defect_per_y,
+                     self.y_slices)
+        for p, N, num_c_defect_per_y, y_slice in zipped:
+            ocp_y_index = ocp_x_index[self.backend.phase_y_var_slices[p.i]]
+            ocp_u_index = ocp_x_index[self.backend.phase_u_var_slices[p.i]]
+            ocp_q_index = ocp_x_index[self.backend.phase_q_var_slices[p.i]]
+            ocp_t_index = ocp_x_index[self.backend.phase_t_var_slices[p.i]]
+            x_ocp_index.extend([np.repeat(ocp_y_index, N),
+                                np.repeat(ocp_u_index, N),
+                                ocp_q_index,
+                                ocp_t_index])
+            ocp_d_index = ocp_c_index[self.backend.phase_y_eqn_slices[p.i]]
+            ocp_p_index = ocp_c_index[self.backend.phase_p_con_slices[p.i]]
+            ocp_i_index = ocp_c_index[self.backend.phase_q_fnc_slices[p.i]]
+            c_ocp_index.extend([np.repeat(ocp_d_index, num_c_defect_per_y),
+                                np.repeat(ocp_p_index, N),
+                                ocp_i_index])
+            y_t0 = np.arange(y_slice.start, y_slice.stop, N)
+            y_t0_index.append(y_t0)
+            y_tF_index.append(y_t0 + N - 1)
+        x_ocp_index.append(ocp_x_index[self.backend.s_var_slice])
+        c_ocp_index.append(ocp_c_index[self.backend.c_endpoint_slice])
+        self.x_ocp_index = np.concatenate(x_ocp_index)
+        self.c_ocp_index = np.concatenate(c_ocp_index)
+        self.y_t0_index = np.concatenate(y_t0_index)
+        self.y_tF_index = np.concatenate(y_tF_index)
+
     def initialise_scaling(self):
         """Initialise iteration-specific scaling.
 
@@ -415,41 +576,23 @@ class Iteration:
 
     def generate_variable_bounds(self):
         """Generate bounds for the NLP variables."""
-        bnds = []
-        for p, N in zip(self.backend.p, self.mesh.N):
-            p_bnds = p.ocp_phase.bounds
-            y_bnds = p_bnds._y_bnd[p_bnds._y_needed]
-            y_t0_bnds = p_bnds._y_t0_bnd[p_bnds._y_needed]
-            y_tF_bnds = p_bnds._y_tF_bnd[p_bnds._y_needed]
-            u_bnds = p_bnds._u_bnd[p_bnds._u_needed]
-            q_bnds = p_bnds._q_bnd[p_bnds._q_needed]
-            t_bnds = p_bnds._t_bnd[p_bnds._t_needed]
-            for y_bnd, y_t0_bnd, y_tF_bnd in zip(y_bnds, y_t0_bnds, y_tF_bnds):
-                bnds.extend([y_t0_bnd] + [y_bnd] * (N - 2) + [y_tF_bnd])
-            for u_bnd in u_bnds:
-                bnds.extend([u_bnd] * N)
-            bnds.extend(q_bnds)
-            bnds.extend(t_bnds)
-        s_bnds = self.ocp.bounds._s_bnd[self.ocp.bounds._s_needed]
-        bnds.extend(s_bnds)
-        bnds = np.array(bnds)
+        bnds = np.take(self.backend.bounds.x_bnd, self.x_ocp_index, axis=0)
+        bnds[self.y_t0_index] = self.backend.bounds.y_t0_bnd
+        bnds[self.y_tF_index] = self.backend.bounds.y_tF_bnd
         self.x_bnd_l = bnds[:, 0]
         self.x_bnd_u = bnds[:, 1]
 
     def generate_constraint_bounds(self):
         """Generate bounds for the NLP constraints."""
-        bnds = []
-        zipped = zip(self.backend.p,
-                     self.mesh.N,
-                     self.num_c_defect_per_phase,
-                     self.num_c_integral_per_phase)
-        for p, N, num_c_defect, num_c_integral in zipped:
-            bnds.extend([np.array((0, 0))] * num_c_defect)
-            for c_bnd in p.ocp_phase.bounds._p_con_bnd:
-                bnds.extend([c_bnd] * N)
-            bnds.extend([np.array((0, 0))] * num_c_integral)
-        bnds.extend(self.backend.ocp.bounds._b_con_bnd)
-        bnds = np.array(bnds)
+        ocp_bnds = []
+        for p in self.backend.p:
+            p_con_bnds = p.ocp_phase.bounds._p_con_bnd
+            ocp_bnds.extend([np.zeros((p.num_y_eqn, 2)),
+                             np.reshape(p_con_bnds, (-1, 2)),
+                             np.zeros((p.num_q_fnc, 2))])
+        b_con_bnds = self.backend.ocp.bounds._b_con_bnd
+        ocp_bnds.append(np.reshape(b_con_bnds, (-1, 2)))
+        bnds = np.take(np.vstack(ocp_bnds), self.c_ocp_index, axis=0)
         self.c_bnd_l = bnds[:, 0]
         self.c_bnd_u = bnds[:, 1]
 
@@ -544,6 +687,10 @@ class Iteration:
         phase_guesses = self.collect_next_mesh_iteration_phase_guesses()
         endpoint_guess = self.collect_next_mesh_iteration_endpoint_guess()
         next_guess = Guess(self.backend, phase_guesses, endpoint_guess)
+        next_guess.mesh_index_boundaries = self.mesh.mesh_index_boundaries
+        if self.ocp.settings.warm_start:
+            multipliers = self.collect_next_mesh_iteration_multipliers()
+            next_guess.multipliers = multipliers
         return next_guess
 
     def collect_next_mesh_iteration_phase_guesses(self):
@@ -590,6 +737,48 @@ class Iteration:
         endpoint_guess.parameter_variables = self.solution._s
         return endpoint_guess
 
+    def collect_next_mesh_iteration_multipliers(self):
+        """Collect the NLP multipliers for warm-starting the next iteration.
+
+        Multipliers are split by variable and constraint category, and those
+        associated with temporal nodes or defect constraints are reshaped
+        to have one row per OCP variable or equation.
+
+        Returns
+        -------
+        Optional[NlpMultipliers]
+            The multipliers in the user basis, or None if the backend does
+            not supply multipliers.
+
+        """
+        lam_x = getattr(self.solution, "_lam_x", None)
+        lam_g = getattr(self.solution, "_lam_g", None)
+        if lam_x is None or lam_g is None:
+            return None
+        lam_x = np.atleast_1d(lam_x)
+        lam_g = np.atleast_1d(lam_g)
+        y = []
+        u = []
+        q = []
+        t = []
+        defect = []
+        path = []
+        integral = []
+        for p in self.backend.p:
+            y.append(self.x_layout.view(lam_x, p.i, "y"))
+            u.append(self.x_layout.view(lam_x, p.i, "u"))
+            q.append(self.x_layout.view(lam_x, p.i, "q"))
+            t.append(self.x_layout.view(lam_x, p.i, "t"))
+            defect.append(self.c_layout.view(lam_g, p.i, "defect"))
+            path.append(self.c_layout.view(lam_g, p.i, "path"))
+            integral.append(self.c_layout.view(lam_g, p.i, "integral"))
+        s = self.x_layout.view(lam_x, None, "s")
+        endpoint = self.c_layout.view(lam_g, None, "endpoint")
+        multipliers = NlpMultipliers(self.mesh.tau, self.mesh.W_matrix,
+                                     self.mesh.h, y, u, q, t, s, defect, path,
+                                     integral, endpoint)
+        return multipliers
+
     def check_if_mesh_tolerance_met(self, next_iter_mesh):
         """Summary
 
@@ -659,6 +848,10 @@ mesh_iteration_result_fields = ("mesh_tolerance_met",
                                 "next_iteration_guess")
 MeshIterationResult = collections.namedtuple("MeshIterationResult",
                                              mesh_iteration_result_fields)
+nlp_multipliers_fields = ("tau", "W", "h", "y", "u", "q", "t", "s",
+                          "defect", "path", "integral", "endpoint")
+NlpMultipliers = collections.namedtuple("NlpMultipliers",
+                                        nlp_multipliers_fields)
 
 
 
@@ -0,0 +1,116 @@
+"""Layout of the OCP variables and constraints in flat NLP vectors.
+
+Attributes
+----------
+LayoutBlock : collections.namedtuple
+    Position (`slice`) of a block within a flat vector and the `shape` of the
+    block's values.
+
+"""
+
+
+import collections
+
+import numpy as np
+
+
+__all__ = ["VariableLayout"]
+
+
+LayoutBlock = collections.namedtuple("LayoutBlock", ("slice", "shape"))
+
+
+class VariableLayout:
+    """Named blocks of a flat NLP vector.
+
+    Each block holds all values of one kind of variable (or constraint) for a
+    phase, or for the whole problem with a phase of `None`. Blocks of values
+    at temporal nodes have shape `(num_variables, num_nodes)`, with the
+    values of each variable contiguous, and all other blocks have shape
+    `(num_variables, )`. Blocks are laid out contiguously in the order in
+    which they are added, so a block or a single variable of any vector
+    with this layout is available as a NumPy view, without copying.
+
+    """
+
+    def __init__(self):
+        self._blocks = {}
+        self._phase_slices = {}
+        self.size = 0
+
+    def add(self, phase, kind, shape):
+        """Append a block to the layout and return its slice."""
+        shape = tuple(int(dim) for dim in shape)
+        stop = self.size + int(np.prod(shape))
+        block_slice = slice(self.size, stop)
+        self._blocks[(phase, kind)] = LayoutBlock(block_slice, shape)
+        phase_start = self._phase_slices.get(phase, block_slice).start
+        self._phase_slices[phase] = slice(phase_start, stop)
+        self.size = stop
+        return block_slice
+
+    def slice(self, phase, kind):
+        """Slice of a block within a flat vector."""
+        return self._blocks[(phase, kind)].slice
+
+    def shape(self, phase, kind):
+        """Shape of a block's values."""
+        return self._blocks[(phase, kind)].shape
+
+    def phase_slice(self, phase):
+        """Slice spanning all blocks of a phase within a flat vector."""
+        return self._phase_slices[phase]
+
+    def view(self, vector, phase, kind, variable=None):
+        """View of a block, or of one of its variables, within a vector.
+
+        Parameters
+        ----------
+        vector : np.ndarray
+            Flat vector with this layout.
+        phase : Optional[int]
+            Phase number, or None for problem-level blocks.
+        kind : str
+            Kind of variable or constraint in the block.
+        variable : Optional[int]
+            Index of a single variable within the block.
+
+        Returns
+        -------
+        np.ndarray
+            View in to `vector`, so writing to it modifies `vector`.
+
+        """
+        block = self._blocks[(phase, kind)]
+        block_view = vector[block.slice].reshape(block.shape)
+        if variable is None:
+            return block_view
+        return block_view[variable]
+
+    def empty(self):
+        """Uninitialised flat vector with this layout."""
+        return np.empty(self.size)
+
+    def pack(self, values, out=None):
+        """Pack values for blocks in to a flat vector.
+
+        Parameters
+        ----------
+        values : Mapping[Tuple[Optional[int], str], np.ndarray]
+            Values of blocks keyed by phase and kind. Values are broadcast to
+            the block's shape.
+        out : Optional[np.ndarray]
+            Flat vector to pack in to. If not given, a new one is allocated
+            with zeros for any blocks not in `values`.
+
+        Returns
+        -------
+        np.ndarray
+            The flat vector.
+
+        """
+        if out is None:
+            out = np.zeros(self.size)
+        for (phase, kind), block_values in values.items():
+            self.view(out, phase, kind)[...] = block_values
+        return out
@@ -3,6 +3,8 @@ from typing import (Iterable, Optional, )
 import numpy as np
 import scipy.sparse as sparse
 
+from .compiled import DIFFERENTIAL
+
 
 class PhaseMesh:
 
@@ -213,6 +215,8 @@ class Mesh:
         self.sA_matrix = []
         self.A_index_array = []
         self.D_index_array = []
+        self.sC_state_matrix = []
+        self.sC_dynamics_matrix = []
         for p in self.p:
             data = self.generate_single_phase(p)
             self.tau.append(data[0])
@@ -229,112 +233,115 @@ class Mesh:
             self.sA_matrix.append(data[11])
             self.A_index_array.append(data[12])
             self.D_index_array.append(data[13])
+            if self.settings.collocation_matrix_form == DIFFERENTIAL:
+                sC_state_matrix, sC_dynamics_matrix = (
+                    self.generate_differential_matrices(p, data))
+            else:
+                sC_state_matrix, sC_dynamics_matrix = data[11], data[10]
+            self.sC_state_matrix.append(sC_state_matrix)
+            self.sC_dynamics_matrix.append(sC_dynamics_matrix)
 
     def generate_single_phase(self, p):
+        """Generate the mesh and collocation matrices of a single phase.
+
+        Mesh sections are grouped by their number of nodes so that the
+        points, matrix triplets and weights of all sections of the same
+        order are produced by a few array operations, rather than one
+        section at a time. All arrays are laid out section by section.
+
+        """
+        N_K = np.asarray(p.number_mesh_section_nodes, dtype=int)
 
         # Check that the number of collocation points in each mesh sections is bounded by the minimum and maximum values set in settings.
-        for i_sec, col_points in enumerate(p.number_mesh_section_nodes):
-            if col_points < self.settings.collocation_points_min:
-                msg = (f"The number of collocation points, {col_points}, in mesh section {i_sec} must be greater than or equal to {self.ocp.settings._col_points_min}.")
-                raise ValueError(msg)
-            if col_points > self.settings.collocation_points_max:
-                msg = (f"The number of collocation points, {col_points}, in mesh section {i_sec} must be less than or equal to {self.ocp._settings._col_points_max}.")
-                raise ValueError(msg)
+        col_points_min = self.settings.collocation_points_min
+        col_points_max = self.settings.collocation_points_max
+        too_few = np.flatnonzero(N_K < col_points_min)
+        if too_few.size:
+            i_sec = too_few[0]
+            msg = (f"The number of collocation points, {N_K[i_sec]}, in mesh section {i_sec} must be greater than or equal to {col_points_min}.")
+            raise ValueError(msg)
+        too_many = np.flatnonzero(N_K > col_points_max)
+        if too_many.size:
+            i_sec = too_many[0]
+            msg = (f"The number of collocation points, {N_K[i_sec]}, in mesh section {i_sec} must be less than or equal to {col_points_max}.")
+            raise ValueError(msg)
 
         # Generate the mesh based on using the quadrature method defined by the problem's `Settings` class.
-        section_boundaries = [self._TAU_0]
-        for index, fraction in enumerate(p.mesh_section_sizes):
-            step = self._PERIOD * fraction
-            section_boundaries.append(section_boundaries[index] + step)
-        section_boundaries = np.array(section_boundaries)
-        section_lengths = np.diff(section_boundaries)
-
-        mesh = []
-        for section_num, (sec_start, sec_end, sec_num_points) in enumerate(zip(section_boundaries[:-1], section_boundaries[1:], p.number_mesh_section_nodes)):
-            points = self.quadrature.quadrature_point(
-                sec_num_points, domain=[sec_start, sec_end])
-            # if self.settings.quadrature_method == "lobatto":
-            # 	points = points[:-1]
-            # mesh.extend(list(points))
-            mesh.extend(list(points[:-1]))
-        mesh.append(self._TAU_F)
-
-        tau = np.array(mesh)
-        h = np.diff(tau)
-        N = len(tau)
-        K = p.number_mesh_sections
-
-        mesh_index_boundaries = np.insert(
-            np.cumsum(p.number_mesh_section_nodes - 1), 0, 0)
-        h_K = np.diff(tau[mesh_index_boundaries])
-        N_K = p.number_mesh_section_nodes
+        steps = self._PERIOD * np.asarray(p.mesh_section_sizes, dtype=float)
+        section_boundaries = np.cumsum(np.concatenate([[self._TAU_0], steps]))
+        section_stretches = 0.5 * np.diff(section_boundaries)
+        section_shifts = 0.5 * (section_boundaries[:-1] + section_boundaries[1:])
 
+        K = p.number_mesh_sections
+        mesh_index_boundaries = np.insert(np.cumsum(N_K - 1), 0, 0)
         block_starts = mesh_index_boundaries[:-1]
         num_c_defect_per_y = int(mesh_index_boundaries[-1])
         num_cols = mesh_index_boundaries[-1] + 1
         matrix_dims = (num_c_defect_per_y, num_cols)
 
+        # Offsets of each section's entries in the (section-major) A and D
+        # triplets. D index arrays index in to the A nonzeros.
+        A_starts = np.insert(np.cumsum((N_K - 1) * N_K), 0, 0)
+        D_starts = np.insert(np.cumsum(2 * (N_K - 1)), 0, 0)
+        num_A_nonzero = A_starts[-1]
+        num_D_nonzero = D_starts[-1]
+
+        tau = np.empty(num_cols)
+        tau[-1] = self._TAU_F
+        A_vals = np.empty(num_A_nonzero)
+        A_row_inds = np.empty(num_A_nonzero, dtype=int)
+        A_col_inds = np.empty(num_A_nonzero, dtype=int)
+        D_vals = np.empty(num_D_nonzero)
+        D_row_inds = np.empty(num_D_nonzero, dtype=int)
+        D_col_inds = np.empty(num_D_nonzero, dtype=int)
+        D_index_array = np.empty(num_D_nonzero, dtype=int)
         W_matrix = np.zeros(num_cols)
 
-        A_vals = []
-        A_row_inds = []
-        A_col_inds = []
+        for block_size in np.unique(N_K):
+            sections = np.flatnonzero(N_K == block_size)
+            starts = block_starts[sections, np.newaxis]
 
-        D_vals = []
-        D_row_inds = []
-        D_col_inds = []
+            points = self.quadrature.quadrature_point(block_size)[:-1]
+            section_points = (section_stretches[sections, np.newaxis] * points
+                              + section_shifts[sections, np.newaxis])
+            tau[starts + np.arange(block_size - 1)] = section_points
 
-        A_index_array = []
-        D_index_array = []
-
-        num_A_nonzero = 0
+        h = np.diff(tau)
+        N = len(tau)
+        h_K = np.diff(tau[mesh_index_boundaries])
+        h_K_expanded = np.repeat(h_K, N_K - 1)
 
-        h_K_expanded = []
+        for block_size in np.unique(N_K):
+            sections = np.flatnonzero(N_K == block_size)
+            starts = block_starts[sections, np.newaxis]
+            h_k = h_K[sections, np.newaxis]
+            block_rows = np.arange(block_size - 1)
+            block_cols = np.arange(block_size)
 
-        for block_size, h_k, block_start in zip(p.number_mesh_section_nodes, h_K, block_starts):
-            row_slice = slice(block_start, block_start + block_size - 1)
-            col_slice = slice(block_start, block_start + block_size)
-            A_block = self.quadrature.A_matrix(block_size) * h_k
-            A_vals_entry = A_block.flatten().tolist()
-            A_row_inds_entry = np.repeat(
-                np.array(range(block_start, block_start + block_size - 1)), block_size)
-            A_col_inds_entry = np.tile(
-                np.array(range(block_start, block_start + block_size)), block_size - 1)
-            A_vals.extend(A_vals_entry)
-            A_row_inds.extend(A_row_inds_entry)
-            A_col_inds.extend(A_col_inds_entry)
-            A_indicies = self.quadrature.A_index_array(block_size)
-            A_index_array.extend(A_indicies + num_A_nonzero)
+            A_block = self.quadrature.A_matrix(block_size).flatten()
+            A_slots = A_starts[sections, np.newaxis] + np.arange(A_block.size)
+            A_vals[A_slots] = A_block * h_k
+            A_row_inds[A_slots] = starts + np.repeat(block_rows, block_size)
+            A_col_inds[A_slots] = starts + np.tile(block_cols, block_size - 1)
 
             D_block = self.quadrature.D_matrix(block_size)
             nonzero = np.flatnonzero(D_block)
-            D_vals_entry = D_block.flatten()[nonzero].tolist()
-            D_row_inds_entry = np.repeat(np.array(
-                range(block_start, block_start + block_size - 1)), block_size)[nonzero]
-            D_col_inds_entry = np.tile(np.array(
-                range(block_start, block_start + block_size)), block_size - 1)[nonzero]
-            D_vals.extend(D_vals_entry)
-            D_row_inds.extend(D_row_inds_entry)
-            D_col_inds.extend(D_col_inds_entry)
-            D_index_array.extend(self.quadrature.D_index_array(
-                block_size) + num_A_nonzero)
-
-            W_matrix[col_slice] += self.quadrature.quadrature_weight(
-                block_size) * h_k
-
-            num_A_nonzero = len(A_index_array)
+            D_slots = D_starts[sections, np.newaxis] + np.arange(nonzero.size)
+            D_vals[D_slots] = D_block.flatten()[nonzero]
+            D_row_inds[D_slots] = starts + np.repeat(block_rows, block_size)[nonzero]
+            D_col_inds[D_slots] = starts + np.tile(block_cols, block_size - 1)[nonzero]
+            D_index_array[D_slots] = (self.quadrature.D_index_array(block_size)
+                                      + A_starts[sections, np.newaxis])
 
-            h_K_expanded.extend([h_k] * (block_size - 1))
+            weights = self.quadrature.quadrature_weight(block_size)
+            np.add.at(W_matrix, starts + block_cols, weights * h_k)
 
         sA_matrix = sparse.coo_matrix(
             (A_vals, (A_row_inds, A_col_inds)), shape=matrix_dims).tocsr()
         sD_matrix = sparse.coo_matrix(
             (D_vals, (D_row_inds, D_col_inds)), shape=matrix_dims).tocsr()
 
-        A_index_array = np.array(A_index_array)
-        D_index_array = np.array(D_index_array)
-
-        h_K_expanded = np.array(h_K_expanded)
+        A_index_array = np.arange(num_A_nonzero)
 
         data = (tau,
                 h,
@@ -351,3 +358,42 @@ class Mesh:
                 A_index_array,
                 D_index_array)
         return data
+
+    def generate_differential_matrices(self, p, data):
+        """Differential form collocation matrices of a single phase.
+
+        The defects are `sC_state_matrix * y + stretch * sC_dynamics_matrix
+        * dy` in both forms. Only the structural nonzeros of each section's
+        blocks are stored so that the sparsity of the differential form
+        carries through to the defect Jacobian.
+
+        """
+        N_K = data[7]
+        h_K = data[5]
+        block_starts = data[4][:-1]
+        matrix_dims = (data[8], data[4][-1] + 1)
+        state_triplets = []
+        dynamics_triplets = []
+        for block_size in np.unique(N_K):
+            sections = np.flatnonzero(N_K == block_size)
+            starts = block_starts[sections, np.newaxis]
+            blocks = ((self.quadrature.differential_D_matrix(block_size),
+                       np.ones((len(sections), 1)),
+                       state_triplets),
+                      (self.quadrature.differential_A_matrix(block_size),
+                       h_K[sections, np.newaxis],
+                       dynamics_triplets))
+            for block, scale, triplets in blocks:
+                rows, cols = np.nonzero(block)
+                triplets.append((
+                    (scale * block[rows, cols]).flatten(),
+                    (starts + rows).flatten(),
+                    (starts + cols).flatten()))
+        matrices = []
+        for triplets in (state_triplets, dynamics_triplets):
+            vals, row_inds, col_inds = (np.concatenate(entries)
+                                        for entries in zip(*triplets))
+            matrix = sparse.coo_matrix((vals, (row_inds, col_inds)),
+                                       shape=matrix_dims).tocsr()
+            matrices.append(matrix)
+        return tuple(matrices)
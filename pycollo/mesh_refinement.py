@@ -9,30 +9,71 @@ DEFAULT_MAX_MESH_ITERATIONS : int
     Default value for py:class:`Settings` for the default maximum number of
     mesh iterations that Pycollo should conduct before terminating the OCP
     solve if the mesh error has not been met.
+DEFAULT_MESH_COARSENING_TOLERANCE : float
+    Default value for py:class:`Settings` for the fraction of the mesh
+    tolerance below which a mesh section's error must be for it to be merged
+    with neighbouring mesh sections. Zero, so mesh coarsening is opt-in.
+LEGENDRE_DECAY_RATE_MIN : float
+    Minimum rate of exponential decay of the Legendre coefficients of the
+    state derivatives in a mesh section for the solution to be considered
+    smooth in that section by the Liu-Hager-Rao mesh refinement algorithm.
+NUM_LEGENDRE_DECAY_COEFFICIENTS : int
+    Number of highest-degree Legendre coefficients used to estimate their
+    rate of decay.
+H_SUBDIVIDE_FACTOR_MAX : int
+    Maximum number of mesh sections that a mesh section is subdivided in to
+    by h refinement in a single mesh iteration.
 PATTERSON_RAO : str
     String keyword identifier for the Patterson-Rao mesh refinement algorithm.
+LIU_HAGER_RAO : str
+    String keyword identifier for the Liu-Hager-Rao-style hp mesh refinement
+    algorithm.
+H_REFINEMENT : str
+    String keyword identifier for the pure-h mesh refinement algorithm.
+P_REFINEMENT : str
+    String keyword identifier for the pure-p mesh refinement algorithm.
+COST_MODEL : str
+    String keyword identifier for the mesh refinement algorithm that selects
+    the refinement strategy predicted to result in the smallest NLP that
+    meets the mesh tolerance.
+SectionRefinement : collections.namedtuple
+    Number of nodes, subdivision factor, whether to merge and predicted
+    change in the number of nodes for each mesh section of a phase, as
+    chosen by a ph mesh refinement strategy.
 
 """
 
 
+import collections
 from abc import ABC, abstractmethod
-import itertools
 
-import casadi as ca
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy.interpolate as interpolate
 from pyproprop import Options
 
 from .mesh import Mesh, PhaseMesh
-from .utils import casadi_substitute, dict_merge, symbol_name
 from .vis.plot import plot_mesh
 
 
 DEFAULT_MESH_TOLERANCE = 1e-7
 DEFAULT_MAX_MESH_ITERATIONS = 10
+DEFAULT_MESH_COARSENING_TOLERANCE = 0.0
+LEGENDRE_DECAY_RATE_MIN = 1.0
+NUM_LEGENDRE_DECAY_COEFFICIENTS = 4
+H_SUBDIVIDE_FACTOR_MAX = 4
 PATTERSON_RAO = "patterson-rao"
-chain_from_iter = itertools.chain.from_iterable
+LIU_HAGER_RAO = "liu-hager-rao"
+H_REFINEMENT = "h"
+P_REFINEMENT = "p"
+COST_MODEL = "cost-model"
+
+
+SectionRefinement = collections.namedtuple("SectionRefinement",
+                                           ("next_N_K",
+                                            "subdivide_factor",
+                                            "merge_required",
+                                            "P_q"))
 
 
 class MeshRefinementABC(ABC):
@@ -61,7 +102,15 @@ class MeshRefinementABC(ABC):
         pass
 
 
-class PattersonRaoMeshRefinement(MeshRefinementABC):
+class PhMeshRefinementABC(MeshRefinementABC):
+    """Mesh refinement using relative mesh errors estimated on a ph-mesh.
+
+    The mesh error in each mesh section is estimated by integrating the state
+    dynamics on a ph-mesh, which has one more node in each mesh section than
+    the current mesh, as described by Patterson and Rao. Subclasses decide
+    how the mesh is refined from these errors.
+
+    """
 
     def mesh_error(self):
         self.absolute_mesh_errors = []
@@ -69,10 +118,10 @@ class PattersonRaoMeshRefinement(MeshRefinementABC):
         self.maximum_relative_mesh_errors = []
         self.ph_mesh = self.create_ph_mesh()
         self.dy_ph_callables = self.generate_dy_ph_callables()
-        x_ph, y_ph, u_ph = self.construct_x_ph()
+        y_ph, u_ph = self.construct_y_u_ph()
         zipped = zip(self.backend.p, self.sol.phase_data, y_ph, u_ph)
         for args in zipped:
-            self.phase_mesh_error(*args, x_ph)
+            self.phase_mesh_error(*args)
         self.next_iter_mesh = self.next_iteration_mesh()
 
     def create_ph_mesh(self):
@@ -89,78 +138,36 @@ class PattersonRaoMeshRefinement(MeshRefinementABC):
         return Mesh(self.backend, phase_ph_meshes)
 
     def generate_dy_ph_callables(self):
+        """Create callables evaluating the state derivatives on the ph-mesh.
 
-        def make_all_phase_mapping(mesh):
-            """Create mapping from OCP symbol to iteration symbols."""
-            all_phase_mapping = {}
-            for p, N in zip(self.backend.p, mesh.N):
-                phase_mapping = {}
-                for i in range(N):
-                    mapping = {}
-                    for y in p.y_var:
-                        mapping[y] = ocp_ph_sym_mapping[y][i]
-                    for u in p.u_var:
-                        mapping[u] = ocp_ph_sym_mapping[u][i]
-                    phase_mapping[i] = mapping
-                all_phase_mapping[p] = phase_mapping
-            return all_phase_mapping
-
-        def make_state_derivatives(p, all_phase_mapping):
-            """Construct all state derivatives for the mesh iteration."""
-            dy = []
-            phase_mapping = all_phase_mapping[p]
-            for y_eqn in p.y_eqn:
-                y_eqn = expand_eqn_to_vec(y_eqn, phase_mapping)
-                dy.append(y_eqn)
-            return ca.vertcat(*dy)
-
-        def expand_eqn_to_vec(eqn, phase_mapping):
-            """Convert an equation in OCP base to vector iteration base."""
-            vec = []
-            for mapping in phase_mapping.values():
-                vec.append(casadi_substitute(eqn, mapping))
-            return ca.vertcat(*vec)
-
-        mapping = {}
-        mapping_point = {}
-        for p, N in zip(self.backend.p, self.ph_mesh.N):
-            mapping.update({y: self.backend.sym(symbol_name(y), N)
-                            for y in p.y_var})
-            mapping_point.update({y_t0: mapping[y][0]
-                                  for y, y_t0 in zip(p.y_var, p.y_t0_var)})
-            mapping_point.update({y_tF: mapping[y][-1]
-                                  for y, y_tF in zip(p.y_var, p.y_tF_var)})
-            mapping.update({u: self.backend.sym(symbol_name(u), N)
-                            for u in p.u_var})
-            mapping_point.update({q: q for q in p.q_var})
-            mapping_point.update({t: t for t in p.t_var})
-        mapping_point.update({s: s for s in self.backend.s_var})
-        ocp_ph_sym_mapping = mapping
-        ocp_ph_sym_point_mapping = mapping_point
-        var_ph = []
-        for x in self.backend.x_var:
-            var = ocp_ph_sym_mapping.get(x)
-            if var is not None:
-                var_ph.append(var)
-            var = ocp_ph_sym_point_mapping.get(x)
-            if var is not None:
-                var_ph.append(var)
-        x_var_ph = ca.vertcat(*var_ph)
-
-        all_phase_mapping = make_all_phase_mapping(self.ph_mesh)
-        subs = dict_merge(ocp_ph_sym_point_mapping,
-                          {V: 1 for V in self.backend.V_sym_val_mapping_iter},
-                          {r: 0 for r in self.backend.r_sym_val_mapping_iter},
-                          self.backend.bounds.aux_data)
-        dy_ph_fncs = []
-        for p in self.backend.p:
-            dy_phase = make_state_derivatives(p, all_phase_mapping)
-            dy_ph_phase = casadi_substitute(dy_phase, subs)
-            dy_ph_fnc = ca.Function(f"dy_P{p.i}", [x_var_ph], [dy_ph_phase])
-            dy_ph_fncs.append(dy_ph_fnc)
-        return tuple(dy_ph_fncs)
+        The backend's per-phase node functions are mesh-independent and
+        created once per OCP, so rather than rebuilding the state equations
+        symbolically for the ph-mesh at every mesh iteration these are mapped
+        over the ph-mesh nodes and evaluated for all nodes in a single call.
+        The solution is already unscaled so the variable stretches are one
+        and the shifts are zero.
+
+        """
+
+        def make_dy_ph_callable(p, N):
+            node_fnc = self.backend.phase_node_functions[p.i]
+            node_fnc_map = self.backend.map_node_function(node_fnc, N)
+
+            def dy_ph_callable(y_ph, u_ph, p_data):
+                z = np.concatenate([p_data.q, p_data.t, self.sol._s])
+                c_ph, _ = node_fnc_map(y_ph, u_ph, z, V_r, aux)
+                return np.array(c_ph[p.y_eqn_slice, :]).T
+
+            return dy_ph_callable
+
+        V_r = np.concatenate([np.ones(len(self.backend.V_x_var)),
+                              np.zeros(len(self.backend.r_x_var))])
+        aux = np.array(list(self.backend.bounds.aux_data.values()),
+                       dtype=np.float64)
+        return tuple(make_dy_ph_callable(p, N)
+                     for p, N in zip(self.backend.p, self.ph_mesh.N))
 
-    def construct_x_ph(self):
+    def construct_y_u_ph(self):
 
         def get_y_ph(p, p_data):
             y_ph = np.zeros((p.num_y_var, self.ph_mesh.N[p.i]))
@@ -171,9 +178,9 @@ class PattersonRaoMeshRefinement(MeshRefinementABC):
             return eval_polynomials(y_polys, self.ph_mesh, y_ph)
 
         def get_u_ph(p, p_data):
-            if not p.num_u_var:
-                return np.array([])
             u_ph = np.zeros((p.num_u_var, self.ph_mesh.N[p.i]))
+            if not p.num_u_var:
+                return u_ph
             u_slice = self.it.mesh.mesh_index_boundaries[p.i]
             u_slice_ph = self.ph_mesh.mesh_index_boundaries[p.i]
             u_ph[:, u_slice_ph] = p_data.u[:, u_slice]
@@ -191,210 +198,475 @@ class PattersonRaoMeshRefinement(MeshRefinementABC):
 
         y_ph_all = []
         u_ph_all = []
-        x_ph_all = []
         for p, p_data in zip(self.backend.p, self.sol.phase_data):
-            y_ph = get_y_ph(p, p_data)
-            u_ph = get_u_ph(p, p_data)
-            y_ph_all.append(y_ph)
-            u_ph_all.append(u_ph)
-            x_ph = chain_from_iter(((y for y in y_ph),
-                                    (u for u in u_ph),
-                                    (np.array([q]) for q in p_data.q),
-                                    (np.array([t]) for t in p_data.t)))
-            x_ph_all.append(np.concatenate(tuple(x_ph)))
-        x_ph_all.append([np.array(s) for s in self.sol._s])
-        x_ph_all = np.concatenate(x_ph_all)
-        return x_ph_all, y_ph_all, u_ph_all
-
-    def phase_mesh_error(self, p, p_data, y_ph, u_ph, x_ph):
-        dy_ph = np.array(self.dy_ph_callables[p.i](x_ph))
-        dy_ph = dy_ph.reshape((-1, p.num_y_var), order="F")
+            y_ph_all.append(get_y_ph(p, p_data))
+            u_ph_all.append(get_u_ph(p, p_data))
+        return y_ph_all, u_ph_all
+
+    def phase_mesh_error(self, p, p_data, y_ph, u_ph):
+        dy_ph = self.dy_ph_callables[p.i](y_ph, u_ph, p_data)
         I_dy_ph = p_data.stretch * self.ph_mesh.sI_matrix[p.i].dot(dy_ph)
-        dim_1 = self.it.mesh.K[p.i]
-        dim_2 = p.num_y_var
-        dim_3 = max(self.ph_mesh.N_K[p.i]) - 1
-        mesh_error = np.zeros((dim_1, dim_2, dim_3))
-        rel_error_scale_factor = np.zeros((self.it.mesh.K[p.i], p.num_y_var))
-
-        zipped = zip(self.ph_mesh.mesh_index_boundaries[p.i][:-1],
-                     self.ph_mesh.N_K[p.i] - 1)
-        for i_k, (i_start, m_k) in enumerate(zipped):
-            y_k = y_ph[:, i_start]
-            Y_ph_k = (y_k + I_dy_ph[i_start:i_start + m_k]).T
-            Y_k = y_ph[:, i_start + 1:i_start + 1 + m_k]
-            mesh_error[i_k, :, :m_k] = Y_ph_k - Y_k
-            rel_error_scale_factor[i_k, :] = np.max(np.abs(Y_k), axis=1) + 1
+
+        # Each row of `I_dy_ph` is an interior point of exactly one mesh
+        # section, so all sections are handled at once by indexing with the
+        # section that each row belongs to and its position within it.
+        sec_starts = self.ph_mesh.mesh_index_boundaries[p.i][:-1]
+        m_K = self.ph_mesh.N_K[p.i] - 1
+        row_sec = np.repeat(np.arange(len(m_K)), m_K)
+        rows = np.arange(len(row_sec))
+        row_pos = rows - sec_starts[row_sec]
+        Y_ph = y_ph[:, sec_starts[row_sec]] + I_dy_ph.T
+        Y = y_ph[:, rows + 1]
+        mesh_error = np.zeros((len(m_K), p.num_y_var, max(m_K)))
+        mesh_error[row_sec, :, row_pos] = (Y_ph - Y).T
+        max_abs_Y = np.maximum.reduceat(np.abs(Y), sec_starts, axis=1)
+        rel_error_scale_factor = max_abs_Y.T + 1
 
         absolute_mesh_error = np.abs(mesh_error)
         self.absolute_mesh_errors.append(absolute_mesh_error)
 
-        relative_mesh_error = np.zeros_like(absolute_mesh_error)
-        for i_k in range(self.ph_mesh.K[p.i]):
-            for i_y in range(p.num_y_var):
-                for i_m in range(self.ph_mesh.N_K[p.i][i_k] - 1):
-                    denominator = (1 + rel_error_scale_factor[i_k, i_y])
-                    val = absolute_mesh_error[i_k, i_y, i_m] / denominator
-                    relative_mesh_error[i_k, i_y, i_m] = val
+        denominator = 1 + rel_error_scale_factor[:, :, np.newaxis]
+        relative_mesh_error = absolute_mesh_error / denominator
         self.relative_mesh_errors.append(relative_mesh_error)
 
-        max_relative_error = np.zeros(self.it.mesh.K[p.i])
-        for i_k in range(self.ph_mesh.K[p.i]):
-            max_relative_error[i_k] = np.max(relative_mesh_error[i_k, :, :])
+        max_relative_error = np.max(relative_mesh_error, axis=(1, 2))
         self.maximum_relative_mesh_errors.append(max_relative_error)
 
+    @classmethod
+    def from_mesh_refinement(cls, mesh_refinement):
+        """Mesh refinement sharing the mesh errors of another.
+
+        The mesh errors are not recalculated, so the returned object refines
+        the same mesh using a different strategy.
+
+        """
+        strategy = object.__new__(cls)
+        strategy.__dict__.update(vars(mesh_refinement))
+        return strategy
+
     def next_iteration_mesh(self):
         phase_meshes = []
         for p in self.backend.p:
-            phase_mesh = self.next_iteration_phase_mesh(p)
+            if self.phase_mesh_tolerance_met(p):
+                phase_mesh = self.it.mesh.p[p.i]
+            else:
+                phase_mesh = self.next_iteration_phase_mesh(p)
             phase_meshes.append(phase_mesh)
         new_mesh = Mesh(self.backend, phase_meshes)
         return new_mesh
 
+    def phase_mesh_tolerance_met(self, p):
+        """Whether all of a phase's mesh errors are within the tolerance."""
+        mesh_tol = self.ocp.settings.mesh_tolerance
+        return np.max(self.maximum_relative_mesh_errors[p.i]) <= mesh_tol
+
     def next_iteration_phase_mesh(self, p):
+        """Next mesh for a phase whose mesh error exceeds the tolerance."""
+        refinement = self.phase_section_refinement(p)
+        return self.phase_mesh_from_sections(p, *refinement)
+
+    @abstractmethod
+    def phase_section_refinement(self, p):
+        """How each mesh section of a phase should be refined.
+
+        Returns
+        -------
+        SectionRefinement
+            Arguments for :meth:`phase_mesh_from_sections`.
+
+        """
+        pass
+
+    def predicted_section_errors(self, p, refinement):
+        """Predicted maximum relative mesh error of each refined section.
+
+        The mesh error is assumed to decrease by a factor of the number of
+        nodes in a mesh section for each additional node (see
+        :meth:`predicted_degree_change`), with the nodes of all mesh sections
+        that a section is subdivided in to counted together. Sections that
+        are merged are predicted to keep their current error, which is well
+        within the mesh tolerance.
 
-        def merge_sections(new_mesh_sec_sizes,
-                           new_num_mesh_sec_nodes,
-                           merge_group):
-            merge_group = np.array(merge_group)
-            P_q = merge_group[:, 0]
-            h_q = merge_group[:, 1]
-            p_q = merge_group[:, 2]
-            N = np.sum(p_q)
-            T = np.sum(h_q)
-            collocation_points_min = self.ocp.settings.collocation_points_min
-            merge_ratio = p_q / (collocation_points_min - P_q)
-            mesh_secs_needed = np.ceil(np.sum(merge_ratio)).astype(int)
-            if mesh_secs_needed == 1:
-                new_mesh_secs = np.array([T])
+        """
+        max_rel_mesh_errs = self.maximum_relative_mesh_errors[p.i]
+        N_K = self.it.mesh.N_K[p.i]
+        added_nodes = refinement.subdivide_factor * refinement.next_N_K - N_K
+        errors = max_rel_mesh_errs * np.power(N_K.astype(float), -added_nodes)
+        if refinement.merge_required is not None:
+            errors = np.where(refinement.merge_required,
+                              max_rel_mesh_errs,
+                              errors)
+        return errors
+
+    def h_subdivide_factor(self, p):
+        """Number of equal sections each section is h-refined in to.
+
+        The mesh error is assumed to be proportional to the mesh section size
+        raised to the power of its number of nodes. Sections whose error
+        exceeds the mesh tolerance are subdivided in to at least two
+        sections, but in to no more than :data:`H_SUBDIVIDE_FACTOR_MAX` per
+        mesh iteration, as the error estimates of poorly-resolved sections
+        are unreliable and would otherwise make the mesh grow excessively.
+
+        """
+        mesh_tol = self.ocp.settings.mesh_tolerance
+        max_rel_mesh_errs = self.maximum_relative_mesh_errors[p.i]
+        N_K = self.it.mesh.N_K[p.i]
+        refine_required = max_rel_mesh_errs > mesh_tol
+        error_to_tolerance_ratio = max_rel_mesh_errs / mesh_tol
+        subdivide_factor = np.ceil(error_to_tolerance_ratio**(1 / N_K))
+        subdivide_factor = np.clip(subdivide_factor, 2, H_SUBDIVIDE_FACTOR_MAX)
+        return np.where(refine_required, subdivide_factor, 1).astype(int)
+
+    def h_predicted_section_errors(self, p, subdivide_factor):
+        """Predicted maximum relative mesh errors after h refinement.
+
+        Uses the same error model as :meth:`h_subdivide_factor`.
+
+        """
+        max_rel_mesh_errs = self.maximum_relative_mesh_errors[p.i]
+        N_K = self.it.mesh.N_K[p.i]
+        subdivide_factor = subdivide_factor.astype(float)
+        return max_rel_mesh_errs * np.power(subdivide_factor, -N_K)
+
+    def predicted_degree_change(self, p):
+        """Predicted change in the number of nodes needed in each section.
+
+        The mesh error is assumed to decrease by a factor of the number of
+        nodes in a mesh section for each additional node. The predicted
+        decrease for sections whose error is within the mesh tolerance is
+        damped logarithmically.
+
+        """
+        mesh_tol = self.ocp.settings.mesh_tolerance
+        max_rel_mesh_errs = self.maximum_relative_mesh_errors[p.i]
+        error_to_tolerance_ratio = max_rel_mesh_errs / mesh_tol
+        log_error_to_tolerance_ratio = np.log(error_to_tolerance_ratio)
+        log_base = np.log(self.it.mesh.N_K[p.i])
+        P_q = np.ceil(np.divide(log_error_to_tolerance_ratio, log_base))
+        P_q_zero = P_q <= 0
+        P_q_reduced = P_q[P_q_zero]
+        P_q[P_q_zero] = P_q_reduced + np.ceil((np.log(-P_q_reduced + 1)))
+        return P_q
+
+    def predicted_section_nodes(self, p, P_q):
+        """Number of nodes predicted for each section to meet the tolerance.
+
+        Reductions in the number of nodes of sections whose error is within
+        the mesh tolerance are scaled by `1 + 1 / log(tol / err)`, so that
+        sections only just within the tolerance are reduced less.
+
+        """
+        mesh_tol = self.ocp.settings.mesh_tolerance
+        max_rel_mesh_errs = self.maximum_relative_mesh_errors[p.i]
+        N_K = self.it.mesh.N_K[p.i]
+        log_tolerance = np.log(np.divide(mesh_tol, max_rel_mesh_errs))
+        reduction_tolerance = 1 + np.reciprocal(log_tolerance)
+        reduction_tolerance_lt_zero = reduction_tolerance < 0
+        reduction_tolerance[reduction_tolerance_lt_zero] = 0
+        is_node_reduction = P_q <= 0
+        predicted_nodes = P_q + N_K
+        predicted_nodes[is_node_reduction] = N_K[is_node_reduction] + np.ceil(
+            P_q[is_node_reduction] * reduction_tolerance[is_node_reduction])
+        return predicted_nodes
+
+    def merge_required(self, p, predicted_nodes):
+        """Which sections should be merged with their neighbours.
+
+        Sections are only coarsened (merged with neighbouring sections that
+        are also to be coarsened) if their error is well within the mesh
+        tolerance and fewer than the minimum number of collocation points are
+        predicted to be needed to keep it there.
+
+        """
+        mesh_tol = self.ocp.settings.mesh_tolerance
+        col_points_min = self.ocp.settings.collocation_points_min
+        coarsening_tol = self.ocp.settings.mesh_coarsening_tolerance
+        max_rel_mesh_errs = self.maximum_relative_mesh_errors[p.i]
+        merge_tolerance = coarsening_tol * mesh_tol
+        return np.logical_and(predicted_nodes < col_points_min,
+                              max_rel_mesh_errs < merge_tolerance)
+
+    def merge_sections(self, P_q, h_q, p_q):
+        T = np.sum(h_q)
+        collocation_points_min = self.ocp.settings.collocation_points_min
+        merge_ratio = p_q / (collocation_points_min - P_q)
+        mesh_secs_needed = max(np.ceil(np.sum(merge_ratio)).astype(int), 1)
+        if mesh_secs_needed == 1:
+            new_mesh_secs = np.array([T])
+        else:
+            required_reduction = np.divide(h_q, merge_ratio)
+            weighting_factor = np.reciprocal(np.sum(required_reduction))
+            reduction_factor = weighting_factor * required_reduction
+            knot_locations = np.cumsum(h_q) / T
+            current_density = np.cumsum(reduction_factor)
+            density_func = interpolate.interp1d(knot_locations,
+                                                current_density,
+                                                bounds_error=False,
+                                                fill_value="extrapolate")
+            new_density = np.linspace(1 / mesh_secs_needed,
+                                      1,
+                                      mesh_secs_needed)
+            new_knots = np.concatenate([np.array([0]),
+                                        density_func(new_density)])
+            new_mesh_secs = T * np.diff(new_knots)
+        new_node_counts = np.full(mesh_secs_needed, collocation_points_min)
+        return new_mesh_secs, new_node_counts
+
+    def phase_mesh_from_sections(self,
+                                 p,
+                                 next_N_K,
+                                 subdivide_factor,
+                                 merge_required=None,
+                                 P_q=None):
+        """Create the next phase mesh from the refinement of each section.
+
+        Mesh section `k` of the current mesh is split in to
+        `subdivide_factor[k]` mesh sections of equal size, each with
+        `next_N_K[k]` nodes, unless it is flagged in `merge_required`.
+        Consecutive sections that all need merging are merged together using
+        their predicted changes in number of nodes `P_q`. Sections are
+        therefore processed in runs of equal `merge_required`, each of which
+        is handled in one go.
+
+        """
+        h_K = self.it.mesh.h_K[p.i]
+        N_K = self.it.mesh.N_K[p.i]
+        if merge_required is None:
+            merge_required = np.zeros(len(h_K), dtype=bool)
+        run_starts = np.flatnonzero(
+            np.insert(np.diff(merge_required), 0, True))
+        run_stops = np.append(run_starts[1:], len(merge_required))
+        new_mesh_sec_sizes = []
+        new_num_mesh_sec_nodes = []
+        for run_start, run_stop in zip(run_starts, run_stops):
+            run = slice(run_start, run_stop)
+            if merge_required[run_start]:
+                new_mesh_secs, new_node_counts = self.merge_sections(
+                    P_q[run], h_K[run], N_K[run])
             else:
-                required_reduction = np.divide(h_q, merge_ratio)
-                weighting_factor = np.reciprocal(np.sum(required_reduction))
-                reduction_factor = weighting_factor * required_reduction
-                knot_locations = np.cumsum(h_q) / T
-                current_density = np.cumsum(reduction_factor)
-                density_func = interpolate.interp1d(knot_locations,
-                                                    current_density,
-                                                    bounds_error=False,
-                                                    fill_value="extrapolate")
-                new_density = np.linspace(1 / mesh_secs_needed,
-                                          1,
-                                          mesh_secs_needed)
-                new_knots = np.concatenate([np.array([0]),
-                                            density_func(new_density)])
-                new_mesh_secs = T * np.diff(new_knots)
-            new_mesh_sec_sizes.extend(new_mesh_secs.tolist())
-            new_node_counts = [collocation_points_min] * mesh_secs_needed
-            new_num_mesh_sec_nodes.extend(new_node_counts)
-            return new_mesh_sec_sizes, new_num_mesh_sec_nodes
-
-        def subdivide_sections(new_mesh_sec_sizes,
-                               new_num_mesh_sec_nodes,
-                               subdivide_group):
-            subdivide_group = np.array(subdivide_group)
-            subdivide_required = subdivide_group[:, 0].astype(bool)
-            subdivide_factor = subdivide_group[:, 1].astype(int)
-            reduction_tol = subdivide_group[:, 2]
-            P_q = subdivide_group[:, 3]
-            h_q = subdivide_group[:, 4]
-            p_q = subdivide_group[:, 5]
-
-            is_node_reduction = P_q <= 0
-
-            predicted_nodes = P_q + p_q
-            predicted_nodes[is_node_reduction] = np.ceil(
-                P_q[is_node_reduction] * reduction_tol[is_node_reduction]) + p_q[is_node_reduction]
-
-            next_mesh_nodes = np.ones_like(
-                predicted_nodes, dtype=int) * col_points_min
-            next_mesh_nodes[np.invert(
-                subdivide_required)] = predicted_nodes[np.invert(subdivide_required)]
-            next_mesh_nodes_lower_than_min = next_mesh_nodes < col_points_min
-            next_mesh_nodes[next_mesh_nodes_lower_than_min] = col_points_min
-
-            for h, k, n in zip(h_q, subdivide_factor, next_mesh_nodes):
-                new_mesh_sec_sizes.extend([h / k] * k)
-                new_num_mesh_sec_nodes.extend([n] * k)
-
-            return new_mesh_sec_sizes, new_num_mesh_sec_nodes
+                factor = subdivide_factor[run]
+                new_mesh_secs = np.repeat(h_K[run] / factor, factor)
+                new_node_counts = np.repeat(next_N_K[run], factor)
+            new_mesh_sec_sizes.append(new_mesh_secs)
+            new_num_mesh_sec_nodes.append(new_node_counts)
+        new_mesh_sec_sizes = np.concatenate(new_mesh_sec_sizes).tolist()
+        new_num_mesh_sec_nodes = np.concatenate(
+            new_num_mesh_sec_nodes).tolist()
+        new_number_mesh_secs = len(new_mesh_sec_sizes)
+        new_mesh = PhaseMesh(phase=p.ocp_phase,
+                             number_mesh_sections=new_number_mesh_secs,
+                             mesh_section_sizes=new_mesh_sec_sizes,
+                             number_mesh_section_nodes=new_num_mesh_sec_nodes)
+        return new_mesh
+
+
+class PattersonRaoMeshRefinement(PhMeshRefinementABC):
+    """Patterson-Rao ph mesh refinement with mesh coarsening."""
+
+    def phase_section_refinement(self, p):
+        col_points_min = self.ocp.settings.collocation_points_min
+        col_points_max = self.ocp.settings.collocation_points_max
+
+        P_q = self.predicted_degree_change(p)
+        predicted_nodes = P_q + self.it.mesh.N_K[p.i]
+        merge_required = self.merge_required(p, predicted_nodes)
+
+        subdivide_required = predicted_nodes >= col_points_max
+        subdivide_level = np.ones_like(predicted_nodes)
+        subdivide_level[subdivide_required] = np.ceil(
+            predicted_nodes[subdivide_required] / col_points_min)
+
+        next_N_K = self.predicted_section_nodes(p, P_q).astype(int)
+        next_N_K[subdivide_required] = col_points_min
+        next_N_K[next_N_K < col_points_min] = col_points_min
+        return SectionRefinement(next_N_K,
+                                 subdivide_level.astype(int),
+                                 merge_required,
+                                 P_q)
+
+
+class HMeshRefinement(PhMeshRefinementABC):
+    """Pure-h mesh refinement.
 
+    Mesh sections whose error exceeds the mesh tolerance are subdivided in to
+    equal mesh sections with the same number of nodes (see
+    :meth:`PhMeshRefinementABC.h_subdivide_factor`).
+
+    """
+
+    def phase_section_refinement(self, p):
+        N_K = self.it.mesh.N_K[p.i]
+        subdivide_factor = self.h_subdivide_factor(p)
+        return SectionRefinement(N_K, subdivide_factor, None, None)
+
+    def predicted_section_errors(self, p, refinement):
+        return self.h_predicted_section_errors(p, refinement.subdivide_factor)
+
+
+class PMeshRefinement(PhMeshRefinementABC):
+    """Pure-p mesh refinement.
+
+    Mesh sections whose error exceeds the mesh tolerance have their number of
+    nodes increased by the number predicted to meet the mesh tolerance. As
+    the number of nodes per mesh section is bounded (the ph-mesh used to
+    estimate the mesh error has one more node per section than the mesh
+    itself, which must not exceed the maximum), sections needing more nodes
+    fall back to h refinement, keeping their number of nodes (see
+    :meth:`PhMeshRefinementABC.h_subdivide_factor`).
+
+    """
+
+    def phase_section_refinement(self, p):
         mesh_tol = self.ocp.settings.mesh_tolerance
         col_points_min = self.ocp.settings.collocation_points_min
         col_points_max = self.ocp.settings.collocation_points_max
         max_rel_mesh_errs = self.maximum_relative_mesh_errors[p.i]
-
-        if np.max(max_rel_mesh_errs) > mesh_tol:
-
-            error_to_tolerance_ratio = max_rel_mesh_errs / mesh_tol
-            log_error_to_tolerance_ratio = np.log(error_to_tolerance_ratio)
-            log_base = np.log(self.it.mesh.N_K[p.i])
-            P_q = np.ceil(np.divide(log_error_to_tolerance_ratio, log_base))
-            P_q_zero = P_q <= 0
-            P_q_reduced = P_q[P_q_zero]
-            P_q[P_q_zero] = P_q_reduced + np.ceil((np.log(-P_q_reduced + 1)))
-            predicted_nodes = P_q + self.it.mesh.N_K[p.i]
-
-            MERGE_TOLERANCE_FACTOR = 0
-            log_tolerance = np.log(np.divide(mesh_tol, max_rel_mesh_errs))
-            merge_tolerance = MERGE_TOLERANCE_FACTOR / log_tolerance
-            merge_required = predicted_nodes < merge_tolerance
-
-            reduction_tolerance = 1 + np.reciprocal(log_tolerance)
-            reduction_tolerance_lt_zero = reduction_tolerance < 0
-            reduction_tolerance[reduction_tolerance_lt_zero] = 0
-
-            subdivide_required = predicted_nodes >= col_points_max
-            subdivide_level = np.ones_like(predicted_nodes)
-            subdivide_level[subdivide_required] = np.ceil(
-                predicted_nodes[subdivide_required] / col_points_min)
-
-            merge_group = []
-            subdivide_group = []
-            new_mesh_sec_sizes = []
-            new_num_mesh_sec_nodes = []
-            zipped = zip(merge_required,
-                         subdivide_required,
-                         subdivide_level,
-                         reduction_tolerance,
-                         P_q,
-                         self.it.mesh.h_K[p.i],
-                         self.it.mesh.N_K[p.i])
-            for need_merge, need_subdivide, subdivide_factor, tol, P, h, N_k in zipped:
-                if need_merge:
-                    if subdivide_group != []:
-                        new_mesh_sec_sizes, new_num_mesh_sec_nodes = subdivide_sections(
-                            new_mesh_sec_sizes, new_num_mesh_sec_nodes, subdivide_group)
-                        subdivide_group = []
-                    merge = [P, h, N_k]
-                    merge_group.append(merge)
-                else:
-                    if merge_group != []:
-                        new_mesh_sec_sizes, new_num_mesh_sec_nodes = merge_sections(
-                            new_mesh_sec_sizes, new_num_mesh_sec_nodes, merge_group)
-                        merge_group = []
-                    subdivide = [need_subdivide,
+        N_K = self.it.mesh.N_K[p.i]
+        refine_required = max_rel_mesh_errs > mesh_tol
+        predicted_nodes = N_K + self.predicted_degree_change(p).astype(int)
+        predicted_nodes = np.where(refine_required, predicted_nodes, N_K)
+        h_refine_required = predicted_nodes >= col_points_max
+        next_N_K = np.where(h_refine_required,
+                            N_K,
+                            np.maximum(predicted_nodes, col_points_min))
+        subdivide_factor = np.where(h_refine_required,
+                                    self.h_subdivide_factor(p),
+                                    1)
+        return SectionRefinement(next_N_K, subdivide_factor, None, None)
+
+    def predicted_section_errors(self, p, refinement):
+        p_errors = super().predicted_section_errors(p, refinement)
+        h_errors = self.h_predicted_section_errors(p,
+                                                   refinement.subdivide_factor)
+        return np.where(refinement.subdivide_factor > 1, h_errors, p_errors)
+
+
+class LiuHagerRaoMeshRefinement(PhMeshRefinementABC):
+    """hp mesh refinement with nonsmoothness detection.
+
+    In the style of Liu, Hager and Rao, mesh sections whose error exceeds
+    the mesh tolerance are p-refined if the solution is smooth in them and
+    the predicted number of nodes is less than the maximum, and are
+    otherwise h-refined in to mesh sections with the minimum number of nodes.
+    The solution is considered smooth in a mesh section if the highest-degree
+    Legendre coefficients of the state derivatives decay exponentially at a
+    rate of at least :data:`LEGENDRE_DECAY_RATE_MIN` (following Mavriplis).
+    The mesh size is reduced in the same way as by
+    :class:`PattersonRaoMeshRefinement`.
+
+    """
+
+    def phase_section_refinement(self, p):
+        mesh_tol = self.ocp.settings.mesh_tolerance
+        col_points_min = self.ocp.settings.collocation_points_min
+        col_points_max = self.ocp.settings.collocation_points_max
+        max_rel_mesh_errs = self.maximum_relative_mesh_errors[p.i]
+        N_K = self.it.mesh.N_K[p.i]
+        P_q = self.predicted_degree_change(p)
+        predicted_nodes = P_q + N_K
+        merge_required = self.merge_required(p, predicted_nodes)
+        refine_required = max_rel_mesh_errs > mesh_tol
+        smooth = self.phase_smooth_sections(p, refine_required)
+        h_refine = refine_required & (~smooth
+                                      | (predicted_nodes >= col_points_max))
+        subdivide_factor = np.ones(len(N_K), dtype=int)
+        subdivide_factor[h_refine] = np.maximum(np.ceil(
+            predicted_nodes[h_refine] / col_points_min), 2)
+        next_N_K = self.predicted_section_nodes(p, P_q).astype(int)
+        next_N_K[h_refine] = col_points_min
+        next_N_K[next_N_K < col_points_min] = col_points_min
+        return SectionRefinement(next_N_K,
                                  subdivide_factor,
-                                 tol,
-                                 P,
-                                 h,
-                                 N_k]
-                    subdivide_group.append(subdivide)
-            else:
-                if merge_group != []:
-                    new_mesh_sec_sizes, new_num_mesh_sec_nodes = merge_sections(
-                        new_mesh_sec_sizes, new_num_mesh_sec_nodes, merge_group)
-                elif subdivide_group != []:
-                    new_mesh_sec_sizes, new_num_mesh_sec_nodes = subdivide_sections(
-                        new_mesh_sec_sizes, new_num_mesh_sec_nodes, subdivide_group)
-            new_number_mesh_secs = len(new_mesh_sec_sizes)
-            new_mesh = PhaseMesh(phase=p.ocp_phase,
-                                 number_mesh_sections=new_number_mesh_secs,
-                                 mesh_section_sizes=new_mesh_sec_sizes,
-                                 number_mesh_section_nodes=new_num_mesh_sec_nodes)
-            return new_mesh
-        else:
-            return p.ocp_phase.mesh
+                                 merge_required,
+                                 P_q)
 
+    def phase_smooth_sections(self, p, sections):
+        """Whether the solution is smooth in each of a phase's sections.
 
-MESH_REFINEMENT_ALGORITHMS = Options((PATTERSON_RAO, ),
+        Only the sections flagged in `sections` are checked, all others are
+        reported as smooth. Coefficients smaller than the mesh tolerance
+        relative to the largest coefficient are considered resolved.
+
+        """
+        mesh_tol = self.ocp.settings.mesh_tolerance
+        dy_polys = self.sol.phase_polys[p.i].dy
+        smooth = np.ones(len(sections), dtype=bool)
+        for i_k in np.flatnonzero(sections):
+            for dy_poly in dy_polys[:, i_k]:
+                coef = np.abs(dy_poly.coef)
+                floor = mesh_tol * np.max(coef)
+                tail = coef[-NUM_LEGENDRE_DECAY_COEFFICIENTS:]
+                if len(tail) < 2 or np.all(tail <= floor):
+                    continue
+                degree = np.arange(len(tail))
+                slope = np.polyfit(degree, np.log(tail + floor), 1)[0]
+                if -slope < LEGENDRE_DECAY_RATE_MIN:
+                    smooth[i_k] = False
+                    break
+        return smooth
+
+
+class CostModelMeshRefinement(PhMeshRefinementABC):
+    """Mesh refinement selecting the strategy giving the smallest NLP.
+
+    For each phase, each of the strategies in :attr:`STRATEGIES` proposes a
+    refinement of the mesh. Proposals whose mesh error, predicted by the
+    proposing strategy's own error model, still exceeds the mesh tolerance
+    are discarded, and of the rest the one with the fewest phase NLP
+    variables (number of nodes multiplied by the number of state and control
+    variables) is used. Ties are broken in favour of the strategy listed
+    first. If no proposal is predicted to meet the mesh tolerance, the one
+    with the smallest predicted error is used.
+
+    This is a heuristic: the error models are only estimates, so the
+    smallest proposal predicted to meet the mesh tolerance may need more
+    mesh iterations than a larger one to actually meet it.
+
+    """
+
+    STRATEGIES = (PattersonRaoMeshRefinement,
+                  LiuHagerRaoMeshRefinement,
+                  HMeshRefinement,
+                  PMeshRefinement)
+
+    def phase_section_refinement(self, p):
+        mesh_tol = self.ocp.settings.mesh_tolerance
+        refinements = []
+        predicted_errors = []
+        nlp_sizes = []
+        for strategy_cls in self.STRATEGIES:
+            strategy = strategy_cls.from_mesh_refinement(self)
+            refinement = strategy.phase_section_refinement(p)
+            predicted_error = np.max(
+                strategy.predicted_section_errors(p, refinement))
+            phase_mesh = strategy.phase_mesh_from_sections(p, *refinement)
+            refinements.append(refinement)
+            predicted_errors.append(predicted_error)
+            nlp_sizes.append(self.phase_nlp_size(p, phase_mesh))
+        meets_tolerance = np.array(predicted_errors) <= mesh_tol
+        if np.any(meets_tolerance):
+            costs = np.where(meets_tolerance, nlp_sizes, np.inf)
+        else:
+            costs = predicted_errors
+        return refinements[np.argmin(costs)]
+
+    @staticmethod
+    def phase_nlp_size(p, phase_mesh):
+        """Number of continuous NLP variables for a phase on a phase mesh."""
+        N_K = phase_mesh.number_mesh_section_nodes
+        num_nodes = np.sum(N_K) - len(N_K) + 1
+        return num_nodes * (p.num_y_var + p.num_u_var)
+
+
+MESH_REFINEMENT_ALGORITHMS = Options((PATTERSON_RAO,
+                                      LIU_HAGER_RAO,
+                                      H_REFINEMENT,
+                                      P_REFINEMENT,
+                                      COST_MODEL),
                                      default=PATTERSON_RAO,
-                                     handles=(PattersonRaoMeshRefinement, ))
+                                     handles=(PattersonRaoMeshRefinement,
+                                              LiuHagerRaoMeshRefinement,
+                                              HMeshRefinement,
+                                              PMeshRefinement,
+                                              CostModelMeshRefinement))
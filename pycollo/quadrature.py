@@ -1,17 +1,29 @@
 """Computation of quadrature points and weights for different schemes.
 
+Quadrature tables (points, weights, Butcher arrays and collocation matrices)
+depend only on the quadrature method and order so are computed once per
+process and shared by all :py:class:`Quadrature` instances. Points are
+computed as eigenvalues of the Jacobi matrix of the corresponding orthogonal
+polynomials (Golub-Welsch) and integration matrices by barycentric Lagrange
+interpolation, both of which remain accurate at high orders.
+
 Attributes
 ----------
+COLLOCATION_POINTS_LIMIT : int
+    Upper limit on the number of collocation points per mesh section that a
+    user can specify.
 DEFAULT_COLLOCATION_POINTS_MAX : int
     Constant default limitation on the maximum number of collocation points
-    per mesh section that a user can specify. The value of 20 has been chosen
-    as above this the algorithms that are used for evaluating the orthogonal
-    polynomials become numerically unstable and raise a warning.
+    per mesh section that a user can specify. The value of 10 has been chosen
+    as a trade-off between the accuracy of each mesh section and the size and
+    density of the resulting NLP.
 DEFAULT_COLLOCATION_POINTS_MIN : int
     Constant default limitation on the minimum number of collocation points
     per mesh section that a user can specify. The value of 2 has been chosen
     as this is the smallest possible value that still makes logical sense (i.e.
     a mesh section cannot have fewer than two nodes).
+DEFAULT_QUADRATURE_CACHE_DIRECTORY : None
+    Quadrature tables are by default only cached in memory.
 GAUSS : str
     Keyword identifier for Legendre-Gauss quadrature method.
 LOBATTO : str
@@ -25,8 +37,14 @@ RADAU : str
 __all__ = []
 
 
+import collections
+import os
+import tempfile
+from pathlib import Path
+
 import numpy as np
 import scipy.interpolate as interpolate
+import scipy.special as special
 from pyproprop import Options
 
 
@@ -37,6 +55,24 @@ QUADRATURES = Options((GAUSS, LOBATTO, RADAU), default=LOBATTO,
                       unsupported=GAUSS)
 DEFAULT_COLLOCATION_POINTS_MIN = 4
 DEFAULT_COLLOCATION_POINTS_MAX = 10
+COLLOCATION_POINTS_LIMIT = 40
+DEFAULT_QUADRATURE_CACHE_DIRECTORY = None
+
+
+QuadratureTable = collections.namedtuple("QuadratureTable",
+                                         ["polynomial",
+                                          "points",
+                                          "weights",
+                                          "butcher_array",
+                                          "D_matrix",
+                                          "A_matrix",
+                                          "D_index_array",
+                                          "A_index_array",
+                                          "collocated_columns",
+                                          "differential_D_matrix",
+                                          "differential_A_matrix"])
+
+_QUADRATURE_TABLES = {}
 
 
 class Quadrature:
@@ -44,15 +80,6 @@ class Quadrature:
 
     def __init__(self, backend):
         self.backend = backend
-        self._polynomials = {}
-        self._quadrature_points = {}
-        self._quadrature_weights = {}
-        self._butcher_arrays = {}
-        self._D_matrices = {}
-        self._A_matrices = {}
-        self._W_matrices = {}
-        self._D_index_arrays = {}
-        self._A_index_arrays = {}
 
     @property
     def settings(self):
@@ -67,26 +94,17 @@ class Quadrature:
         self._backend = backend
         self.order_range = list(range(
             self.settings.collocation_points_min, self.settings.collocation_points_max))
-        if self.settings.quadrature_method == LOBATTO:
-            self.quadrature_generator = self.lobatto_generator
-        elif self.settings.quadrature_method == RADAU:
-            self.quadrature_generator = self.radau_generator
-        elif self.settings.quadrature_method == GAUSS:
-            self.quadrature_generator = self.gauss_generator
-
-    def _retrive_or_generate_dict_value(self, quad_dict, order):
-        try:
-            quad_dict[order]
-        except KeyError:
-            self.quadrature_generator(order)
-        return quad_dict[order]
+
+    def table(self, order):
+        cache_directory = self.settings.quadrature_cache_directory
+        return quadrature_table(self.settings.quadrature_method, order,
+                                cache_directory=cache_directory)
 
     def polynomials(self, order):
-        return self._retrive_or_generate_dict_value(self._polynomials, order)
+        return self.table(order).polynomial
 
     def quadrature_point(self, order, *, domain=None):
-        points = self._retrive_or_generate_dict_value(
-            self._quadrature_points, order)
+        points = self.table(order).points
         if domain:
             stretch = 0.5 * (domain[1] - domain[0])
             scale = 0.5 * (domain[0] + domain[1])
@@ -95,176 +113,289 @@ class Quadrature:
             return points
 
     def quadrature_weight(self, order):
-        return self._retrive_or_generate_dict_value(self._quadrature_weights, order)
+        return self.table(order).weights
 
     def butcher_array(self, order):
-        return self._retrive_or_generate_dict_value(self._butcher_arrays, order)
+        return self.table(order).butcher_array
 
     def D_matrix(self, order):
-        return self._retrive_or_generate_dict_value(self._D_matrices, order)
+        return self.table(order).D_matrix
 
     def A_matrix(self, order):
-        return self._retrive_or_generate_dict_value(self._A_matrices, order)
-
-    def W_matrix(self, order):
-        return self._retrive_or_generate_dict_value(self._W_matrices, order)
+        return self.table(order).A_matrix
 
     def D_index_array(self, order):
-        return self._retrive_or_generate_dict_value(self._D_index_arrays, order)
+        return self.table(order).D_index_array
 
     def A_index_array(self, order):
-        return self._retrive_or_generate_dict_value(self._A_index_arrays, order)
-
-    def radau_generator(self, order):
-        coefficients = [0] * (order - 2)
-        coefficients.extend([1, 1])
-        legendre_polynomial = np.polynomial.legendre.Legendre(coefficients)
-        self._polynomials.update({order: legendre_polynomial})
-
-        radau_points = legendre_polynomial.roots()
-        radau_points = np.concatenate([radau_points, np.array([0])])
-        self._quadrature_points.update({order: radau_points})
-
-        coefficients = [0] * (order - 2)
-        coefficients.extend([1])
-        legendre_polynomial = np.polynomial.legendre.Legendre(coefficients)
-        radau_weights = [2 / (order - 1)**2]
-        radau_weights = np.array(
-            radau_weights + [(1 - x) / ((order - 1)**2 * (legendre_polynomial(x)**2))
-                             for x in radau_points[1:-1]])
-        radau_weights = np.concatenate([radau_weights, np.array([0])])
-        self._quadrature_weights.update({order: radau_weights})
-
-        butcher_points = self.quadrature_point(order, domain=[0, 1])
-        butcher_array = np.zeros((order, order))
-        butcher_array[-1, :] = radau_weights / 2
-        if order > 2:
-            A_row = (order + 1) * (order - 2)
-            A_col = order * (order - 2)
-            A = np.zeros((A_row, A_col))
-            b = np.zeros(A_row)
-            for k in range(order - 2):
-                for j in range(order):
-                    row = j + k * order
-                    for i in range(order - 2):
-                        col = i + j * (order - 2)
-                        A[row, col] = radau_weights[i + 1] * \
-                            butcher_points[i + 1]**k
-                    b[row] = (radau_weights[j] / (k + 1)) * (1 - butcher_points[j]
-                                                             ** (k + 1)) - radau_weights[-1] * radau_weights[j]
-            del_row = []
-            for i, row in enumerate(A):
-                if np.count_nonzero(row) == 0:
-                    del_row.append(i)
-            A = np.delete(A, del_row, axis=0)
-            b = np.delete(b, del_row, axis=0)
-            a = np.linalg.solve(A, b)
-            butcher_array[1:-1, :] = a.reshape(order - 2, -1, order='F')
-        self._butcher_arrays.update({order: butcher_array})
-
-        D_left = np.ones((order - 1, 1), dtype=int)
-        D_right = np.diag(-1 * np.ones((order - 1, ), dtype=int))
-        D_matrix = np.hstack([D_left, D_right])
-        self._D_matrices.update({order: D_matrix})
-
-        A_matrix = self.butcher_array(order)[1:, :]
-        self._A_matrices.update({order: A_matrix})
-
-        A_index_array = np.array(range(A_matrix.size), dtype=int)
-        self._A_index_arrays.update({order: A_index_array})
-
-        D_num_row, D_num_col = D_matrix.shape
-        D_rows = np.array(range(D_num_row), dtype=int)
-        D_left = D_rows * D_num_col
-        D_right = D_rows * (D_num_col + 1) + 1
-        D_index_array = np.concatenate((D_left, D_right))
-        D_index_array.sort()
-        self._D_index_arrays.update({order: D_index_array})
-
-        # print(f'x: {radau_points}')
-        # print(f'w: {radau_weights}, {sum(radau_weights)}')
-        # print(f"a: {butcher_array}")
-        # print(f"A: {D_matrix}")
-        # print(f"I: {A_matrix}")
-        # input()
-
-    def lobatto_generator(self, order):
-        num_interior_points = order - 1
-        coefficients = [0] * (num_interior_points)
-        coefficients.append(1)
-        legendre_polynomial = np.polynomial.legendre.Legendre(coefficients)
-        self._polynomials.update({order: legendre_polynomial})
-
-        lobatto_points = legendre_polynomial.deriv().roots()
-        lobatto_points = np.insert(lobatto_points, 0, -1, axis=0)
-        lobatto_points = np.append(lobatto_points, 1)
-        self._quadrature_points.update({order: lobatto_points})
-
-        lobatto_weights = np.array(
-            [1 / (order * (order - 1) * (legendre_polynomial(x)**2)) for x in lobatto_points])
-        self._quadrature_weights.update({order: lobatto_weights})
-
-        butcher_points = self.quadrature_point(order, domain=[0, 1])
-        # print(f'x\': {butcher_points}')
-        butcher_array = np.zeros((order, order))
-        butcher_array[-1, :] = lobatto_weights
-        if order > 2:
-            A_row = (order + 1) * (order - 2)
-            A_col = order * (order - 2)
-            A = np.zeros((A_row, A_col))
-            b = np.zeros(A_row)
-            for k in range(order - 2):
-                # print(f'k: {k}')
-                for j in range(order):
-                    # print(f'j: {j}')
-                    row = j + k * order
-                    # print(f'row: {row}')
-                    for i in range(order - 2):
-                        # print(f'i: {i}')
-                        col = i + j * (order - 2)
-                        # print(f'col: {col}')
-                        A[row, col] = lobatto_weights[i + 1] * \
-                            butcher_points[i + 1]**k
-                        # print(f'A: {lobatto_weights[i+1] * butcher_points[i+1]**k}')
-                    b[row] = (lobatto_weights[j] / (k + 1)) * (1 - butcher_points[j]
-                                                               ** (k + 1)) - lobatto_weights[-1] * lobatto_weights[j]
-
-                    # print(f'b: {(lobatto_weights[j]/(k+1))*(1 - butcher_points[j]**(k+1)) - lobatto_weights[-1]*lobatto_weights[j]}\n')
-            del_row = []
-            for i, row in enumerate(A):
-                if np.count_nonzero(row) == 0:
-                    del_row.append(i)
-            A = np.delete(A, del_row, axis=0)
-            b = np.delete(b, del_row, axis=0)
-            a = np.linalg.solve(A, b)
-            # print(f'A: {A}')
-            # print(f'b: {b}')
-            # print(f'a: {a}')
-            butcher_array[1:-1, :] = a.reshape(order - 2, -1, order='F')
-        self._butcher_arrays.update({order: butcher_array})
-
-        D_left = np.ones((num_interior_points, 1), dtype=int)
-        D_right = np.diag(-1 * np.ones((num_interior_points, ), dtype=int))
-        D_matrix = np.hstack([D_left, D_right])
-        self._D_matrices.update({order: D_matrix})
-
-        A_matrix = self.butcher_array(order)[1:, :]
-        self._A_matrices.update({order: A_matrix})
-
-        A_index_array = np.array(range(A_matrix.size), dtype=int)
-        self._A_index_arrays.update({order: A_index_array})
-
-        D_num_row, D_num_col = D_matrix.shape
-        D_rows = np.array(range(D_num_row), dtype=int)
-        D_left = D_rows * D_num_col
-        D_right = D_rows * (D_num_col + 1) + 1
-        D_index_array = np.concatenate((D_left, D_right))
-        D_index_array.sort()
-        self._D_index_arrays.update({order: D_index_array})
-
-        # print(f'x: {lobatto_points}')
-        # print(f'w: {lobatto_weights}, {sum(lobatto_weights)}')
-        # print(f"a: {butcher_array}")
-        # print(f"A: {D_matrix}")
-        # print(f"I: {A_matrix}")
-        # input()
+        return self.table(order).A_index_array
+
+    def differential_D_matrix(self, order):
+        return self.table(order).differential_D_matrix
+
+    def differential_A_matrix(self, order):
+        return self.table(order).differential_A_matrix
+
+
+def quadrature_table(method, order, *, cache_directory=None):
+    """Quadrature table for a quadrature method and order.
+
+    Tables are memoised for the lifetime of the process and shared between
+    all callers, so their arrays are read-only. If a cache directory is
+    given then tables are additionally persisted to, and loaded from, files
+    in that directory so that they are shared between processes.
+
+    Parameters
+    ----------
+    method : str
+        Quadrature method, either :py:const:`LOBATTO` or :py:const:`RADAU`.
+    order : int
+        Number of nodes in the mesh section (including the non-collocated
+        final node for Radau quadrature).
+    cache_directory : str, optional
+        Directory in which tables are persisted.
+
+    Returns
+    -------
+    QuadratureTable
+        Polynomial, points, weights, Butcher array and collocation
+        matrices.
+
+    Raises
+    ------
+    ValueError
+        If the quadrature method is not supported.
+
+    """
+    key = (method, order)
+    try:
+        return _QUADRATURE_TABLES[key]
+    except KeyError:
+        pass
+    try:
+        generator = _QUADRATURE_GENERATORS[method]
+    except KeyError:
+        msg = f"Quadrature tables cannot be generated for '{method}'."
+        raise ValueError(msg)
+    if cache_directory is None:
+        table = generator(order)
+    else:
+        path = Path(cache_directory).expanduser() / f"quadrature_{method}_{order}.npz"
+        table = _load_quadrature_table(path)
+        if table is None:
+            table = generator(order)
+            _save_quadrature_table(table, path)
+    for array in table:
+        if isinstance(array, np.ndarray):
+            array.flags.writeable = False
+    _QUADRATURE_TABLES[key] = table
+    return table
+
+
+def lobatto_generator(order):
+    """Legendre-Gauss-Lobatto quadrature table.
+
+    The interior points are the roots of the derivative of the Legendre
+    polynomial of degree `order - 1`, i.e. the Gauss-Jacobi points with
+    alpha = beta = 1. Weights are scaled to the domain [0, 1].
+
+    """
+    num_interior_points = order - 1
+    coefficients = [0] * (num_interior_points)
+    coefficients.append(1)
+    legendre_polynomial = np.polynomial.legendre.Legendre(coefficients)
+
+    interior_points = gauss_jacobi_points(order - 2, 1, 1)
+    lobatto_points = np.concatenate([[-1], interior_points, [1]])
+
+    lobatto_weights = 1 / (order * (order - 1)
+                           * legendre_polynomial(lobatto_points)**2)
+
+    butcher_array = np.zeros((order, order))
+    butcher_array[1:-1, :] = 0.5 * integration_matrix(
+        lobatto_points, lobatto_points[1:-1])
+    butcher_array[-1, :] = lobatto_weights
+    collocated_columns = np.arange(1, order)
+    return _complete_quadrature_table(legendre_polynomial, lobatto_points,
+                                      lobatto_weights, butcher_array,
+                                      collocated_columns)
+
+
+def radau_generator(order):
+    """Legendre-Gauss-Radau quadrature table.
+
+    The `order - 1` collocation points are -1 and the Gauss-Jacobi points
+    with alpha = 0, beta = 1. The final (non-collocated) node of the mesh
+    section is appended as a placeholder with zero weight. Weights are on
+    the domain [-1, 1].
+
+    """
+    num_collocation_points = order - 1
+    coefficients = [0] * (order - 2)
+    coefficients.extend([1, 1])
+    legendre_polynomial = np.polynomial.legendre.Legendre(coefficients)
+
+    interior_points = gauss_jacobi_points(order - 2, 0, 1)
+    radau_points = np.concatenate([[-1], interior_points])
+
+    coefficients = [0] * (order - 2)
+    coefficients.extend([1])
+    weight_polynomial = np.polynomial.legendre.Legendre(coefficients)
+    radau_weights = ((1 - radau_points)
+                     / (num_collocation_points**2
+                        * weight_polynomial(radau_points)**2))
+
+    butcher_array = np.zeros((order, order))
+    butcher_array[1:-1, :-1] = 0.5 * integration_matrix(
+        radau_points, radau_points[1:])
+    butcher_array[-1, :-1] = radau_weights / 2
+
+    radau_points = np.concatenate([radau_points, np.array([0])])
+    radau_weights = np.concatenate([radau_weights, np.array([0])])
+    collocated_columns = np.arange(order - 1)
+    return _complete_quadrature_table(legendre_polynomial, radau_points,
+                                      radau_weights, butcher_array,
+                                      collocated_columns)
+
+
+def gauss_jacobi_points(n, alpha, beta):
+    """Roots of the degree-n Jacobi polynomial P_n^(alpha, beta).
+
+    Computed by the Golub-Welsch algorithm (eigenvalues of the symmetric
+    tridiagonal Jacobi matrix) with Newton refinement.
+
+    """
+    if n < 1:
+        return np.array([])
+    points, _ = special.roots_jacobi(n, alpha, beta)
+    return points
+
+
+def barycentric_weights(points):
+    """Barycentric weights of the Lagrange basis on a set of points.
+
+    Weights are normalised to a maximum magnitude of 1, which leaves
+    barycentric interpolation unchanged. Sets of points can be batched along
+    leading axes of `points`.
+
+    """
+    points = np.asarray(points, dtype=float)
+    differences = points[..., :, np.newaxis] - points[..., np.newaxis, :]
+    differences[..., np.eye(points.shape[-1], dtype=bool)] = 1
+    log_magnitude = -np.sum(np.log(np.abs(differences)), axis=-1)
+    sign = np.prod(np.sign(differences), axis=-1)
+    max_log_magnitude = np.max(log_magnitude, axis=-1, keepdims=True)
+    return sign * np.exp(log_magnitude - max_log_magnitude)
+
+
+def lagrange_basis(points, x):
+    """Lagrange basis polynomials on `points` evaluated at `x`.
+
+    Uses the (second, "true") barycentric formula, which is numerically
+    stable for well-distributed points. Sets of points can be batched along
+    leading axes of `points`, which must then broadcast against `x`.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape `x.shape + (points.shape[-1], )`.
+
+    """
+    x = np.asarray(x, dtype=float)
+    weights = barycentric_weights(points)
+    differences = x[..., np.newaxis] - points
+    coincident = differences == 0
+    differences[coincident] = 1
+    terms = weights / differences
+    basis = terms / np.sum(terms, axis=-1, keepdims=True)
+    is_coincident = np.any(coincident, axis=-1)
+    basis[is_coincident] = coincident[is_coincident]
+    return basis
+
+
+def integration_matrix(points, upper_limits):
+    """Integrals of the Lagrange basis polynomials on `points`.
+
+    Entry (i, j) is the integral from -1 to `upper_limits[i]` of the j-th
+    Lagrange basis polynomial, computed exactly (to rounding) by
+    Gauss-Legendre quadrature of the barycentric interpolant.
+
+    """
+    gauss_points, gauss_weights = special.roots_legendre(len(points))
+    half_lengths = 0.5 * (np.asarray(upper_limits) + 1)
+    x = half_lengths[:, np.newaxis] * (gauss_points + 1) - 1
+    basis = lagrange_basis(points, x)
+    return half_lengths[:, np.newaxis] * np.einsum("k,ikj->ij", gauss_weights,
+                                                   basis)
+
+
+def _complete_quadrature_table(polynomial, points, weights, butcher_array,
+                               collocated_columns):
+    """Derive the collocation matrices and their index arrays.
+
+    In integral form the defects of a mesh section are `D y + h A f`. The
+    differential form premultiplies these by the inverse of the columns of
+    A of the collocated points, giving `D' y + h A' f` where A' is the
+    identity in those columns, so that each defect depends on the state
+    derivative at only its own collocation point (and the first point for
+    Lobatto quadrature). For Radau quadrature D' is the Lagrange
+    differentiation matrix.
+
+    """
+    order = len(points)
+    num_interior_points = order - 1
+    D_left = np.ones((num_interior_points, 1), dtype=int)
+    D_right = np.diag(-1 * np.ones((num_interior_points, ), dtype=int))
+    D_matrix = np.hstack([D_left, D_right])
+
+    A_matrix = butcher_array[1:, :]
+    A_index_array = np.array(range(A_matrix.size), dtype=int)
+
+    D_num_row, D_num_col = D_matrix.shape
+    D_rows = np.array(range(D_num_row), dtype=int)
+    D_left = D_rows * D_num_col
+    D_right = D_rows * (D_num_col + 1) + 1
+    D_index_array = np.concatenate((D_left, D_right))
+    D_index_array.sort()
+
+    collocated_A_matrix = A_matrix[:, collocated_columns]
+    differential_D_matrix = np.linalg.solve(collocated_A_matrix, D_matrix)
+    differential_A_matrix = np.linalg.solve(collocated_A_matrix, A_matrix)
+    differential_A_matrix[:, collocated_columns] = np.eye(num_interior_points)
+
+    return QuadratureTable(polynomial, points, weights, butcher_array,
+                           D_matrix, A_matrix, D_index_array, A_index_array,
+                           collocated_columns, differential_D_matrix,
+                           differential_A_matrix)
+
+
+def _load_quadrature_table(path):
+    """Quadrature table persisted to a file, or None if there isn't one."""
+    try:
+        with np.load(path) as data:
+            polynomial = np.polynomial.legendre.Legendre(data["polynomial"])
+            return _complete_quadrature_table(polynomial, data["points"],
+                                              data["weights"],
+                                              data["butcher_array"],
+                                              data["collocated_columns"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _save_quadrature_table(table, path):
+    """Persist a quadrature table, atomically so concurrent readers never
+    load a partially written file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".npz",
+                                     delete=False) as file:
+        np.savez(file,
+                 polynomial=table.polynomial.coef,
+                 points=table.points,
+                 weights=table.weights,
+                 butcher_array=table.butcher_array,
+                 collocated_columns=table.collocated_columns)
+    os.replace(file.name, path)
+
+
+_QUADRATURE_GENERATORS = {LOBATTO: lobatto_generator,
+                          RADAU: radau_generator}
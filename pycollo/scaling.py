@@ -1,7 +1,6 @@
 import abc
 
 import numpy as np
-import scipy.sparse as sparse
 from pyproprop import Options, processed_property
 
 
@@ -184,6 +183,26 @@ class IterationScaling:
     def scale_lagrange(self, lagrange_tilde):
         raise NotImplementedError
 
+    def scale_lam_x(self, lam_x):
+        """Convert variable bound multipliers to the scaled NLP basis."""
+        lam_x_tilde = self.w * np.multiply(self.V, lam_x)
+        return lam_x_tilde
+
+    def unscale_lam_x(self, lam_x_tilde):
+        """Convert variable bound multipliers to the user basis."""
+        lam_x = np.multiply(self.V_inv, lam_x_tilde) / self.w
+        return lam_x
+
+    def scale_lam_g(self, lam_g):
+        """Convert constraint multipliers to the scaled NLP basis."""
+        lam_g_tilde = self.w * np.divide(lam_g, self.W)
+        return lam_g_tilde
+
+    def unscale_lam_g(self, lam_g_tilde):
+        """Convert constraint multipliers to the user basis."""
+        lam_g = np.multiply(self.W, lam_g_tilde) / self.w
+        return lam_g
+
     def unscale_J(self, J_tilde):
         """Convert J for the scaled NLP to the user basis."""
         J = (1 / self.w) * J_tilde
@@ -212,62 +231,11 @@ class IterationScaling:
 
     def _expand_x_to_mesh(self, base_scaling):
         """Expand basis scaling (OCP variables) to iteration variables."""
-        scaling = np.empty(self.iteration.num_x)
-        zip_args = zip(self.backend.phase_y_var_slices,
-                       self.backend.phase_u_var_slices,
-                       self.backend.phase_q_var_slices,
-                       self.backend.phase_t_var_slices,
-                       self.iteration.y_slices,
-                       self.iteration.u_slices,
-                       self.iteration.q_slices,
-                       self.iteration.t_slices,
-                       self.iteration.mesh.N)
-        for values in zip_args:
-            ocp_y_slice = values[0]
-            ocp_u_slice = values[1]
-            ocp_q_slice = values[2]
-            ocp_t_slice = values[3]
-            y_slice = values[4]
-            u_slice = values[5]
-            q_slice = values[6]
-            t_slice = values[7]
-            N = values[8]
-            scaling[y_slice] = np.repeat(base_scaling[ocp_y_slice], N)
-            scaling[u_slice] = np.repeat(base_scaling[ocp_u_slice], N)
-            scaling[q_slice] = base_scaling[ocp_q_slice]
-            scaling[t_slice] = base_scaling[ocp_t_slice]
-        ocp_s_slice = self.backend.s_var_slice
-        s_slice = self.iteration.s_slice
-        scaling[s_slice] = base_scaling[ocp_s_slice]
-        return scaling
+        return np.take(base_scaling, self.iteration.x_ocp_index)
 
     def _expand_c_to_mesh(self, base_scaling):
         """Expand basis scaling (OCP constraints) to iteration constraints."""
-        scaling = np.empty(self.iteration.num_c)
-        zip_args = zip(self.backend.phase_y_eqn_slices,
-                       self.backend.phase_p_con_slices,
-                       self.backend.phase_q_fnc_slices,
-                       self.iteration.c_defect_slices,
-                       self.iteration.c_path_slices,
-                       self.iteration.c_integral_slices,
-                       self.iteration.mesh.num_c_defect_per_y,
-                       self.iteration.mesh.N)
-        for values in zip_args:
-            ocp_d_slice = values[0]
-            ocp_p_slice = values[1]
-            ocp_q_slice = values[2]
-            d_slice = values[3]
-            p_slice = values[4]
-            i_slice = values[5]
-            num_d = values[6]
-            N = values[7]
-            scaling[d_slice] = np.repeat(base_scaling[ocp_d_slice], num_d)
-            scaling[p_slice] = np.repeat(base_scaling[ocp_p_slice], N)
-            scaling[i_slice] = base_scaling[ocp_q_slice]
-        ocp_e_slice = self.backend.c_endpoint_slice
-        e_slice = self.iteration.c_endpoint_slice
-        scaling[e_slice] = base_scaling[ocp_e_slice]
-        return scaling
+        return np.take(base_scaling, self.iteration.c_ocp_index)
 
     def _generate_first_iteration(self):
         """Generate objective/constraint scaling for first mesh iteration."""
@@ -392,8 +360,11 @@ class IterationScaling:
             return null_scaling
         args = np.concatenate([x_guess, null_scaling])
         G = self.backend.G_iter_scale_callable(args)
-        sG = sparse.coo_matrix(np.array(G))
-        G_norm = np.squeeze(np.sqrt(np.array(sG.power(2).sum(axis=1))))
+        G_nonzeros = np.array(G.nonzeros(), dtype=np.float64)
+        G_rows = np.array(G.sparsity().row(), dtype=int)
+        G_norm = np.sqrt(np.bincount(G_rows,
+                                     weights=G_nonzeros**2,
+                                     minlength=G.size1()))
         ocp_c_scales = np.empty(self.backend.num_c)
         zip_args = zip(
             self.backend.phase_y_var_slices,
@@ -13,6 +13,10 @@ __all__ = ["Settings"]
 from pyproprop import processed_property
 
 from .backend import BACKENDS
+from .backend import DEFAULT_COMPILE_NLP_FUNCTIONS
+from .backend import DEFAULT_NLP_CACHE_DIRECTORY
+from .backend import MAP_PARALLELISATIONS
+from .backend import NODE_FUNCTION_MODES
 from .bounds import DEFAULT_ASSUME_INF_BOUNDS
 from .bounds import DEFAULT_BOUND_CLASH_ABSOLUTE_TOLERANCE
 from .bounds import DEFAULT_BOUND_CLASH_RELATIVE_TOLERANCE
@@ -23,8 +27,11 @@ from .compiled import COLLOCATION_MATRIX_FORMS
 from .mesh_refinement import MESH_REFINEMENT_ALGORITHMS
 from .mesh_refinement import DEFAULT_MESH_TOLERANCE
 from .mesh_refinement import DEFAULT_MAX_MESH_ITERATIONS
+from .mesh_refinement import DEFAULT_MESH_COARSENING_TOLERANCE
 from .quadrature import DEFAULT_COLLOCATION_POINTS_MIN
 from .quadrature import DEFAULT_COLLOCATION_POINTS_MAX
+from .quadrature import COLLOCATION_POINTS_LIMIT
+from .quadrature import DEFAULT_QUADRATURE_CACHE_DIRECTORY
 from .quadrature import QUADRATURES
 from .scaling import DEFAULT_NUMBER_SCALING_SAMPLES
 from .scaling import DEFAULT_SCALING_WEIGHT
@@ -81,11 +88,23 @@ class Settings():
     collocation_matrix_form : str
         Whether the integral or derivative form of the collocation matrix
         should be used. Specifically relates to the construction of the
-        dynamics defect constraints.
+        dynamics defect constraints. Both forms give the same discretisation
+        but the differential form's defect Jacobian is sparser, which may
+        factorise faster.
     collocation_points_max : int
         Minimum allowable number of mesh points per mesh section.
     collocation_points_min : int
         Maximum allowable number of mesh points per mesh section.
+    compile_nlp_functions : bool
+        Whether the NLP functions should be generated as C code and compiled
+        to a shared library for use by the NLP solver. Compiled libraries are
+        cached on disk and reused if an identical NLP is encountered again,
+        in which case the NLP is not constructed symbolically either. Each
+        mesh iteration's NLP is compiled separately, which with a cold cache
+        can take minutes per mesh iteration (far longer than solving
+        without compilation), so this only pays off for problems that are
+        solved repeatedly. Only supported by the CasADi backend and requires
+        a C compiler.
     derivative_level : int (1, 2)
         Whether to use exact Hessian in the NLP solving. If value is 1 then
         Pycollo does not produce an exact Hessian, if the value is 2 it
@@ -103,6 +122,11 @@ class Settings():
     linear_solver : str
         Which linear solver should be used by the chosen NLP solver. Note:
         different NLP solvers will support different linear solvers.
+    map_parallelisation : str
+        How mapped node functions are evaluated over the collocation nodes of
+        each phase when the node function mode is "map". One of "serial",
+        "thread" (multithreaded) or "openmp" (requires CasADi to be built
+        with OpenMP, otherwise evaluation falls back to serial).
     max_mesh_iterations : int
         How many mesh iterations should be conducted by Pycollo (provided that
         the mesh tolerance hasn't been met) before the attempt to solve the OCP
@@ -112,20 +136,52 @@ class Settings():
         the NLP tolerance hasn't been met) before the attempt to solve the NLP
         is terminated. Note: this will likely behave slightly different for
         different NLP solvers.
+    mesh_coarsening_tolerance : float
+        Fraction of the mesh tolerance below which the maximum relative mesh
+        error of a mesh section must be for it to be merged with neighbouring
+        mesh sections, reducing the size of the mesh for the next mesh
+        iteration. Only mesh sections predicted to need fewer than the
+        minimum number of collocation points are merged. The minimum value is
+        0, which disables merging and is the default, the maximum is 1.
+    mesh_refinement_algorithm : str
+        Which algorithm should be used to refine the mesh between mesh
+        iterations. One of "patterson-rao" (hp), "liu-hager-rao" (hp with
+        nonsmoothness detection), "h" (pure-h), "p" (pure-p) or "cost-model",
+        which uses whichever of the others is predicted to result in the
+        smallest NLP.
     mesh_tolerance : float
         The minimum acceptable maximum relative mesh error for the OCP to be
         considered solved.
+    nlp_function_cache_directory : str
+        Path of the directory in which compiled NLP function shared libraries
+        are cached.
     nlp_solver : str
         Which NLP solver the Pycollo backend should use.
     nlp_tolerance : float
         The minimum acceptable maximum error in the NLP that the NLP solver
         must meet before it can exit successfully.
+    node_function_mode : str
+        How the phase equations are evaluated over the collocation nodes when
+        the NLP is constructed. If "expand" then the equations are substituted
+        symbolically at every node, if "map" then a single per-node function
+        is created for each phase and mapped over its nodes. Only supported
+        by the CasADi backend. The per-node functions are created once per
+        OCP and reused by every mesh iteration, so only "map" benefits from
+        this reuse; with "expand" the equations are substituted again
+        whenever the mesh changes. Likewise spline and lookup table functions
+        are only evaluated by table lookup with "map"; with "expand" they are
+        inlined as SX expressions whose size grows with their number of
+        segments.
     number_scaling_samples : int
         How many randomly generated samples should be used when the sampleing
         scaling method is used.
     ocp : :obj:`pycollo.OptimalControlProblem`
         The optimal control problem object with which these settings should be
         associated.
+    quadrature_cache_directory : (str, None)
+        Path of the directory in which quadrature tables are persisted so
+        that they are shared between processes. If None then tables are only
+        cached in memory, for the lifetime of the process.
     quadrature_method : str
         Which K-stage Runge-Kutta orthogonal collocation/quadrature method
         should be used to transcribe the OCP to NLP.
@@ -168,6 +224,20 @@ class Settings():
         cast=True,
         options=BACKENDS,
     )
+    node_function_mode = processed_property(
+        "node_function_mode",
+        description="evaluation of phase equations over collocation nodes",
+        type=str,
+        cast=True,
+        options=NODE_FUNCTION_MODES,
+    )
+    map_parallelisation = processed_property(
+        "map_parallelisation",
+        description="parallelisation of mapped node functions",
+        type=str,
+        cast=True,
+        options=MAP_PARALLELISATIONS,
+    )
     derivative_level = processed_property(
         "derivative_level",
         description="derivative level",
@@ -189,6 +259,13 @@ class Settings():
         cast=True,
         options=QUADRATURES,
     )
+    quadrature_cache_directory = processed_property(
+        "quadrature_cache_directory",
+        description="directory for cached quadrature tables",
+        type=str,
+        cast=True,
+        optional=True,
+    )
     nlp_solver = processed_property(
         "nlp_solver",
         description="NLP solver",
@@ -220,7 +297,8 @@ class Settings():
     )
     warm_start = processed_property(
         "warm_start",
-        description="warm-start the mesh iteration using previous solution",
+        description=("primal-dual warm-start the mesh iteration using previous "
+                     "solution"),
         type=bool,
         cast=True,
     )
@@ -230,7 +308,7 @@ class Settings():
         type=int,
         cast=True,
         min=2,
-        max=20,
+        max=COLLOCATION_POINTS_LIMIT,
         at_most="collocation_points_max",
     )
     collocation_points_max = processed_property(
@@ -239,9 +317,21 @@ class Settings():
         type=int,
         cast=True,
         min=2,
-        max=20,
+        max=COLLOCATION_POINTS_LIMIT,
         at_least="collocation_points_min"
     )
+    compile_nlp_functions = processed_property(
+        "compile_nlp_functions",
+        description="compile NLP functions to a shared library",
+        type=bool,
+        cast=True,
+    )
+    nlp_function_cache_directory = processed_property(
+        "nlp_function_cache_directory",
+        description="directory for cached compiled NLP functions",
+        type=str,
+        cast=True,
+    )
     mesh_tolerance = processed_property(
         "mesh_tolerance",
         description="mesh tolerance",
@@ -250,6 +340,14 @@ class Settings():
         min=0.0,
         exclusive=True,
     )
+    mesh_coarsening_tolerance = processed_property(
+        "mesh_coarsening_tolerance",
+        description="mesh coarsening tolerance",
+        type=float,
+        cast=True,
+        max=1.0,
+        min=0.0,
+    )
     max_mesh_iterations = processed_property(
         "max_mesh_iterations",
         description="maximum number of mesh iterations",
@@ -368,16 +466,22 @@ class Settings():
                  *,
                  optimal_control_problem=None,
                  backend=BACKENDS.default,
+                 node_function_mode=NODE_FUNCTION_MODES.default,
+                 map_parallelisation=MAP_PARALLELISATIONS.default,
                  collocation_matrix_form=COLLOCATION_MATRIX_FORMS.default,
                  nlp_solver=DEFAULT_NLP_SOLVER,
                  linear_solver=DEFAULT_LINEAR_SOLVER,
                  nlp_tolerance=DEFAULT_NLP_TOLERANCE,
                  max_nlp_iterations=DEFAULT_MAX_NLP_ITERATIONS,
                  warm_start=DEFAULT_WARM_START,
+                 compile_nlp_functions=DEFAULT_COMPILE_NLP_FUNCTIONS,
+                 nlp_function_cache_directory=DEFAULT_NLP_CACHE_DIRECTORY,
                  quadrature_method=QUADRATURES.default,
+                 quadrature_cache_directory=DEFAULT_QUADRATURE_CACHE_DIRECTORY,
                  derivative_level=DEFAULT_DERIVATIVE_LEVEL,
                  max_mesh_iterations=DEFAULT_MAX_MESH_ITERATIONS,
                  mesh_tolerance=DEFAULT_MESH_TOLERANCE,
+                 mesh_coarsening_tolerance=DEFAULT_MESH_COARSENING_TOLERANCE,
                  collocation_points_min=DEFAULT_COLLOCATION_POINTS_MIN,
                  collocation_points_max=DEFAULT_COLLOCATION_POINTS_MAX,
                  console_out_progress=DEFAULT_CONSOLE_OUT_PROGRESS,
@@ -403,6 +507,8 @@ class Settings():
 
         # Backend
         self.backend = backend
+        self.node_function_mode = node_function_mode
+        self.map_parallelisation = map_parallelisation
 
         # NLP solver
         self.nlp_solver = nlp_solver
@@ -410,10 +516,13 @@ class Settings():
         self.nlp_tolerance = nlp_tolerance
         self.max_nlp_iterations = max_nlp_iterations
         self.warm_start = warm_start
+        self.compile_nlp_functions = compile_nlp_functions
+        self.nlp_function_cache_directory = nlp_function_cache_directory
 
         # Collocation and quadrature
         self.collocation_matrix_form = collocation_matrix_form
         self.quadrature_method = quadrature_method
+        self.quadrature_cache_directory = quadrature_cache_directory
         self.derivative_level = derivative_level
 
         # Mesh refinement
@@ -421,6 +530,7 @@ class Settings():
         self.collocation_points_min = collocation_points_min
         self.collocation_points_max = collocation_points_max
         self.mesh_tolerance = mesh_tolerance
+        self.mesh_coarsening_tolerance = mesh_coarsening_tolerance
         self.max_mesh_iterations = max_mesh_iterations
 
         # Scaling
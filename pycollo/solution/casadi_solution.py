@@ -10,12 +10,14 @@ class CasadiSolution(SolutionABC):
     def backend_specific_init(self):
         self.J = float(self.nlp_result.solution["f"])
         self.x = np.array(self.nlp_result.solution["x"]).squeeze()
+        self.lam_x = np.array(self.nlp_result.solution["lam_x"]).squeeze()
+        self.lam_g = np.array(self.nlp_result.solution["lam_g"]).squeeze()
 
     def extract_full_solution(self):
         self.objective = self.it.scaling.unscale_J(self.J)
         x = self.it.scaling.unscale_x(self.x)
-        self.phase_data = []
-        self.phase_data = tuple(self.extract_full_solution_one_phase(p, x)
+        dy = np.array(self.backend.dy_iter_callable(self.x)).reshape(-1)
+        self.phase_data = tuple(self.extract_full_solution_one_phase(p, x, dy)
                                 for p in self.backend.p)
         self._y = tuple(p.y for p in self.phase_data)
         self._dy = tuple(p.dy for p in self.phase_data)
@@ -28,7 +30,9 @@ class CasadiSolution(SolutionABC):
         self._stretch = tuple(p.stretch for p in self.phase_data)
         self._shift = tuple(p.shift for p in self.phase_data)
         self._time_ = tuple(p.time for p in self.phase_data)
-        self._s = x[self.it.s_slice]
+        self._s = self.it.x_layout.view(x, None, "s")
+        self._lam_x = self.it.scaling.unscale_lam_x(self.lam_x)
+        self._lam_g = self.it.scaling.unscale_lam_g(self.lam_g)
 
     def set_user_attributes(self):
         self.state = self._y
@@ -39,22 +43,22 @@ class CasadiSolution(SolutionABC):
         self.initial_time = self._t0
         self.final_time = self._tF
 
-    def extract_full_solution_one_phase(self, p, x):
+    def extract_full_solution_one_phase(self, p, x, dy):
 
         def extract_y(p, x):
             if p.num_y_var:
-                return x[self.it.y_slices[p.i]].reshape(p.num_y_var, -1)
+                return self.it.x_layout.view(x, p.i, "y")
             return np.array([], dtype=float)
 
         def extract_dy(p, dy):
             if p.num_y_var:
-                dy = np.array(dy[self.it.dy_slices[p.i]])
+                dy = dy[self.it.dy_slices[p.i]]
                 return dy.reshape((-1, self.it.mesh.N[p.i]))
             return np.array([], dtype=float)
 
         def extract_u(p, x):
             if p.num_u_var:
-                return x[self.it.u_slices[p.i]].reshape(p.num_u_var, -1)
+                return self.it.x_layout.view(x, p.i, "u")
             return np.array([], dtype=float)
 
         def extract_t0(p, t):
@@ -67,13 +71,12 @@ class CasadiSolution(SolutionABC):
                 return t[-1]
             return self.it.guess_time[p.i][-1]
 
-        dy = self.backend.dy_iter_callable(self.x)
         tau = self.tau[p.i]
         y = extract_y(p, x)
         dy = extract_dy(p, dy)
         u = extract_u(p, x)
-        q = x[self.it.q_slices[p.i]]
-        t = x[self.it.t_slices[p.i]]
+        q = self.it.x_layout.view(x, p.i, "q")
+        t = self.it.x_layout.view(x, p.i, "t")
         t0 = extract_t0(p, t)
         tF = extract_tF(p, t)
         T = tF - t0
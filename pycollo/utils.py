@@ -1,13 +1,15 @@
 import collections
 import itertools
+import math
 from numbers import Number
-from typing import (Iterable, Mapping, NamedTuple, Optional, Tuple)
+from typing import (Callable, Iterable, Mapping, NamedTuple, Optional, Tuple)
 
 import casadi as ca
 import numba
 import numpy as np
 from numpy import sin, cos, tan, exp, sqrt, arctan, tanh
 import scipy.interpolate as interpolate
+import scipy.sparse as sparse
 import sympy as sym
 
 import pycollo.functions
@@ -29,7 +31,7 @@ def _convert_cyclic_segwise(x, args, wrap):
     if l==1:
         return ca.substitute(args[0][0], ca_segwise_s, x)
     split = l//2
-    mx = ca.mod(x,wrap)
+    mx = _wrap_to_period(x, 0, wrap)
     return ca.if_else(mx < args[split-1][1], _convert_segwise(mx, args[:split]), _convert_segwise(mx, args[split:]))
 def _convert_poly_spline(x,idx):
     ppoly = pycollo.functions.PolynomialSpline.poly_cache[idx]
@@ -39,8 +41,7 @@ def _convert_poly_spline(x,idx):
 def _convert_cyclic_poly_spline(x,idx):
     ppoly = pycollo.functions.CyclicPolynomialSpline.poly_cache[idx]
     degree = len(ppoly.c[:, 0]) - 1
-    wrap = ppoly.x[-1]-ppoly.x[0]
-    x = ca.mod(x,wrap)
+    x = _wrap_to_period(x, ppoly.x[0], ppoly.x[-1])
     segments = [(sum(ppoly.c[m, i] * (x - px) ** (degree - m) for m in range(degree + 1)), ppoly.x[i + 1]) for i, px in
                 enumerate(ppoly.x[:-1])]
     return _bisect_segments(x, segments)
@@ -50,6 +51,435 @@ def _bisect_segments(x,segments):
         return segments[0][0]
     split = l//2
     return ca.if_else(x < segments[split-1][1], _bisect_segments(x, segments[:split]), _bisect_segments(x, segments[split:]))
+def _wrap_to_period(x, lower, upper):
+    """Wrap `x` in to the period `[lower, upper)`."""
+    wrap = upper - lower
+    return x - wrap * ca.floor((x - lower) / wrap)
+
+
+class Lookup(NamedTuple):
+    """A lookup evaluated by a CasADi function call rather than inline.
+
+    Attributes
+    ----------
+    argument : ca.SX
+        The expression (or column vector of expressions for multivariate
+        lookups) at which the lookup is evaluated.
+    function : ca.Function
+        CasADi (MX) function of the argument performing the lookup.
+    inline : Callable[[ca.SX], ca.SX]
+        Builds an equivalent inline SX expression from the argument, for use
+        where function calls cannot be embedded.
+
+    """
+    argument: ca.SX
+    function: ca.Function
+    inline: Callable[[ca.SX], ca.SX]
+
+
+# Splines with fewer segments than this are cheaper to evaluate inline than
+# through a lookup function call in an MX per-node function.
+MIN_LOOKUP_SEGMENTS = 16
+# Highest degree of polynomial Segwise segments lowered to lookups.
+MAX_SEGWISE_LOOKUP_DEGREE = 7
+_SEGWISE_LOOKUP_COUNT = itertools.count()
+
+
+def ppoly_lookup_function(ppoly, name, *, period=None, equispaced=False):
+    """Create a CasADi function evaluating a Scipy PPoly by table lookup.
+
+    The polynomial coefficients of every segment are packed in to a single
+    constant table. The segment containing the argument is found by binary
+    search of the breakpoints (:func:`casadi.low`), or if `equispaced`
+    directly as `floor((x - x0) / h)`, and only that segment's polynomial is
+    evaluated (in Horner form). Evaluation cost is therefore independent of
+    (or for binary search, logarithmic in) the number of segments, unlike an
+    `if_else` tree in which every segment is evaluated. As the segment index
+    is piecewise constant, first and second derivatives are those of the
+    segment polynomial and so are exact. Arguments outside the breakpoints
+    are extrapolated using the first/last segment, as per
+    :meth:`PPoly.__call__`, unless a `period` is given in which case the
+    argument is first wrapped in to it.
+
+    Args
+    ----
+    ppoly : PPoly
+        The piecewise polynomial.
+    name : str
+        Name of the CasADi function.
+    period : Optional[Tuple[float, float]]
+        Lower and upper bound of the period of a periodic piecewise
+        polynomial.
+    equispaced : bool
+        Whether the breakpoints are equally spaced.
+
+    Returns
+    -------
+    ca.Function
+        Function of a scalar (MX) argument.
+
+    """
+    x = ca.MX.sym("x")
+    x_lookup = x
+    if period is not None:
+        x_lookup = _wrap_to_period(x, *period)
+    num_segments = ppoly.c.shape[1]
+    if equispaced:
+        spacing = (ppoly.x[-1] - ppoly.x[0]) / num_segments
+        segment = ca.floor((x_lookup - ppoly.x[0]) / spacing)
+        segment = ca.fmin(ca.fmax(segment, 0), num_segments - 1)
+    else:
+        segment = ca.low(ca.DM(ppoly.x).T, x_lookup)
+    breakpoints = ca.MX(ca.DM(ppoly.x[:-1]))
+    coefficients = ca.MX(ca.DM(ppoly.c))
+    dx = x_lookup - breakpoints[segment]
+    y = coefficients[0, :][segment]
+    for coefficient in ca.vertsplit(coefficients)[1:]:
+        y = y * dx + coefficient[segment]
+    return ca.Function(name, [x], [y])
+
+
+def _lookup_placeholder(lookups, x, function, inline):
+    """Placeholder symbol for a lookup, which is added to `lookups`."""
+    placeholder = ca.SX.sym(f"{function.name()}_lookup{len(lookups)}")
+    lookups[placeholder] = Lookup(ca.SX(x), function, inline)
+    return placeholder
+
+
+def _bspline_basis(x, knots, degree):
+    """B-spline basis functions of `x` as branch-free SX expressions.
+
+    Evaluated by the Cox-de Boor recursion, with the degree zero basis
+    functions as indicator functions. The right end of the last
+    (non-degenerate) knot interval is closed.
+
+    """
+    last = max(i for i in range(len(knots) - 1) if knots[i] < knots[i + 1])
+    basis = []
+    for i in range(len(knots) - 1):
+        if i == last:
+            basis.append(ca.logic_and(x >= knots[i], x <= knots[i + 1]))
+        elif knots[i] < knots[i + 1]:
+            basis.append(ca.logic_and(x >= knots[i], x < knots[i + 1]))
+        else:
+            basis.append(ca.SX(0))
+    for p in range(1, degree + 1):
+        next_basis = []
+        for i in range(len(knots) - p - 1):
+            value = ca.SX(0)
+            if knots[i + p] > knots[i]:
+                value += ((x - knots[i]) / (knots[i + p] - knots[i])
+                          * basis[i])
+            if knots[i + p + 1] > knots[i + 1]:
+                value += ((knots[i + p + 1] - x)
+                          / (knots[i + p + 1] - knots[i + 1]) * basis[i + 1])
+            next_basis.append(value)
+        basis = next_basis
+    return ca.vertcat(*basis)
+
+
+def _clamp_to_table(args, table):
+    """Clamp lookup table arguments to the table's grid."""
+    return [ca.fmin(ca.fmax(arg, lb), ub)
+            for arg, (lb, ub) in zip(args, table.bounds)]
+
+
+def _convert_lookup_table(idx, args):
+    """Inline SX tensor product B-spline of a lookup table.
+
+    The table's coefficients are contracted with the B-spline basis of each
+    argument in turn, starting from the last.
+
+    """
+    table = pycollo.functions.LookupTable.table_cache[int(idx)]
+    args = _clamp_to_table(args, table)
+    shape = table.coefficients.shape
+    value = ca.DM(table.coefficients.reshape(-1, shape[-1], order="F"))
+    for axis in reversed(range(table.ndim)):
+        if axis != table.ndim - 1:
+            value = ca.reshape(value, -1, shape[axis])
+        basis = _bspline_basis(args[axis],
+                               table.knots[axis],
+                               table.degrees[axis])
+        value = ca.mtimes(value, basis)
+    return value
+
+
+def _multilinear_lookup(x, table):
+    """MX multilinear interpolation of a table that is linear in all args.
+
+    The grid cell containing `x` is found by binary search of each grid
+    and the values at the cell's corners are looked up from the flattened
+    table. Unlike CasADi's linear interpolant, whose Jacobian cannot be
+    differentiated further, the result's mixed second derivatives are exact.
+
+    """
+    values = ca.MX(ca.DM(table.coefficients.ravel(order="F")))
+    strides = np.cumprod((1, ) + table.coefficients.shape[:-1])
+    cells = []
+    weights = []
+    for x_axis, knots in zip(x, table.knots):
+        grid = ca.DM(knots[1:-1])
+        cell = ca.low(grid.T, x_axis)
+        lower = ca.MX(grid)[cell]
+        upper = ca.MX(grid)[cell + 1]
+        cells.append(cell)
+        weights.append((x_axis - lower) / (upper - lower))
+    value = 0
+    for corner in itertools.product((0, 1), repeat=table.ndim):
+        index = sum((cell + offset) * int(stride)
+                    for cell, offset, stride in zip(cells, corner, strides))
+        weight = 1
+        for offset, weight_axis in zip(corner, weights):
+            weight *= weight_axis if offset else 1 - weight_axis
+        value += weight * values[index]
+    return value
+
+
+def table_lookup_function(table, name):
+    """Create a CasADi interpolant function evaluating a lookup table.
+
+    Tables that are linear in every argument are evaluated by multilinear
+    interpolation of the table values in the grid cell containing the
+    arguments, otherwise the table's tensor product B-spline is evaluated by
+    a CasADi B-spline interpolant. Both have exact first and second
+    derivatives. Arguments are first clamped to the table's grid.
+
+    Args
+    ----
+    table : :class:`functions.TensorSpline`
+        The lookup table.
+    name : str
+        Name of the CasADi function.
+
+    Returns
+    -------
+    ca.Function
+        Function of a single (MX) column vector argument.
+
+    """
+    x = ca.MX.sym("x", table.ndim)
+    x_clamped = _clamp_to_table(ca.vertsplit(x), table)
+    if all(degree == 1 for degree in table.degrees):
+        return ca.Function(name, [x], [_multilinear_lookup(x_clamped, table)])
+    knots = [knots.tolist() for knots in table.knots]
+    coefficients = table.coefficients.ravel(order="F").tolist()
+    interpolant = ca.Function.bspline(f"{name}_interpolant", knots,
+                                      coefficients, list(table.degrees), 1, {})
+    return ca.Function(name, [x], [interpolant(ca.vertcat(*x_clamped))])
+
+
+def _table_lookup(lookups, idx, args):
+    """Placeholder symbol for a lookup table lookup."""
+    idx = int(idx)
+    table = pycollo.functions.LookupTable.table_cache[idx]
+    inline = lambda arg: _convert_lookup_table(idx, ca.vertsplit(arg))
+    argument = ca.vertcat(*(ca.SX(arg) for arg in args))
+    if min(table.degrees) < 1:
+        return inline(argument)
+    function = pycollo.functions.LookupTable.table_cache.derived(
+        idx, "lookup", lambda: table_lookup_function(table, f"table_{idx:x}"))
+    return _lookup_placeholder(lookups, argument, function, inline)
+
+
+def _poly_spline_lookup(lookups, x, idx, *, cyclic=False):
+    """Placeholder symbol for a (cyclic) polynomial spline lookup."""
+    if cyclic:
+        spline_cls = pycollo.functions.CyclicPolynomialSpline
+        inline = _convert_cyclic_poly_spline
+    else:
+        spline_cls = pycollo.functions.PolynomialSpline
+        inline = _convert_poly_spline
+    idx = int(idx)
+    ppoly = spline_cls.poly_cache[idx]
+    if ppoly.c.shape[1] < MIN_LOOKUP_SEGMENTS:
+        return inline(x, idx)
+    name = f"{'cyclic_' if cyclic else ''}spline_{idx:x}"
+    period = (ppoly.x[0], ppoly.x[-1]) if cyclic else None
+    function = spline_cls.poly_cache.derived(
+        idx, name, lambda: ppoly_lookup_function(
+            ppoly, name, period=period,
+            equispaced=pycollo.functions.is_equispaced(ppoly.x)))
+    return _lookup_placeholder(lookups, x, function,
+                               lambda arg: inline(arg, idx))
+
+
+def _segwise_ppoly(segments):
+    """Equivalent PPoly of an equispaced Segwise's segments, if one exists.
+
+    Segwise segments are converted if every segment's equation is a
+    polynomial, of degree at most :data:`MAX_SEGWISE_LOOKUP_DEGREE`, in
+    only the Segwise argument. The first segment's lower bound is taken as
+    one segment spacing below its upper bound. Otherwise `None` is returned.
+
+    """
+    upper_bounds = [float(ub) for _, ub in segments]
+    spacing = upper_bounds[1] - upper_bounds[0]
+    breakpoints = np.array([upper_bounds[0] - spacing] + upper_bounds)
+    s = ca_segwise_s
+    coefficients = []
+    for (eqn, _), lower_bound in zip(segments, breakpoints[:-1]):
+        eqn = ca.SX(eqn)
+        if not set(symbol_primitives(eqn)).issubset({s}):
+            return None
+        derivatives = [eqn]
+        while not derivatives[-1].is_zero():
+            if len(derivatives) > MAX_SEGWISE_LOOKUP_DEGREE + 1:
+                return None
+            derivatives.append(ca.jacobian(derivatives[-1], s))
+        derivative_fnc = ca.Function("derivatives", [s], derivatives[:-1])
+        taylor = [float(derivative) / math.factorial(m)
+                  for m, derivative
+                  in enumerate(derivative_fnc.call([lower_bound]))]
+        coefficients.append(taylor)
+    degree = max(len(taylor) for taylor in coefficients) - 1
+    c = np.zeros((degree + 1, len(segments)))
+    for i, taylor in enumerate(coefficients):
+        c[degree + 1 - len(taylor):, i] = taylor[::-1]
+    return interpolate.PPoly(c, breakpoints, extrapolate=True)
+
+
+def _segwise_lookup(lookups, x, segments, *, cyclic=False):
+    """Placeholder symbol for a (cyclic) equispaced Segwise lookup."""
+    if cyclic:
+        wrap = segments[-1][1]
+        inline = lambda arg: _convert_cyclic_segwise(arg, segments, wrap)
+    else:
+        inline = lambda arg: _convert_segwise(arg, segments)
+    upper_bounds = [ub for _, ub in segments]
+    if (len(segments) < MIN_LOOKUP_SEGMENTS
+            or not np.all(np.isfinite(np.array(upper_bounds, dtype=float)))
+            or not pycollo.functions.is_equispaced(upper_bounds)):
+        return inline(x)
+    ppoly = _segwise_ppoly(segments)
+    if ppoly is None:
+        return inline(x)
+    name = (f"{'cyclic_' if cyclic else ''}segwise_"
+            f"{next(_SEGWISE_LOOKUP_COUNT)}")
+    period = (0, float(wrap)) if cyclic else None
+    function = ppoly_lookup_function(ppoly, name, period=period,
+                                     equispaced=True)
+    return _lookup_placeholder(lookups, x, function, inline)
+
+
+def lookup_api_mapping(lookups):
+    """Sympy to CasADi API mapping lowering spline calls to lookups.
+
+    Each spline call is converted to a new placeholder SX symbol, which is
+    added to `lookups` along with the spline's argument and CasADi lookup
+    function. Equispaced Segwise functions with polynomial segments, and
+    lookup tables, are lowered in the same way as splines. Splines and
+    Segwise functions with fewer than :data:`MIN_LOOKUP_SEGMENTS` segments,
+    and Segwise functions that cannot be lowered, are converted inline.
+
+    """
+    return {"Segwise":
+            lambda x, *args: _segwise_lookup(lookups, x, args),
+            "CyclicSegwise":
+            lambda x, *args: _segwise_lookup(lookups, x, args, cyclic=True),
+            "PolynomialSpline":
+            lambda x, idx: _poly_spline_lookup(lookups, x, idx),
+            "CyclicPolynomialSpline":
+            lambda x, idx: _poly_spline_lookup(lookups, x, idx, cyclic=True),
+            "LookupTable":
+            lambda idx, *args: _table_lookup(lookups, idx, args),
+            }
+
+
+def inline_lookups(casadi_exprs, lookups):
+    """Replace lookup placeholders in SX expressions with inline SX.
+
+    Args
+    ----
+    casadi_exprs : Iterable[ca.SX]
+        Expressions possibly containing lookup placeholder symbols.
+    lookups : Dict[ca.SX, Lookup]
+        Mapping of placeholder symbols to their lookups, in the order in which
+        they were created (the argument of a lookup can only contain the
+        placeholders of lookups created before it).
+
+    Returns
+    -------
+    Tuple[ca.SX, ...]
+        The expressions with all lookups inlined.
+
+    """
+    casadi_exprs = tuple(casadi_exprs)
+    if not lookups:
+        return casadi_exprs
+    placeholders = []
+    inlined = []
+    for placeholder, lookup in lookups.items():
+        argument = lookup.argument
+        if placeholders:
+            argument = ca.substitute(argument,
+                                     ca.vertcat(*placeholders),
+                                     ca.vertcat(*inlined))
+        placeholders.append(placeholder)
+        inlined.append(lookup.inline(argument))
+    casadi_exprs = ca.substitute(ca.vertcat(*casadi_exprs),
+                                 ca.vertcat(*placeholders),
+                                 ca.vertcat(*inlined))
+    return tuple(ca.vertsplit(casadi_exprs))
+
+
+def casadi_lookup_function(name, casadi_inputs, casadi_outputs, lookups):
+    """Create a CasADi function calling lookup functions for placeholders.
+
+    The SX outputs are wrapped in an MX function in which every lookup
+    placeholder is replaced by its (inlined) lookup function. Lookups are
+    called in dependency order as the argument of a lookup may contain the
+    placeholders of other lookups. If there are no lookups then an SX
+    function is returned.
+
+    Args
+    ----
+    name : str
+        Name of the CasADi function.
+    casadi_inputs : List[ca.SX]
+        Symbolic inputs of the function.
+    casadi_outputs : List[ca.SX]
+        Outputs of the function, possibly containing lookup placeholders.
+    lookups : Dict[ca.SX, Lookup]
+        Mapping of placeholder symbols to their lookups.
+
+    Returns
+    -------
+    ca.Function
+
+    """
+    if not lookups:
+        return ca.Function(name, casadi_inputs, casadi_outputs)
+    placeholders = list(lookups)
+    placeholder_vec = ca.vertcat(*placeholders)
+    arguments = ca.vertcat(*(lookup.argument for lookup in lookups.values()))
+    argument_fnc = ca.Function(f"{name}_lookup_arguments",
+                               casadi_inputs + [placeholder_vec],
+                               [arguments])
+    output_fnc = ca.Function(f"{name}_lookup_outputs",
+                             casadi_inputs + [placeholder_vec],
+                             casadi_outputs)
+    depths = {}
+    for placeholder, lookup in lookups.items():
+        nested = set(symbol_primitives(lookup.argument)).intersection(depths)
+        depths[placeholder] = 1 + max((depths[p] for p in nested), default=0)
+    inputs = [ca.MX.sym(output_fnc.name_in(i), output_fnc.sparsity_in(i))
+              for i in range(len(casadi_inputs))]
+    offsets = np.cumsum([0] + [lookup.argument.numel()
+                               for lookup in lookups.values()])
+    values = [ca.MX(0)] * len(placeholders)
+    for depth in range(1, max(depths.values()) + 1):
+        arguments = argument_fnc(*inputs, ca.vertcat(*values))
+        for i, (placeholder, lookup) in enumerate(lookups.items()):
+            if depths[placeholder] == depth:
+                argument = arguments[int(offsets[i]):int(offsets[i + 1])]
+                values[i] = lookup.function.call([argument], True, False)[0]
+    outputs = output_fnc(*inputs, ca.vertcat(*values))
+    if not isinstance(outputs, (list, tuple)):
+        outputs = [outputs]
+    return ca.Function(name, inputs, list(outputs))
+
+
 SUPPORTED_ITER_TYPES = (tuple, list, np.ndarray)
 SYMPY_TO_CASADI_API_MAPPING = {"ImmutableDenseMatrix": ca.blockcat,
                                "MutableDenseMatrix": ca.blockcat,
@@ -59,7 +489,8 @@ SYMPY_TO_CASADI_API_MAPPING = {"ImmutableDenseMatrix": ca.blockcat,
                                "Segwise": lambda *args: _convert_segwise(args[0], args[1:]),
                                "CyclicSegwise": lambda *args: _convert_cyclic_segwise(args[0], args[1:],args[-1][1]),
                                "PolynomialSpline": lambda *args: _convert_poly_spline(*args),
-                               "CyclicPolynomialSpline": lambda *args: _convert_cyclic_poly_spline(*args)
+                               "CyclicPolynomialSpline": lambda *args: _convert_cyclic_poly_spline(*args),
+                               "LookupTable": lambda idx, *args: _convert_lookup_table(idx, args),
                                }
 
 
@@ -122,12 +553,20 @@ def symbol_primitives(eqn):
     raise NotImplementedError(msg)
 
 
-def sympy_to_casadi(sympy_expr, sympy_to_casadi_sym_mapping, *, phase=None):
+def sympy_to_casadi(sympy_expr, sympy_to_casadi_sym_mapping, *, phase=None,
+                    lookups=None):
     """Convert a Sympy expression to a CasADi one.
 
     Recipe adapted from one by Joris Gillis taken from:
     https://gist.github.com/jgillis/80bb594a6c8fcf55891d1d88b12b68b8
 
+    By default spline functions are converted to inline SX expressions. If a
+    `lookups` dictionary is supplied then each spline call is instead
+    converted to a placeholder symbol, added to `lookups` (see
+    :func:`lookup_api_mapping`), so that it can later be evaluated by a
+    CasADi lookup function (see :func:`casadi_lookup_function`) or inlined
+    (see :func:`inline_lookups`).
+
     Example
     -------
     This example creates some primitive symbols using both Sympy and CasADi.
@@ -169,11 +608,75 @@ def sympy_to_casadi(sympy_expr, sympy_to_casadi_sym_mapping, *, phase=None):
         sympy_to_casadi_sym_mapping.update({sympy_var: casadi_var})
         sympy_vars = sym.Matrix.vstack(sympy_vars, sym.Matrix([[sympy_var]]))
         casadi_vars = ca.vertcat(casadi_vars, casadi_var)
-    f = sym.lambdify(sympy_vars, sympy_expr,
-                     modules=[SYMPY_TO_CASADI_API_MAPPING, ca])
+    modules = [SYMPY_TO_CASADI_API_MAPPING, ca]
+    if lookups is not None:
+        modules.insert(0, lookup_api_mapping(lookups))
+    # use_imps=False: the NumPy implementations of pycollo's functions must
+    # not shadow their CasADi ones
+    f = sym.lambdify(sympy_vars, sympy_expr, modules=modules, use_imps=False)
     return f(*ca.vertsplit(casadi_vars)), sympy_to_casadi_sym_mapping
 
 
+def sympy_to_casadi_cse(sympy_exprs, sympy_to_casadi_sym_mapping, *,
+                        phase=None, lookups=None):
+    """Jointly convert Sympy expressions to CasADi ones.
+
+    Common subexpression elimination (CSE) is run across all of the
+    expressions together before conversion. Each common subexpression is
+    converted only once, to an intermediate CasADi SX expression, which is
+    then shared by every converted expression using it.
+
+    Args
+    ----
+    sympy_exprs : Iterable[sym.Expr]
+        The Sympy expressions to be converted.
+    sympy_to_casadi_sym_mapping : Dict[sym.Symbol, ca.SX]
+        Mapping of Sympy symbols to CasADi symbols. Symbols not in the
+        mapping are created and added to it as per :func:`sympy_to_casadi`.
+    phase : Optional[int]
+        Phase index used to suffix the names of any created CasADi symbols.
+    lookups : Optional[Dict[ca.SX, Lookup]]
+        If supplied, spline calls are lowered to lookups as per
+        :func:`sympy_to_casadi`.
+
+    Returns
+    -------
+    Tuple[List[ca.SX], Dict[sym.Symbol, ca.SX]]
+        The converted expressions and the updated mapping.
+
+    """
+    cse_syms = sym.numbered_symbols("_cse", cls=sym.Dummy)
+    replacements, reduced_exprs = sym.cse(list(sympy_exprs),
+                                          symbols=cse_syms,
+                                          order="none")
+    cse_mapping = {}
+    for cse_sym, cse_expr in replacements:
+        cse_mapping[cse_sym] = cse_expr
+    cse_to_casadi_mapping = {}
+
+    def convert(sympy_expr):
+        """Convert with any common subexpressions already converted."""
+        cse_prims = sympy_expr.free_symbols.intersection(cse_mapping)
+        user_prims = sympy_expr.free_symbols.difference(cse_mapping)
+        for user_prim in user_prims.difference(sympy_to_casadi_sym_mapping):
+            casadi_var_name_suffix = f"_P{phase}" if phase is not None else ""
+            casadi_var = ca.SX.sym(f"{str(user_prim)}{casadi_var_name_suffix}")
+            sympy_to_casadi_sym_mapping[user_prim] = casadi_var
+        mapping = {prim: sympy_to_casadi_sym_mapping[prim]
+                   for prim in user_prims}
+        mapping.update({prim: cse_to_casadi_mapping[prim]
+                        for prim in cse_prims})
+        mapping[pycollo.functions.Segwise.s] = ca_segwise_s
+        casadi_expr, _ = sympy_to_casadi(sympy_expr, mapping, phase=phase,
+                                         lookups=lookups)
+        return casadi_expr
+
+    for cse_sym, cse_expr in replacements:
+        cse_to_casadi_mapping[cse_sym] = convert(cse_expr)
+    casadi_exprs = [convert(sym.sympify(expr)) for expr in reduced_exprs]
+    return casadi_exprs, sympy_to_casadi_sym_mapping
+
+
 def casadi_substitute(casadi_eqn, casadi_sym_mapping):
     """Substitute a CasADi SX expression with symbols from a mapping.
 
@@ -196,6 +699,54 @@ def casadi_substitute(casadi_eqn, casadi_sym_mapping):
     return ca.substitute(casadi_eqn, remove_sym, add_sym)
 
 
+def casadi_sparse_to_scipy(casadi_matrix, *, transpose=False):
+    """Convert a CasADi sparse matrix to a SciPy CSC matrix.
+
+    CasADi stores matrices in compressed column storage (CCS) format so the
+    nonzeros and sparsity pattern are used directly without densifying.
+
+    Args
+    ----
+    casadi_matrix : Union[ca.DM, ca.Sparsity]
+        The matrix to be converted. If a :py:class:`Sparsity <casadi>` is
+        supplied then the structural nonzeros all have a value of one.
+    transpose : bool
+        Whether the transpose should be returned instead. This is returned as
+        a CSR matrix sharing the same index arrays.
+
+    Returns
+    -------
+    Union[sparse.csc_matrix, sparse.csr_matrix]
+        The converted matrix.
+
+    """
+    if isinstance(casadi_matrix, ca.Sparsity):
+        sparsity = casadi_matrix
+        nonzeros = np.ones(sparsity.nnz())
+    else:
+        sparsity = casadi_matrix.sparsity()
+        nonzeros = np.array(casadi_matrix.nonzeros(), dtype=np.float64)
+    indices = np.array(sparsity.row(), dtype=int)
+    indptr = np.array(sparsity.colind(), dtype=int)
+    shape = (sparsity.size1(), sparsity.size2())
+    if transpose:
+        return sparse.csr_matrix((nonzeros, indices, indptr),
+                                 shape=shape[::-1])
+    return sparse.csc_matrix((nonzeros, indices, indptr), shape=shape)
+
+
+def casadi_sparsity_indices(sparsity):
+    """Row and column indices of the nonzeros of a CasADi sparsity pattern.
+
+    Indices are ordered as the nonzeros are stored by CasADi (column-major).
+
+    """
+    row_indices = np.array(sparsity.row(), dtype=int)
+    col_counts = np.diff(np.array(sparsity.colind(), dtype=int))
+    col_indices = np.repeat(np.arange(sparsity.size2()), col_counts)
+    return row_indices, col_indices
+
+
 def needed_to_tuple(var_full, needed):
     """Extract only needed variables to a new tuple."""
     return tuple(var for var, n in zip(var_full, needed) if n)
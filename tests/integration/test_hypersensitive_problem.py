@@ -134,3 +134,75 @@ class TestHypersensitiveProblem:
                           rtol=rtol,
                           atol=atol)
         assert state.ocp.mesh_tolerance_met is True
+
+
+def short_horizon_ocp():
+    """Hypersensitive problem with a shorter time horizon.
+
+    A shorter time horizon than the Hypersensitive problem's is used so that
+    the OCP solves quickly.
+
+    """
+    y = sym.Symbol("y")
+    u = sym.Symbol("u")
+    ocp = pycollo.OptimalControlProblem("Hypersensitive problem")
+    phase = ocp.new_phase("A")
+    phase.state_variables = y
+    phase.control_variables = u
+    phase.state_equations = -y**3 + u
+    phase.integrand_functions = 0.5 * (y**2 + u**2)
+    phase.bounds.initial_time = 0.0
+    phase.bounds.final_time = 50.0
+    phase.bounds.state_variables = [[0, 2]]
+    phase.bounds.control_variables = [[-1, 8]]
+    phase.bounds.integral_variables = [[0, 2000]]
+    phase.bounds.initial_state_constraints = [[1.0, 1.0]]
+    phase.bounds.final_state_constraints = [[1.5, 1.5]]
+    phase.guess.time = [0.0, 50.0]
+    phase.guess.state_variables = [[1.0, 1.5]]
+    phase.guess.control_variables = [[0.0, 0.0]]
+    phase.guess.integral_variables = 4
+    ocp.objective_function = phase.integral_variables[0]
+    ocp.settings.display_mesh_result_graph = False
+    ocp.settings.max_mesh_iterations = 10
+    return ocp
+
+
+@pytest.mark.parametrize("mesh_refinement_algorithm", ["patterson-rao",
+                                                       "liu-hager-rao",
+                                                       "h",
+                                                       "p",
+                                                       "cost-model"])
+def test_mesh_refinement_algorithm_converges(mesh_refinement_algorithm):
+    """Each mesh refinement algorithm meets the mesh tolerance."""
+    ocp = short_horizon_ocp()
+    ocp.settings.mesh_refinement_algorithm = mesh_refinement_algorithm
+    ocp.initialise()
+    ocp.solve()
+    assert ocp.mesh_tolerance_met is True
+    assert np.isclose(ocp.solution.objective, 3.36206, rtol=1e-5, atol=0.0)
+
+
+def test_warm_start_reduces_nlp_iterations():
+    """Warm-started mesh iterations need fewer IPOPT iterations.
+
+    The first mesh iteration is solved from the same initial guess either
+    way, so only the IPOPT iterations of later mesh iterations are compared.
+
+    """
+    def later_nlp_iteration_count(warm_start):
+        ocp = short_horizon_ocp()
+        ocp.settings.warm_start = warm_start
+        ocp.initialise()
+        ocp.solve()
+        assert ocp.mesh_tolerance_met is True
+        assert np.isclose(ocp.solution.objective, 3.36206, rtol=1e-5,
+                          atol=0.0)
+        mesh_iterations = ocp._backend.mesh_iterations
+        assert len(mesh_iterations) > 1
+        return sum(mesh_iteration.solution.nlp_result.info["iter_count"]
+                   for mesh_iteration in mesh_iterations[1:])
+
+    cold_start_count = later_nlp_iteration_count(False)
+    warm_start_count = later_nlp_iteration_count(True)
+    assert warm_start_count < cold_start_count
@@ -1572,3 +1572,23 @@ def test_casadi_backend_init(ocp_fixture):
     """Backend initialises without error."""
     ocp, syms = ocp_fixture
     ocp._initialise_backend()
+
+
+def test_aux_data_resolution_order():
+    """Aux data symbols are ordered so dependencies come first."""
+    a, b, c, d = (ca.SX.sym(name) for name in "abcd")
+    dependencies = {a: {b, c}, b: {c}, c: set(), d: {a}}
+    order = pycollo.backend.BackendABC.aux_data_resolution_order(dependencies)
+    assert len(order) == len(dependencies)
+    position = {str(backend_sym): i for i, backend_sym in enumerate(order)}
+    for backend_sym, backend_sym_dependencies in dependencies.items():
+        for dependency in backend_sym_dependencies:
+            assert position[str(dependency)] < position[str(backend_sym)]
+
+
+def test_aux_data_resolution_order_cyclic():
+    """Cyclic aux data dependencies raise an error."""
+    a, b, c = (ca.SX.sym(name) for name in "abc")
+    dependencies = {a: {b}, b: {c}, c: {a}}
+    with pytest.raises(ValueError, match="cyclic dependency"):
+        pycollo.backend.BackendABC.aux_data_resolution_order(dependencies)
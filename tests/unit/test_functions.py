@@ -1,3 +1,4 @@
+import gc
 import pytest
 import pycollo
 from scipy.interpolate import CubicSpline
@@ -37,6 +38,28 @@ def test_multiple_splines_independent():
     y_data_2 = [1,0,1,0]
     assert pycollo.functions.cubic_spline(x,x_data,y_data_1)!=pycollo.functions.cubic_spline(x,x_data,y_data_2)
 
+def test_identical_splines_share_stash_entry():
+    x_data = [0, 1, 2, 3]
+    y_data = [0, 2, 3, 1]
+    spline_1 = pycollo.functions.cubic_spline(x, x_data, y_data)
+    spline_2 = pycollo.functions.cubic_spline(x, x_data, y_data)
+    assert spline_1 == spline_2
+    num_entries = len(pycollo.functions.PolynomialSpline.poly_cache)
+    for _ in range(3):
+        sym.diff(spline_1, x)
+        spline_1.subs(x, 2 * y)
+    assert len(pycollo.functions.PolynomialSpline.poly_cache) <= num_entries + 1
+
+def test_unreferenced_spline_evicted():
+    spline = pycollo.functions.cubic_spline(x, [0, 1, 2, 3], [7, 5, 8, 6])
+    idx = spline.args[1]
+    poly_cache = pycollo.functions.PolynomialSpline.poly_cache
+    assert idx in poly_cache
+    del spline
+    sym.core.cache.clear_cache()
+    gc.collect()
+    assert idx not in poly_cache
+
 def test_cyclic_spline():
     x_data = [0, 2, 3, 4, 5]
     y_data = [0, 0, 1, 2, 0]
@@ -46,6 +69,27 @@ def test_cyclic_spline():
     for tx in test_points:
         assert math.isclose(spline_sym.subs(x, tx), spline_sci(tx%5))
 
+def test_spline_numpy_lambdify():
+    x_data = [0, 2, 3, 4, 5]
+    y_data = [0, 0, 1, 2, 0]
+    test_points = np.array([1.2, 2.4, 3.8, 4.2, 6.8, 10.3])
+    spline_sym = pycollo.functions.cubic_spline(x, x_data, y_data)
+    cyclic_sym = pycollo.functions.cubic_spline(x, x_data, y_data, "periodic")
+    f = sym.lambdify(x, [spline_sym, sym.diff(spline_sym, x), cyclic_sym], "numpy")
+    values, derivatives, cyclic_values = f(test_points)
+    assert np.allclose(values, [float(spline_sym.subs(x, tx)) for tx in test_points])
+    assert np.allclose(derivatives, [float(sym.diff(spline_sym, x).subs(x, tx)) for tx in test_points])
+    assert np.allclose(cyclic_values, [float(cyclic_sym.subs(x, tx)) for tx in test_points])
+
+def test_lambdified_spline_outlives_expression():
+    f = sym.lambdify(x, pycollo.functions.cubic_spline(x, [0, 1, 2, 3], [4, 1, 3, 2]), "numpy")
+    g = sym.lambdify(x, pycollo.functions.lookup_table(x, [0, 1, 2, 3], [4, 1, 3, 2]), "numpy")
+    sym.core.cache.clear_cache()
+    gc.collect()
+    spline_sci = CubicSpline([0, 1, 2, 3], [4, 1, 3, 2], bc_type="natural")
+    assert np.isclose(f(0.5), spline_sci(0.5))
+    assert np.isclose(g(1.0), 1.0)
+
 def test_segwise_continuity_check():
     assert not pycollo.functions.Segwise(x,(-s,0.0),(s+1,1.0)).check_continuity()
 
@@ -119,6 +163,15 @@ def test_cyclic_segwise_wrap_check():
     seg = pycollo.functions.CyclicSegwise(x,(sym.sin(s),1.0),(sym.sin(s),math.tau))
     assert seg.check_continuity()
 
+def test_segwise_numpy_lambdify():
+    test_points = np.array([-3.2, -0.2, 0.3, 1.7, 2.9])
+    for cls in (pycollo.functions.Segwise, pycollo.functions.CyclicSegwise):
+        seg = cls(x,(s**2,0.0),(2*s+1,1.0),(4-s,3.0))
+        f = sym.lambdify(x, [seg, sym.diff(seg, x)], "numpy")
+        values, derivatives = f(test_points)
+        assert np.allclose(values, [float(seg.subs(x, tx)) for tx in test_points])
+        assert np.allclose(derivatives, [float(sym.diff(seg, x).subs(x, tx)) for tx in test_points])
+
 def test_softplus():
     softplus = pycollo.functions.softplus(x)
     assert math.isclose(softplus.subs(x,-1e3),0)
@@ -127,4 +180,48 @@ def test_softplus():
 def test_logistic():
     logistic = pycollo.functions.logistic(x,100)
     assert math.isclose(logistic.subs(x, -1).evalf(), 0,abs_tol=1e-6)
-    assert math.isclose(logistic.subs(x, 1).evalf(), 1,abs_tol=1e-6)
\ No newline at end of file
+    assert math.isclose(logistic.subs(x, 1).evalf(), 1,abs_tol=1e-6)
+def test_lookup_table_interpolates_grid():
+    x_grid = [0, 1, 2.5, 3, 4]
+    y_grid = [-1, 0, 2, 3]
+    values = np.add.outer(np.sin(x_grid), np.square(y_grid))
+    for method in ["linear", "cubic"]:
+        table = pycollo.functions.lookup_table((x, y), (x_grid, y_grid), values, method)
+        for i, tx in enumerate(x_grid):
+            for j, ty in enumerate(y_grid):
+                assert math.isclose(table.subs({x: tx, y: ty}), values[i, j], abs_tol=1e-12)
+
+def test_lookup_table_derivative():
+    x_grid = np.linspace(0, 3, 7)
+    y_grid = [-1, 0, 2, 3, 5]
+    values = np.multiply.outer(np.sin(x_grid), np.square(y_grid))
+    table = pycollo.functions.lookup_table((x, y), (x_grid, y_grid), values)
+    point = {x: 1.3, y: 2.6}
+    eps = 1e-6
+    for var in (x, y):
+        derivative = sym.diff(table, var).subs(point)
+        plus = table.subs({**point, var: point[var] + eps})
+        minus = table.subs({**point, var: point[var] - eps})
+        assert math.isclose(derivative, (plus - minus) / (2 * eps), rel_tol=1e-6)
+
+def test_lookup_table_clamped():
+    table = pycollo.functions.lookup_table(x, [0, 1, 2], [1, 3, 2], "linear")
+    assert math.isclose(table.subs(x, -1), 1)
+    assert math.isclose(table.subs(x, 5), 2)
+    assert math.isclose(table.subs(x, 1.5), 2.5)
+
+def test_lookup_table_bad_shape():
+    with pytest.raises(ValueError) as excinfo:
+        pycollo.functions.lookup_table((x, y), ([0, 1, 2, 3], [0, 1, 2, 3]), np.zeros((4, 3)))
+    assert "do not match" in str(excinfo.value)
+
+def test_lookup_table_numpy_lambdify():
+    x_grid = np.linspace(0, 3, 7)
+    y_grid = [-1, 0, 2, 3, 5]
+    values = np.multiply.outer(np.sin(x_grid), np.square(y_grid))
+    table = pycollo.functions.lookup_table((x, y), (x_grid, y_grid), values)
+    x_points = np.array([-0.5, 1.3, 2.2, 3.4])
+    f = sym.lambdify((x, y), [table, sym.diff(table, y)], "numpy")
+    table_values, derivatives = f(x_points, 2.6)
+    assert np.allclose(table_values, [float(table.subs({x: tx, y: 2.6})) for tx in x_points])
+    assert np.allclose(derivatives, [float(sym.diff(table, y).subs({x: tx, y: 2.6})) for tx in x_points])
@@ -1,6 +1,8 @@
 """Test creation and initialisation of Iteration objects."""
 
 
+import types
+
 import casadi as ca
 import numpy as np
 import pytest
@@ -63,6 +65,7 @@ def brachistochrone_initialised_fixture(brachistochrone_fixture):
 
 def test_iterpolate_guess_to_new_mesh_dp(double_pendulum_initialised_fixture):
     ocp, iteration = double_pendulum_initialised_fixture
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
 
     assert isinstance(iteration.guess_tau, list)
@@ -129,6 +132,7 @@ def test_iterpolate_guess_to_new_mesh_dp(double_pendulum_initialised_fixture):
 
 def test_iterpolate_guess_to_new_mesh_br(brachistochrone_initialised_fixture):
     ocp, iteration = brachistochrone_initialised_fixture
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
 
     assert isinstance(iteration.guess_tau, list)
@@ -188,8 +192,77 @@ def test_iterpolate_guess_to_new_mesh_br(brachistochrone_initialised_fixture):
     assert iteration.guess_x.shape == (125, )
 
 
+def test_interpolate_guess_to_refined_mesh(
+        brachistochrone_initialised_fixture):
+    """Check solutions on a previous mesh are interpolated spectrally.
+
+    State functions which are polynomials of no more than the number of nodes
+    minus one in each mesh section are interpolated exactly. Controls are
+    interpolated linearly, so piecewise linear ones are too.
+
+    """
+    ocp, iteration = brachistochrone_initialised_fixture
+    prev_guess = iteration.prev_guess
+    prev_tau = iteration.mesh.tau[0]
+    prev_guess.tau = [prev_tau]
+    prev_guess.y = [np.array([prev_tau**3,
+                              np.abs(prev_tau)**3 - prev_tau,
+                              np.where(prev_tau < 0,
+                                       prev_tau**2,
+                                       2 * prev_tau**3)])]
+    prev_guess.u = [np.array([np.abs(prev_tau)])]
+    prev_guess.mesh_index_boundaries = iteration.mesh.mesh_index_boundaries
+    phase_mesh = pycollo.mesh.PhaseMesh(iteration.mesh.p[0].phase,
+                                        number_mesh_sections=4,
+                                        mesh_section_sizes=[0.3, 0.2, 0.1, 0.4],
+                                        number_mesh_section_nodes=[5, 6, 4, 7])
+    iteration._mesh = pycollo.mesh.Mesh(ocp._backend, [phase_mesh])
+    iteration.create_layouts()
+    iteration.interpolate_guess_to_mesh(prev_guess)
+
+    tau = iteration.mesh.tau[0]
+    expect_y = np.array([tau**3,
+                         np.abs(tau)**3 - tau,
+                         np.where(tau < 0, tau**2, 2 * tau**3)])
+    assert iteration.guess_y[0].shape == (3, tau.size)
+    np.testing.assert_allclose(iteration.guess_y[0], expect_y, atol=1e-12)
+    np.testing.assert_allclose(iteration.guess_u[0], np.abs(tau)[None, :],
+                               atol=1e-12)
+
+
+def test_interpolate_discontinuous_guess_to_refined_mesh(
+        brachistochrone_initialised_fixture):
+    """Interpolated guesses do not overshoot discontinuous solutions.
+
+    A bang-bang control and a state with a jump within a mesh section stay
+    within the range of the previous solution.
+
+    """
+    ocp, iteration = brachistochrone_initialised_fixture
+    prev_guess = iteration.prev_guess
+    prev_tau = iteration.mesh.tau[0]
+    prev_guess.tau = [prev_tau]
+    step = np.where(prev_tau < 0.1, -10.0, 10.0)
+    prev_guess.y = [np.array([step, step, step])]
+    prev_guess.u = [np.array([step])]
+    prev_guess.mesh_index_boundaries = iteration.mesh.mesh_index_boundaries
+    phase_mesh = pycollo.mesh.PhaseMesh(iteration.mesh.p[0].phase,
+                                        number_mesh_sections=4,
+                                        mesh_section_sizes=[0.3, 0.2, 0.1, 0.4],
+                                        number_mesh_section_nodes=[5, 6, 4, 7])
+    iteration._mesh = pycollo.mesh.Mesh(ocp._backend, [phase_mesh])
+    iteration.create_layouts()
+    iteration.interpolate_guess_to_mesh(prev_guess)
+
+    tau = iteration.mesh.tau[0]
+    for guess in (iteration.guess_y[0], iteration.guess_u[0]):
+        assert np.all(np.abs(guess) <= 10)
+    np.testing.assert_array_equal(iteration.guess_u[0][0, tau <= 0], -10)
+
+
 def test_create_var_con_counts_slices(double_pendulum_initialised_fixture):
     ocp, iteration = double_pendulum_initialised_fixture
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
 
     iteration.create_variable_counts_per_phase_and_total()
@@ -233,9 +306,41 @@ def test_create_var_con_counts_slices(double_pendulum_initialised_fixture):
     assert iteration.q_fnc_slices == [slice(124, 155)]
 
 
+def test_variable_constraint_index_maps(double_pendulum_initialised_fixture):
+    """Check OCP to NLP index maps and the bounds expanded with them."""
+    ocp, iteration = double_pendulum_initialised_fixture
+    backend = ocp._backend
+    iteration.create_layouts()
+    iteration.interpolate_guess_to_mesh(iteration.prev_guess)
+    iteration.create_variable_constraint_counts_slices()
+
+    expect_x_ocp_index = np.concatenate([np.repeat(np.arange(4), 31),
+                                         np.repeat(np.arange(4, 6), 31),
+                                         np.arange(6, 10)])
+    expect_c_ocp_index = np.concatenate([np.repeat(np.arange(4), 30), [4]])
+    np.testing.assert_array_equal(iteration.x_ocp_index, expect_x_ocp_index)
+    np.testing.assert_array_equal(iteration.c_ocp_index, expect_c_ocp_index)
+    np.testing.assert_array_equal(iteration.y_t0_index, [0, 31, 62, 93])
+    np.testing.assert_array_equal(iteration.y_tF_index, [30, 61, 92, 123])
+
+    iteration.generate_variable_bounds()
+    iteration.generate_constraint_bounds()
+    x_bnd = np.array([iteration.x_bnd_l, iteration.x_bnd_u]).T
+    np.testing.assert_array_equal(x_bnd[iteration.y_t0_index],
+                                  backend.bounds.y_t0_bnd)
+    np.testing.assert_array_equal(x_bnd[iteration.y_tF_index],
+                                  backend.bounds.y_tF_bnd)
+    np.testing.assert_array_equal(x_bnd[1:30], np.repeat(
+        backend.bounds.x_bnd[:1], 29, axis=0))
+    np.testing.assert_array_equal(x_bnd[124:], backend.bounds.x_bnd[
+        iteration.x_ocp_index[124:]])
+    assert not np.any(iteration.c_bnd_l) and not np.any(iteration.c_bnd_u)
+
+
 def test_initialise_scaling(double_pendulum_initialised_fixture):
     """Check iteration scaling initialised successfully."""
     ocp, iteration = double_pendulum_initialised_fixture
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     iteration.initialise_scaling()
@@ -244,6 +349,7 @@ def test_initialise_scaling(double_pendulum_initialised_fixture):
 def test_guess_scaling(double_pendulum_initialised_fixture):
     """Check first iteration guess scaled and unscaled correctly."""
     ocp, iteration = double_pendulum_initialised_fixture
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     iteration.initialise_scaling()
@@ -259,6 +365,7 @@ def test_backend_create_iter_var_symbols(double_pendulum_initialised_fixture):
     """Check iteration-specific variables (`x`) created correctly."""
     ocp, iteration = double_pendulum_initialised_fixture
     backend = ocp._backend
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     iteration.initialise_scaling()
@@ -274,6 +381,7 @@ def test_backend_generate_scaling_symbols(double_pendulum_initialised_fixture):
     """Check iteration-specific scaling syms (`w_J`, `W`) created correctly."""
     ocp, iteration = double_pendulum_initialised_fixture
     backend = ocp._backend
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     iteration.initialise_scaling()
@@ -290,6 +398,7 @@ def test_backend_generate_J_callable_dp(double_pendulum_initialised_fixture):
     """Check iteration-specific objective function (`J`) callable compiled."""
     ocp, iteration = double_pendulum_initialised_fixture
     backend = ocp._backend
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     iteration.initialise_scaling()
@@ -305,6 +414,7 @@ def test_backend_generate_J_callable_br(brachistochrone_initialised_fixture):
     """Check iteration-specific objective function (`J`) callable compiled."""
     ocp, iteration = brachistochrone_initialised_fixture
     backend = ocp._backend
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     iteration.initialise_scaling()
@@ -321,6 +431,7 @@ def test_backend_generate_g_callable_dp(double_pendulum_initialised_fixture):
     """Check iteration-specific objective gradient (`g`) callable compiled."""
     ocp, iteration = double_pendulum_initialised_fixture
     backend = ocp._backend
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     iteration.initialise_scaling()
@@ -339,6 +450,7 @@ def test_backend_generate_g_callable_br(brachistochrone_initialised_fixture):
     """Check iteration-specific objective gradient (`g`) callable compiled."""
     ocp, iteration = brachistochrone_initialised_fixture
     backend = ocp._backend
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     iteration.initialise_scaling()
@@ -357,6 +469,7 @@ def test_backend_generate_c_callable_dp(double_pendulum_initialised_fixture):
     """Check iteration-specific constraint vector (`c`) callable compiled."""
     ocp, iteration = double_pendulum_initialised_fixture
     backend = ocp._backend
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     iteration.initialise_scaling()
@@ -371,6 +484,7 @@ def test_backend_generate_c_callable_br(brachistochrone_initialised_fixture):
     """Check iteration-specific constraint vector (`c`) callable compiled."""
     ocp, iteration = brachistochrone_initialised_fixture
     backend = ocp._backend
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     iteration.initialise_scaling()
@@ -382,3 +496,232 @@ def test_backend_generate_c_callable_br(brachistochrone_initialised_fixture):
     expect_c = np.zeros(90)
     c = backend.evaluate_c(EXPECT_X_TILDE_BR)
     np.testing.assert_allclose(np.array(c).squeeze(), expect_c, atol=10e-2)
+
+
+@pytest.mark.parametrize("fixture_name, x_tilde",
+                         [("double_pendulum_initialised_fixture",
+                           EXPECT_X_TILDE_DP),
+                          ("brachistochrone_initialised_fixture",
+                           EXPECT_X_TILDE_BR),
+                          ])
+@pytest.mark.parametrize("map_parallelisation", ["serial", "thread"])
+def test_backend_map_node_function_mode(request, fixture_name, x_tilde,
+                                        map_parallelisation):
+    """Check mapped node functions give same NLP functions as expanded."""
+    ocp, iteration = request.getfixturevalue(fixture_name)
+    backend = ocp._backend
+    iteration.create_layouts()
+    iteration.interpolate_guess_to_mesh(iteration.prev_guess)
+    iteration.create_variable_constraint_counts_slices()
+    iteration.initialise_scaling()
+    iteration.scale_guess()
+    iteration.generate_nlp()
+    expect_J = backend.evaluate_J(x_tilde)
+    expect_g = backend.evaluate_g(x_tilde)
+    expect_c = backend.evaluate_c(x_tilde)
+    expect_G = backend.evaluate_G(x_tilde).toarray()
+
+    ocp.settings.node_function_mode = "map"
+    ocp.settings.map_parallelisation = map_parallelisation
+    iteration.generate_nlp()
+
+    assert isinstance(backend.x_var_iter, ca.MX)
+    assert backend.x_var_iter.size() == (iteration.num_x, 1)
+    assert backend.W_iter.size() == (backend.num_c, 1)
+    np.testing.assert_allclose(backend.evaluate_J(x_tilde), expect_J)
+    np.testing.assert_allclose(backend.evaluate_g(x_tilde), expect_g)
+    np.testing.assert_allclose(backend.evaluate_c(x_tilde), expect_c)
+    np.testing.assert_allclose(backend.evaluate_G(x_tilde).toarray(),
+                               expect_G)
+
+
+@pytest.mark.parametrize("node_function_mode", ["expand", "map"])
+def test_backend_differential_collocation_matrix_form(
+        brachistochrone_initialised_fixture, node_function_mode):
+    """Check differential form defects have a sparser Jacobian."""
+    ocp, iteration = brachistochrone_initialised_fixture
+    ocp.settings.node_function_mode = node_function_mode
+    backend = ocp._backend
+    iteration.create_layouts()
+    iteration.interpolate_guess_to_mesh(iteration.prev_guess)
+    iteration.create_variable_constraint_counts_slices()
+    iteration.initialise_scaling()
+    iteration.scale_guess()
+    iteration.generate_nlp()
+    num_c_defect = iteration.num_c_defect
+    expect_c = backend.evaluate_c(EXPECT_X_TILDE_BR)
+    expect_sG = backend.evaluate_G(EXPECT_X_TILDE_BR)
+    expect_G = expect_sG.toarray()
+
+    ocp.settings.collocation_matrix_form = "differential"
+    iteration._mesh = pycollo.mesh.Mesh(backend, iteration.mesh.p)
+    iteration.generate_nlp()
+    c = backend.evaluate_c(EXPECT_X_TILDE_BR)
+    sG = backend.evaluate_G(EXPECT_X_TILDE_BR)
+    G = sG.toarray()
+    assert c.shape == expect_c.shape
+    np.testing.assert_allclose(c[num_c_defect:], expect_c[num_c_defect:])
+    np.testing.assert_allclose(G[num_c_defect:], expect_G[num_c_defect:])
+    assert sG.nnz < expect_sG.nnz
+
+
+def test_backend_generate_H_callable_br(brachistochrone_initialised_fixture):
+    """Check Lagrangian Hessian (`H`) matches derivative of `g` and `G`."""
+    ocp, iteration = brachistochrone_initialised_fixture
+    backend = ocp._backend
+    iteration.create_layouts()
+    iteration.interpolate_guess_to_mesh(iteration.prev_guess)
+    iteration.create_variable_constraint_counts_slices()
+    iteration.initialise_scaling()
+    iteration.scale_guess()
+    iteration.generate_nlp()
+
+    x = np.array(EXPECT_X_TILDE_BR)
+    obj = 0.5
+    l = np.linspace(-1, 1, iteration.num_c)
+    H = backend.evaluate_H(x, obj, l).toarray()
+    assert H.shape == (iteration.num_x, iteration.num_x)
+    np.testing.assert_array_equal(H, np.tril(H))
+    assert backend.evaluate_H_num_nonzero() == len(
+        backend.evaluate_H_nonzeros(x, obj, l))
+
+    def grad_L(x):
+        g = backend.evaluate_g(x)
+        G = backend.evaluate_G(x)
+        return obj * g + G.T.dot(l)
+
+    h = 1e-6
+    expect_H = np.empty_like(H)
+    for i in range(iteration.num_x):
+        dx = np.zeros(iteration.num_x)
+        dx[i] = h
+        expect_H[:, i] = (grad_L(x + dx) - grad_L(x - dx)) / (2 * h)
+    np.testing.assert_allclose(H, np.tril(expect_H), atol=1e-6)
+
+
+@pytest.mark.parametrize("derivative_level, expect_approximation",
+                         [(1, "limited-memory"), (2, None)])
+def test_nlp_solver_hessian_approximation(brachistochrone_initialised_fixture,
+                                          derivative_level,
+                                          expect_approximation):
+    """Check derivative level sets IPOPT Hessian approximation."""
+    ocp, iteration = brachistochrone_initialised_fixture
+    iteration.create_layouts()
+    iteration.interpolate_guess_to_mesh(iteration.prev_guess)
+    ocp._backend.current_iteration = iteration
+    ocp.settings.derivative_level = derivative_level
+    settings = ocp._backend.create_nlp_solver_settings()
+    assert settings.get("hessian_approximation") == expect_approximation
+
+
+def test_compiled_nlp_functions_cached(brachistochrone_initialised_fixture,
+                                       tmp_path):
+    """Check compiled NLP functions match and are reused from the cache.
+
+    A cached NLP is loaded without constructing the symbolic NLP.
+
+    """
+    ocp, iteration = brachistochrone_initialised_fixture
+    backend = ocp._backend
+    iteration.create_layouts()
+    iteration.interpolate_guess_to_mesh(iteration.prev_guess)
+    iteration.create_variable_constraint_counts_slices()
+    iteration.initialise_scaling()
+    iteration.scale_guess()
+    iteration.generate_nlp()
+    expect_J = backend.evaluate_J(EXPECT_X_TILDE_BR)
+    expect_c = backend.evaluate_c(EXPECT_X_TILDE_BR)
+    expect_G = backend.evaluate_G(EXPECT_X_TILDE_BR).toarray()
+
+    ocp.settings.compile_nlp_functions = True
+    ocp.settings.nlp_function_cache_directory = str(tmp_path)
+    iteration.generate_nlp()
+    libraries = list(tmp_path.glob("*.so"))
+    assert len(libraries) == 1
+    np.testing.assert_allclose(backend.evaluate_J(EXPECT_X_TILDE_BR),
+                               expect_J)
+    np.testing.assert_allclose(backend.evaluate_c(EXPECT_X_TILDE_BR),
+                               expect_c)
+    np.testing.assert_allclose(backend.evaluate_G(EXPECT_X_TILDE_BR).toarray(),
+                               expect_G)
+
+    modified_time = libraries[0].stat().st_mtime_ns
+    backend.nlp_key_iter = None
+    backend.generate_symbolic_nlp = None
+    iteration.generate_nlp()
+    assert list(tmp_path.glob("*.so")) == libraries
+    assert libraries[0].stat().st_mtime_ns == modified_time
+    np.testing.assert_allclose(backend.evaluate_J(EXPECT_X_TILDE_BR),
+                               expect_J)
+    np.testing.assert_allclose(backend.evaluate_c(EXPECT_X_TILDE_BR),
+                               expect_c)
+
+
+@pytest.mark.parametrize("node_function_mode", ["expand", "map"])
+def test_nlp_solver_reused_on_same_mesh(brachistochrone_initialised_fixture,
+                                        node_function_mode):
+    """Check the NLP solver is reused if only NLP parameters change."""
+    ocp, iteration = brachistochrone_initialised_fixture
+    ocp.settings.node_function_mode = node_function_mode
+    backend = ocp._backend
+    iteration.create_layouts()
+    iteration.interpolate_guess_to_mesh(iteration.prev_guess)
+    iteration.create_variable_constraint_counts_slices()
+    iteration.initialise_scaling()
+    iteration.scale_guess()
+    iteration.generate_nlp()
+    nlp_solver = backend.nlp_solver
+    expect_J = backend.evaluate_J(EXPECT_X_TILDE_BR)
+    expect_c = backend.evaluate_c(EXPECT_X_TILDE_BR)
+
+    iteration.generate_nlp()
+    assert backend.nlp_solver is nlp_solver
+    np.testing.assert_allclose(backend.evaluate_J(EXPECT_X_TILDE_BR),
+                               expect_J)
+    np.testing.assert_allclose(backend.evaluate_c(EXPECT_X_TILDE_BR),
+                               expect_c)
+
+    iteration.scaling.w = 2 * iteration.scaling.w
+    backend.create_nlp_solver()
+    assert backend.nlp_solver is nlp_solver
+    np.testing.assert_allclose(backend.evaluate_J(EXPECT_X_TILDE_BR),
+                               2 * expect_J)
+
+
+def test_multipliers_interpolated_to_same_mesh(brachistochrone_initialised_fixture):
+    """Check NLP multipliers are unchanged when interpolated to same mesh."""
+    ocp, iteration = brachistochrone_initialised_fixture
+    iteration.create_layouts()
+    iteration.interpolate_guess_to_mesh(iteration.prev_guess)
+    iteration.create_variable_constraint_counts_slices()
+    assert iteration.guess_lam_x is None
+    assert iteration.guess_lam_g is None
+
+    rng = np.random.default_rng(0)
+    lam_x = rng.standard_normal(iteration.num_x)
+    lam_g = rng.standard_normal(iteration.num_c)
+    nlp_result = pycollo.solution.solution_abc.NlpResult(
+        solution=None, info={}, solve_time=0)
+    iteration._solution = types.SimpleNamespace(_lam_x=lam_x,
+                                                _lam_g=lam_g,
+                                                nlp_result=nlp_result)
+    multipliers = iteration.collect_next_mesh_iteration_multipliers()
+    iteration.interpolate_multipliers_to_mesh(multipliers)
+    np.testing.assert_allclose(iteration.guess_lam_x, lam_x)
+    np.testing.assert_allclose(iteration.guess_lam_g, lam_g)
+
+
+def test_nlp_solver_warm_start_settings(brachistochrone_initialised_fixture):
+    """Check IPOPT is only warm-started when multipliers are available."""
+    ocp, iteration = brachistochrone_initialised_fixture
+    iteration.create_layouts()
+    iteration.interpolate_guess_to_mesh(iteration.prev_guess)
+    ocp._backend.current_iteration = iteration
+    settings = ocp._backend.create_nlp_solver_settings()
+    assert settings["warm_start_init_point"] == "no"
+
+    iteration.guess_lam_x = np.zeros(1)
+    settings = ocp._backend.create_nlp_solver_settings()
+    assert settings["warm_start_init_point"] == "yes"
+    assert settings["mu_strategy"] == "adaptive"
+    assert "mu_init" not in settings
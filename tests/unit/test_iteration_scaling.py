@@ -40,6 +40,7 @@ def double_pendulum_initialised_fixture(double_pendulum_fixture):
     iteration.number = 1
     iteration._mesh = ocp._backend.initial_mesh
     iteration.prev_guess = ocp._backend.initial_guess
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     scaling = object.__new__(pycollo.scaling.CasadiIterationScaling)
@@ -66,6 +67,7 @@ def brachistochrone_initialised_fixture(brachistochrone_fixture):
     iteration.number = 1
     iteration._mesh = ocp._backend.initial_mesh
     iteration.prev_guess = ocp._backend.initial_guess
+    iteration.create_layouts()
     iteration.interpolate_guess_to_mesh(iteration.prev_guess)
     iteration.create_variable_constraint_counts_slices()
     scaling = object.__new__(pycollo.scaling.CasadiIterationScaling)
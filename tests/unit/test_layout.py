@@ -0,0 +1,58 @@
+"""Test the layout of variables and constraints in flat NLP vectors."""
+
+
+import numpy as np
+import pytest
+
+from pycollo.layout import VariableLayout
+
+
+@pytest.fixture
+def layout():
+    layout = VariableLayout()
+    layout.add(0, "y", (2, 3))
+    layout.add(0, "q", (1, ))
+    layout.add(1, "y", (1, 4))
+    layout.add(1, "u", (0, 4))
+    layout.add(None, "s", (2, ))
+    return layout
+
+
+def test_slices(layout):
+    assert layout.size == 13
+    assert layout.slice(0, "y") == slice(0, 6)
+    assert layout.slice(0, "q") == slice(6, 7)
+    assert layout.slice(1, "y") == slice(7, 11)
+    assert layout.slice(1, "u") == slice(11, 11)
+    assert layout.slice(None, "s") == slice(11, 13)
+    assert layout.phase_slice(0) == slice(0, 7)
+    assert layout.phase_slice(1) == slice(7, 11)
+    assert layout.shape(0, "y") == (2, 3)
+
+
+def test_views_share_memory(layout):
+    """Block and variable views write through to the flat vector."""
+    x = np.arange(layout.size, dtype=float)
+    np.testing.assert_array_equal(layout.view(x, 0, "y"),
+                                  [[0, 1, 2], [3, 4, 5]])
+    np.testing.assert_array_equal(layout.view(x, 0, "y", 1), [3, 4, 5])
+    assert layout.view(x, 1, "u").shape == (0, 4)
+    layout.view(x, 1, "y", 0)[...] = -1
+    np.testing.assert_array_equal(x[7:11], -1)
+    assert np.shares_memory(layout.view(x, None, "s"), x)
+
+
+def test_pack(layout):
+    x = np.zeros(layout.size)
+    out = layout.pack({(0, "y"): np.array([[1, 2, 3], [4, 5, 6]]),
+                       (0, "q"): 7,
+                       (None, "s"): [8, 9]},
+                      out=x)
+    assert out is x
+    np.testing.assert_array_equal(x, [1, 2, 3, 4, 5, 6, 7, 0, 0, 0, 0, 8, 9])
+
+
+def test_pack_allocates_zeros(layout):
+    """Blocks without values are zero in a newly allocated vector."""
+    x = layout.pack({(1, "y"): [[1, 2, 3, 4]]})
+    np.testing.assert_array_equal(x, [0, 0, 0, 0, 0, 0, 0, 1, 2, 3, 4, 0, 0])
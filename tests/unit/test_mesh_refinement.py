@@ -0,0 +1,214 @@
+"""Test the mesh error and next mesh calculations."""
+
+
+import types
+
+import numpy as np
+import pytest
+import scipy.sparse as sparse
+
+import pycollo
+from pycollo.mesh_refinement import (CostModelMeshRefinement,
+                                     HMeshRefinement,
+                                     LiuHagerRaoMeshRefinement,
+                                     PattersonRaoMeshRefinement,
+                                     PMeshRefinement,
+                                     SectionRefinement)
+
+
+def make_mesh_refinement(cls=PattersonRaoMeshRefinement):
+    mesh_refinement = object.__new__(cls)
+    mesh_refinement.absolute_mesh_errors = []
+    mesh_refinement.relative_mesh_errors = []
+    mesh_refinement.maximum_relative_mesh_errors = []
+    return mesh_refinement
+
+
+@pytest.mark.parametrize("num_y", [1, 3])
+def test_phase_mesh_error(num_y):
+    """Mesh errors match a section-by-section calculation."""
+    rng = np.random.default_rng(0)
+    N_K = rng.integers(3, 11, 20)
+    mesh_index_boundaries = np.insert(np.cumsum(N_K - 1), 0, 0)
+    N = mesh_index_boundaries[-1] + 1
+    I_matrix = sparse.random(N - 1, N, density=0.2, random_state=0,
+                             format="csr")
+    dy = rng.normal(size=(N, num_y))
+    y = 10 * rng.normal(size=(num_y, N))
+    stretch = 0.5
+
+    mesh_refinement = make_mesh_refinement()
+    mesh_refinement.dy_ph_callables = (lambda y, u, p_data: dy, )
+    mesh_refinement.ph_mesh = types.SimpleNamespace(
+        sI_matrix=(I_matrix, ),
+        N_K=(N_K, ),
+        mesh_index_boundaries=(mesh_index_boundaries, ))
+    p = types.SimpleNamespace(i=0, num_y_var=num_y)
+    p_data = types.SimpleNamespace(stretch=stretch)
+    mesh_refinement.phase_mesh_error(p, p_data, y, None)
+
+    I_dy = stretch * I_matrix.dot(dy)
+    absolute_mesh_error = mesh_refinement.absolute_mesh_errors[0]
+    relative_mesh_error = mesh_refinement.relative_mesh_errors[0]
+    assert absolute_mesh_error.shape == (len(N_K), num_y, max(N_K) - 1)
+    zipped = zip(mesh_index_boundaries[:-1], N_K - 1)
+    for i_k, (i_start, m_k) in enumerate(zipped):
+        Y_ph_k = (y[:, i_start] + I_dy[i_start:i_start + m_k]).T
+        Y_k = y[:, i_start + 1:i_start + 1 + m_k]
+        expect_abs = np.abs(Y_ph_k - Y_k)
+        expect_rel = expect_abs / (2 + np.max(np.abs(Y_k), axis=1))[:, None]
+        np.testing.assert_array_equal(absolute_mesh_error[i_k, :, :m_k],
+                                      expect_abs)
+        np.testing.assert_array_equal(relative_mesh_error[i_k, :, :m_k],
+                                      expect_rel)
+        assert not np.any(relative_mesh_error[i_k, :, m_k:])
+    np.testing.assert_array_equal(mesh_refinement.maximum_relative_mesh_errors[0],
+                                  np.max(relative_mesh_error, axis=(1, 2)))
+
+
+def test_next_iteration_phase_mesh():
+    """Accurate neighbouring sections merge, inaccurate sections subdivide."""
+    ocp = pycollo.OptimalControlProblem("Dummy OCP")
+    ocp.settings.mesh_tolerance = 1e-7
+    ocp.settings.mesh_coarsening_tolerance = 1e-4
+    ocp.settings.collocation_points_min = 4
+    ocp.settings.collocation_points_max = 10
+    mesh_refinement = make_mesh_refinement()
+    mesh_refinement.ocp = ocp
+    errors = np.array([1e-40, 1e-40, 1e-2, 1e-8, 1e-40, 1e-40, 1e-40])
+    mesh_refinement.maximum_relative_mesh_errors = (errors, )
+    mesh_refinement.it = types.SimpleNamespace(mesh=types.SimpleNamespace(
+        N_K=(np.full(7, 6), ), h_K=(np.full(7, 1 / 7), )))
+    p = types.SimpleNamespace(i=0, ocp_phase=None)
+    phase_mesh = mesh_refinement.next_iteration_phase_mesh(p)
+
+    expect_nodes = np.array([4, 4, 4, 4, 4, 6, 4])
+    expect_sizes = np.array([2, 0.25, 0.25, 0.25, 0.25, 1, 3]) / 7
+    assert phase_mesh.number_mesh_sections == 7
+    np.testing.assert_array_equal(phase_mesh.number_mesh_section_nodes,
+                                  expect_nodes)
+    np.testing.assert_allclose(phase_mesh.mesh_section_sizes, expect_sizes)
+
+
+@pytest.mark.parametrize("coarsening_tolerance, expect_sizes",
+                         [(0.0, [4, 4, 4, 1, 1, 1, 1]),
+                          (0.1, [12, 1, 1, 1, 1])])
+def test_next_iteration_phase_mesh_coarsening(coarsening_tolerance,
+                                              expect_sizes):
+    """Accurate sections are only merged if coarsening is enabled."""
+    ocp = pycollo.OptimalControlProblem("Dummy OCP")
+    ocp.settings.mesh_tolerance = 1e-7
+    ocp.settings.mesh_coarsening_tolerance = coarsening_tolerance
+    ocp.settings.collocation_points_min = 4
+    ocp.settings.collocation_points_max = 10
+    mesh_refinement = make_mesh_refinement()
+    mesh_refinement.ocp = ocp
+    errors = np.array([1e-30, 1e-30, 1e-30, 1e-2])
+    mesh_refinement.maximum_relative_mesh_errors = (errors, )
+    mesh_refinement.it = types.SimpleNamespace(mesh=types.SimpleNamespace(
+        N_K=(np.full(4, 6), ), h_K=(np.full(4, 0.25), )))
+    p = types.SimpleNamespace(i=0, ocp_phase=None)
+    phase_mesh = mesh_refinement.next_iteration_phase_mesh(p)
+
+    assert phase_mesh.number_mesh_sections == len(expect_sizes)
+    np.testing.assert_allclose(phase_mesh.mesh_section_sizes,
+                               np.array(expect_sizes) / 16)
+
+
+def make_strategy_mesh_refinement(cls, errors):
+    ocp = pycollo.OptimalControlProblem("Dummy OCP")
+    ocp.settings.mesh_tolerance = 1e-7
+    ocp.settings.collocation_points_min = 4
+    ocp.settings.collocation_points_max = 10
+    mesh_refinement = make_mesh_refinement(cls)
+    mesh_refinement.ocp = ocp
+    mesh_refinement.maximum_relative_mesh_errors = (np.array(errors), )
+    mesh_refinement.it = types.SimpleNamespace(mesh=types.SimpleNamespace(
+        N_K=(np.full(2, 6), ), h_K=(np.full(2, 0.5), )))
+    smooth_dy = np.polynomial.legendre.Legendre(10.0**-np.arange(6))
+    nonsmooth_dy = np.polynomial.legendre.Legendre(np.ones(6))
+    dy_polys = np.array([[smooth_dy, nonsmooth_dy]], dtype=object)
+    mesh_refinement.sol = types.SimpleNamespace(
+        phase_polys=(types.SimpleNamespace(dy=dy_polys), ))
+    p = types.SimpleNamespace(i=0, ocp_phase=None, num_y_var=1, num_u_var=0)
+    return mesh_refinement, p
+
+
+@pytest.mark.parametrize("cls, errors, expect_nodes, expect_sizes",
+                         [(HMeshRefinement, [1e-40, 1e-3],
+                           [6, 6, 6, 6, 6], [4, 1, 1, 1, 1]),
+                          (PMeshRefinement, [1e-5, 1e-3],
+                           [9, 6, 6, 6, 6], [4, 1, 1, 1, 1]),
+                          (LiuHagerRaoMeshRefinement, [1e-5, 1e-5],
+                           [9, 4, 4, 4], [3, 1, 1, 1])])
+def test_next_iteration_phase_mesh_strategies(cls, errors, expect_nodes,
+                                              expect_sizes):
+    """h, p and hp strategies refine inaccurate sections as expected.
+
+    Pure-h keeps the number of nodes and subdivides (by at most
+    `H_SUBDIVIDE_FACTOR_MAX`), pure-p adds nodes up to the maximum and
+    otherwise falls back to pure-h, Liu-Hager-Rao p-refines the smooth
+    section and h-refines the nonsmooth one.
+
+    """
+    mesh_refinement, p = make_strategy_mesh_refinement(cls, errors)
+    phase_mesh = mesh_refinement.next_iteration_phase_mesh(p)
+
+    np.testing.assert_array_equal(phase_mesh.number_mesh_section_nodes,
+                                  expect_nodes)
+    np.testing.assert_allclose(phase_mesh.mesh_section_sizes,
+                               np.array(expect_sizes) / np.sum(expect_sizes))
+    assert np.all(phase_mesh.number_mesh_section_nodes
+                  < mesh_refinement.ocp.settings.collocation_points_max)
+
+
+@pytest.mark.parametrize("errors", [[1e-40, 1e-3], [1e-5, 1e-5]])
+def test_cost_model_selects_smallest_nlp(errors):
+    """The cost model picks the strategy giving the fewest NLP variables."""
+    mesh_refinement, p = make_strategy_mesh_refinement(
+        CostModelMeshRefinement, errors)
+    phase_mesh = mesh_refinement.next_iteration_phase_mesh(p)
+
+    nlp_sizes = [CostModelMeshRefinement.phase_nlp_size(
+        p, strategy.from_mesh_refinement(
+            mesh_refinement).next_iteration_phase_mesh(p))
+        for strategy in CostModelMeshRefinement.STRATEGIES]
+    assert CostModelMeshRefinement.phase_nlp_size(p, phase_mesh) == min(
+        nlp_sizes)
+
+
+class UnrefinedMeshRefinement(HMeshRefinement):
+    """Strategy that leaves every mesh section unchanged."""
+
+    def phase_section_refinement(self, p):
+        N_K = self.it.mesh.N_K[p.i]
+        return SectionRefinement(N_K, np.ones_like(N_K), None, None)
+
+
+def test_cost_model_discards_inaccurate_strategies():
+    """Smaller meshes predicted to exceed the mesh tolerance are not used."""
+
+    class CostModel(CostModelMeshRefinement):
+        STRATEGIES = (UnrefinedMeshRefinement, HMeshRefinement)
+
+    mesh_refinement, p = make_strategy_mesh_refinement(CostModel,
+                                                       [1e-40, 1e-4])
+    phase_mesh = mesh_refinement.next_iteration_phase_mesh(p)
+
+    np.testing.assert_array_equal(phase_mesh.number_mesh_section_nodes,
+                                  [6, 6, 6, 6, 6])
+
+
+def test_next_iteration_mesh_keeps_converged_phase(monkeypatch):
+    """Phases within the mesh tolerance keep the current iteration's mesh."""
+    monkeypatch.setattr(pycollo.mesh_refinement, "Mesh",
+                        lambda backend, phase_meshes: types.SimpleNamespace(
+                            p=phase_meshes))
+    mesh_refinement, p = make_strategy_mesh_refinement(
+        CostModelMeshRefinement, [1e-8, 1e-9])
+    current_phase_mesh = object()
+    mesh_refinement.it.mesh.p = (current_phase_mesh, )
+    mesh_refinement.backend = types.SimpleNamespace(p=(p, ))
+    mesh = mesh_refinement.next_iteration_mesh()
+
+    assert mesh.p[0] is current_phase_mesh
@@ -53,3 +53,59 @@ def test_lobatto_weights(lobatto_quadrature_fixture):
                           0.16666666666666666])
     np.testing.assert_array_equal(quadrature.quadrature_weight(2), weights_2)
     np.testing.assert_array_equal(quadrature.quadrature_weight(3), weights_3)
+
+
+def test_quadrature_tables_shared(lobatto_quadrature_fixture):
+    quadrature = lobatto_quadrature_fixture
+    other = pycollo.quadrature.Quadrature(quadrature.backend)
+    assert other.table(7) is quadrature.table(7)
+    with pytest.raises(ValueError):
+        quadrature.table(7).butcher_array[0, 0] = 1
+
+
+@pytest.mark.parametrize("method", ["lobatto", "radau"])
+@pytest.mark.parametrize("order", [3, 10, 30, 40])
+def test_high_order_integration_matrix(method, order):
+    """Butcher arrays integrate a smooth function to rounding error."""
+    table = pycollo.quadrature.quadrature_table(method, order)
+    points = 0.5 * (table.points + 1)
+    if method == "radau":
+        points[-1] = 1
+    values = np.cos(3 * points)
+    integrals = np.sin(3 * points) / 3
+    if order >= 10:
+        np.testing.assert_allclose(table.butcher_array.dot(values), integrals,
+                                   rtol=0, atol=1e-6 if order == 10 else 1e-13)
+    degree = order - 1 if method == "lobatto" else order - 2
+    np.testing.assert_allclose(table.butcher_array.dot(points**degree),
+                               points**(degree + 1) / (degree + 1),
+                               rtol=0, atol=1e-13)
+
+
+def test_quadrature_table_persisted(tmp_path):
+    table = pycollo.quadrature.radau_generator(12)
+    pycollo.quadrature._save_quadrature_table(table, tmp_path / "radau.npz")
+    loaded = pycollo.quadrature._load_quadrature_table(tmp_path / "radau.npz")
+    for array, loaded_array in zip(table, loaded):
+        if isinstance(array, np.polynomial.legendre.Legendre):
+            array, loaded_array = array.coef, loaded_array.coef
+        np.testing.assert_array_equal(array, loaded_array)
+    assert pycollo.quadrature._load_quadrature_table(tmp_path / "x.npz") is None
+
+
+@pytest.mark.parametrize("method", ["lobatto", "radau"])
+@pytest.mark.parametrize("order", [2, 5, 12])
+def test_differential_matrices(method, order):
+    """Differential form defects vanish for polynomial solutions."""
+    table = pycollo.quadrature.quadrature_table(method, order)
+    points = 0.5 * (table.points + 1)
+    if method == "radau":
+        points[-1] = 1
+    degree = order - 1
+    y = points**degree
+    dy = degree * points**(degree - 1)
+    np.testing.assert_allclose(table.differential_D_matrix.dot(y)
+                               + table.differential_A_matrix.dot(dy), 0,
+                               atol=1e-10)
+    collocated = table.differential_A_matrix[:, table.collocated_columns]
+    np.testing.assert_array_equal(collocated, np.eye(order - 1))
@@ -54,6 +54,7 @@ class TestSettings:
         """Default mesh refinement settings."""
         assert self.settings.max_mesh_iterations == 10
         assert self.settings.mesh_tolerance == 1e-7
+        assert self.settings.mesh_coarsening_tolerance == 0.0
 
     def test_display_defaults(self):
         """Defaults for console output and plotting during/after solve."""
@@ -192,23 +193,12 @@ class TestSettings:
         with pytest.raises(ValueError):
             self.settings.derivative_level = test_value
 
-    @given(st.just("integral"))
+    @given(st.sampled_from(("integral", "differential")))
     def test_supported_collocation_matrix_form(self, test_value):
-        """Integral only supported collocation matrix forms."""
+        """Integral and differential are supported collocation matrix forms."""
         self.settings.collocation_matrix_form = test_value
         assert self.settings.collocation_matrix_form == test_value
 
-    @given(st.just("differential"))
-    def test_supported_collocation_matrix_form(self, test_value):
-        """Differential is unsupported collocation matrix forms."""
-        expected_error_msg = re.escape(
-            f"`{repr(test_value)}` is not currently supported as a form of "
-            f"the collocation matrices (`collocation_matrix_form`). Choose "
-            f"one of: `'integral'`."
-        )
-        with pytest.raises(ValueError, match=expected_error_msg):
-            self.settings.collocation_matrix_form = test_value
-
     @given(st.text())
     def test_invalid_collocation_matrix_form(self, test_value):
         """Invalid collocation matrix forms raise ValueError."""
@@ -217,11 +207,45 @@ class TestSettings:
         expected_error_msg = re.escape(
             f"`{repr(test_value)}` is not a valid option of form of the "
             f"collocation matrices (`collocation_matrix_form`). Choose one "
-            f"of: `'integral'`."
+            f"of: `'differential'` or `'integral'`."
         )
         with pytest.raises(ValueError, match=expected_error_msg):
             self.settings.collocation_matrix_form = test_value
 
+    def test_default_node_function_mode(self):
+        """Default node function mode should be expand."""
+        assert self.settings.node_function_mode == "expand"
+
+    @given(st.one_of(st.just("expand"), st.just("map")))
+    def test_supported_node_function_modes(self, test_value):
+        """Expand and map are supported node function modes."""
+        self.settings.node_function_mode = test_value
+        assert self.settings.node_function_mode == test_value
+
+    @given(st.text())
+    def test_invalid_node_function_mode(self, test_value):
+        """Invalid node function modes raise ValueError."""
+        assume(test_value not in {"expand", "map"})
+        with pytest.raises(ValueError):
+            self.settings.node_function_mode = test_value
+
+    def test_default_map_parallelisation(self):
+        """Default map parallelisation should be serial."""
+        assert self.settings.map_parallelisation == "serial"
+
+    @given(st.one_of(st.just("serial"), st.just("thread"), st.just("openmp")))
+    def test_supported_map_parallelisations(self, test_value):
+        """Serial, thread and OpenMP are supported map parallelisations."""
+        self.settings.map_parallelisation = test_value
+        assert self.settings.map_parallelisation == test_value
+
+    @given(st.text())
+    def test_invalid_map_parallelisation(self, test_value):
+        """Invalid map parallelisations raise ValueError."""
+        assume(test_value not in {"serial", "thread", "openmp"})
+        with pytest.raises(ValueError):
+            self.settings.map_parallelisation = test_value
+
     @given(st.one_of(st.just("lobatto"), st.just("radau")))
     def test_supported_quadrature_methods(self, test_value):
         """Lobatto and Radau are only valid quadrature methods."""
@@ -250,12 +274,12 @@ class TestSettings:
         with pytest.raises(ValueError, match=expected_error_msg):
             self.settings.quadrature_method = test_value
 
-    @given(st.one_of(st.integers(min_value=2, max_value=20),
-                     st.floats(min_value=2.0, max_value=20.0)))
+    @given(st.one_of(st.integers(min_value=2, max_value=40),
+                     st.floats(min_value=2.0, max_value=40.0)))
     def test_valid_min_max_collocation_points(self, test_value):
-        """Integers between 2 and 20 can be set provided min < max."""
+        """Integers between 2 and 40 can be set provided min < max."""
         self.settings.collocation_points_min = 2
-        self.settings.collocation_points_max = 20
+        self.settings.collocation_points_max = 40
         self.settings.collocation_points_min = test_value
         self.settings.collocation_points_max = test_value
         assert self.settings.collocation_points_min == int(test_value)
@@ -279,18 +303,18 @@ class TestSettings:
         with pytest.raises(ValueError, match=expected_error_msg):
             self.settings.collocation_points_max = test_value
 
-    @given(st.integers(min_value=21))
+    @given(st.integers(min_value=41))
     def test_too_large_min_max_collocation_points(self, test_value):
-        """Integers >20 raise a ValueError."""
+        """Integers >40 raise a ValueError."""
         expected_error_msg = re.escape(
             f"Minimum number of collocation points per mesh section "
-            f"(`collocation_points_min`) must be less than or equal to `20`. "
+            f"(`collocation_points_min`) must be less than or equal to `40`. "
             f"`{repr(test_value)}` is invalid.")
         with pytest.raises(ValueError, match=expected_error_msg):
             self.settings.collocation_points_min = test_value
         expected_error_msg = re.escape(
             f"Maximum number of collocation points per mesh section "
-            f"(`collocation_points_max`) must be less than or equal to `20`. "
+            f"(`collocation_points_max`) must be less than or equal to `40`. "
             f"`{repr(test_value)}` is invalid.")
         with pytest.raises(ValueError, match=expected_error_msg):
             self.settings.collocation_points_max = test_value
@@ -342,6 +366,39 @@ class TestSettings:
         with pytest.raises(ValueError, match=expected_error_msg):
             self.settings.mesh_tolerance = test_value
 
+    @given(st.floats(min_value=0, max_value=1))
+    def test_valid_mesh_coarsening_tolerance(self, test_value):
+        """Check mesh coarsening tolerance value is set correctly."""
+        self.settings.mesh_coarsening_tolerance = test_value
+        assert self.settings.mesh_coarsening_tolerance == test_value
+
+    @given(st.floats(min_value=1, exclude_min=True))
+    def test_too_large_mesh_coarsening_tolerance(self, test_value):
+        """Mesh coarsening tolerance >1 raises ValueError."""
+        expected_error_msg = re.escape(
+            f"Mesh coarsening tolerance (`mesh_coarsening_tolerance`) must be "
+            f"less than or equal to `1.0`. `{repr(test_value)}` is invalid.")
+        with pytest.raises(ValueError, match=expected_error_msg):
+            self.settings.mesh_coarsening_tolerance = test_value
+
+    @pytest.mark.parametrize("test_value", ["patterson-rao",
+                                            "liu-hager-rao",
+                                            "h",
+                                            "p",
+                                            "cost-model"])
+    def test_supported_mesh_refinement_algorithms(self, test_value):
+        """All mesh refinement algorithms can be set."""
+        self.settings.mesh_refinement_algorithm = test_value
+        assert self.settings.mesh_refinement_algorithm == test_value
+
+    @given(st.text())
+    def test_invalid_mesh_refinement_algorithm(self, test_value):
+        """Invalid mesh refinement algorithms raise ValueError."""
+        assume(test_value.lower() not in {"patterson-rao", "liu-hager-rao",
+                                          "h", "p", "cost-model"})
+        with pytest.raises(ValueError):
+            self.settings.mesh_refinement_algorithm = test_value
+
     @given(st.integers())
     def test_max_mesh_iterations_property(self, test_value):
         """ValueError if <1."""
@@ -6,7 +6,9 @@ import pytest
 import sympy as sym
 import math
 
-from pycollo.utils import sympy_to_casadi
+from pycollo.utils import (casadi_lookup_function, casadi_sparse_to_scipy,
+                           casadi_sparsity_indices, inline_lookups,
+                           sympy_to_casadi, sympy_to_casadi_cse)
 from pycollo import functions
 
 
@@ -82,3 +84,152 @@ def test_cyclic_spline_translation():
     test_points.extend([tp+4 for tp in test_points])
     for tx in test_points:
         assert math.isclose(spline_sym.subs(x_sympy,tx),float(spline_fun(tx)))
+
+
+@pytest.mark.parametrize("transpose", [False, True])
+def test_casadi_sparse_to_scipy(transpose):
+    """Check CasADi CCS matrices convert to SciPy without densifying."""
+    x = ca.SX.sym("x", 3)
+    f = ca.Function("f", [x], [ca.jacobian(ca.vertcat(x[0] * x[1],
+                                                     2 * x[2],
+                                                     0,
+                                                     x[0]**2), x)])
+    x_val = np.array([1.0, 2.0, 3.0])
+    J = f(x_val)
+    expect = np.array(J)
+    if transpose:
+        expect = expect.T
+    sJ = casadi_sparse_to_scipy(J, transpose=transpose)
+    assert sJ.nnz == J.nnz()
+    np.testing.assert_array_equal(sJ.toarray(), expect)
+
+    row_indices, col_indices = casadi_sparsity_indices(J.sparsity())
+    np.testing.assert_array_equal(np.array(J)[row_indices, col_indices],
+                                  J.nonzeros())
+
+
+def test_sympy_to_casadi_cse():
+    """Check joint conversion shares common subexpressions."""
+    x, y = sym.symbols("x, y")
+    exprs = [sym.sin(x * y) * sym.sqrt(x**2 + y**2),
+             sym.cos(x) + sym.sqrt(x**2 + y**2),
+             sym.sin(x * y) - 2,
+             sym.Integer(3)]
+    X = ca.SX.sym("x")
+    mapping = {x: X}
+    cse_exprs, mapping = sympy_to_casadi_cse(exprs, mapping)
+    assert y in mapping
+    XY = ca.vertcat(X, mapping[y])
+    separate_exprs = [sympy_to_casadi(expr, {x: X, y: mapping[y]})[0]
+                      for expr in exprs]
+    f_cse = ca.Function("f_cse", [XY], [ca.vertcat(*cse_exprs)])
+    f_separate = ca.Function("f_separate", [XY], [ca.vertcat(*separate_exprs)])
+    assert f_cse.n_instructions() < f_separate.n_instructions()
+    XY_val = np.array([0.3, 1.7])
+    np.testing.assert_allclose(np.array(f_cse(XY_val)),
+                               np.array(f_separate(XY_val)))
+
+
+@pytest.mark.parametrize("equispaced", [False, True])
+@pytest.mark.parametrize("periodic", [False, True])
+def test_spline_lookup(periodic, equispaced):
+    """Check spline lookups match inline splines and their derivatives."""
+    x_sympy = sym.Symbol("x")
+    x_casadi = ca.SX.sym("x")
+    x_data = np.linspace(1, 5, 33)
+    if not equispaced:
+        x_data = 1 + 4 * np.linspace(0, 1, 33)**1.5
+    y_data = np.sin(np.pi * x_data / 2)
+    if periodic:
+        spline_sym = functions.cubic_spline(x_sympy, x_data, y_data,
+                                            "periodic")
+    else:
+        spline_sym = functions.cubic_spline(x_sympy, x_data, y_data)
+    exprs_sym = [sym.sin(x_sympy) * spline_sym, spline_sym**2]
+    lookups = {}
+    exprs_ca, _ = sympy_to_casadi_cse(exprs_sym, {x_sympy: x_casadi},
+                                      lookups=lookups)
+    assert len(lookups) == 1
+    inline_ca = ca.vertcat(*inline_lookups(exprs_ca, lookups))
+    f_inline = ca.Function("f_inline", [x_casadi], [inline_ca])
+    f_lookup = casadi_lookup_function("f_lookup", [x_casadi],
+                                      [ca.vertcat(*exprs_ca)], lookups)
+
+    def with_derivatives(f):
+        x = ca.MX.sym("x")
+        y = ca.sum1(f(x))
+        return ca.Function("df", [x], [y, ca.jacobian(y, x),
+                                       ca.hessian(y, x)[0]])
+
+    f_inline = with_derivatives(f_inline)
+    f_lookup = with_derivatives(f_lookup)
+    for x_val in [-0.5, 0, 0.5, 1, 1.2, 2.4, 3.8, 4.2, 5, 5.5, 8.2]:
+        np.testing.assert_allclose(np.array(ca.vertcat(*f_lookup(x_val))),
+                                   np.array(ca.vertcat(*f_inline(x_val))),
+                                   atol=1e-12)
+
+
+@pytest.mark.parametrize("cyclic", [False, True])
+def test_equispaced_segwise_lookup(cyclic):
+    """Check equispaced polynomial Segwise functions lower to lookups."""
+    x_sympy = sym.Symbol("x")
+    x_casadi = ca.SX.sym("x")
+    s = functions.Segwise.s
+    upper_bounds = np.linspace(0.5, 10, 20)
+    segments = [(i * s**3 - 3 * s + 1, ub)
+                for i, ub in enumerate(upper_bounds)]
+    segwise_cls = functions.CyclicSegwise if cyclic else functions.Segwise
+    segwise_sym = segwise_cls(x_sympy, *segments)
+    assert segwise_sym.equispaced
+    lookups = {}
+    expr_ca, _ = sympy_to_casadi_cse([segwise_sym], {x_sympy: x_casadi},
+                                     lookups=lookups)
+    assert len(lookups) == 1
+    f_lookup = casadi_lookup_function("f_lookup", [x_casadi], expr_ca,
+                                      lookups)
+    for x_val in np.linspace(-2.07, 9.93, 61):
+        expect = float(segwise_sym.subs(x_sympy, x_val))
+        assert math.isclose(float(f_lookup(x_val)), expect, rel_tol=1e-9,
+                            abs_tol=1e-9)
+
+
+@pytest.mark.parametrize("method", ["linear", "cubic"])
+def test_lookup_table_lookup(method):
+    """Check lookup table interpolants match inline tables and derivatives."""
+    x_sympy, y_sympy = sym.symbols("x, y")
+    X = ca.SX.sym("X", 2)
+    x_grid = np.linspace(0, 3, 6)
+    y_grid = np.array([0, 0.5, 1.5, 2, 3.5, 4, 5])
+    values = (np.multiply.outer(np.sin(x_grid), np.cos(y_grid))
+              + np.multiply.outer(x_grid, y_grid**2))
+    table = functions.lookup_table((x_sympy, y_sympy), (x_grid, y_grid),
+                                   values, method)
+    lookups = {}
+    exprs_ca, _ = sympy_to_casadi_cse([x_sympy * table],
+                                      {x_sympy: X[0], y_sympy: X[1]},
+                                      lookups=lookups)
+    assert len(lookups) == 1
+    inline_ca = ca.vertcat(*inline_lookups(exprs_ca, lookups))
+    f_inline = ca.Function("f_inline", [X], [inline_ca])
+    f_lookup = casadi_lookup_function("f_lookup", [X],
+                                      [ca.vertcat(*exprs_ca)], lookups)
+
+    def with_derivatives(f):
+        x = ca.MX.sym("x", 2)
+        y = f(x)
+        return ca.Function("df", [x], [y, ca.jacobian(y, x),
+                                       ca.hessian(y, x)[0]])
+
+    f_inline = with_derivatives(f_inline)
+    f_lookup = with_derivatives(f_lookup)
+    rng = np.random.default_rng(0)
+    for point in rng.uniform([-0.5, -0.5], [3.5, 5.5], (20, 2)):
+        lookup = f_lookup(point)
+        inline = f_inline(point)
+        expect = point[0] * float(table.subs({x_sympy: point[0],
+                                              y_sympy: point[1]}))
+        assert math.isclose(float(lookup[0]), expect, rel_tol=1e-9,
+                            abs_tol=1e-12)
+        for actual, desired in zip(lookup, inline):
+            np.testing.assert_allclose(np.array(actual), np.array(desired),
+                                       atol=1e-9)